@@ -0,0 +1,116 @@
+"""
+DEX交易分类器吞吐量基准
+运行: python -m benchmarks.bench_dex_classifier
+checkpoint为按 sui_multiGetTransactionBlocks 返回结构生成的固定样本(约三成DEX交易，每笔3~6个MoveCall)
+"""
+import random
+import timeit
+from src.monitor.dex_classifier import DexClassifier, move_calls
+
+CHECKPOINT_SIZE = 2000
+ROUNDS = 20
+
+DEX_CONTRACTS = {
+    name: {"pool": f"0x{name}_pool", "router": f"0x{name}"}
+    for name in ("turbos", "cetus", "deepbook", "kriya", "flowx", "aftermath")
+}
+DEX_FUNCTIONS = {
+    "swap_exact_input": "0xcetus::router::swap_exact_input",
+    "swap_exact_output": "0xcetus::router::swap_exact_output",
+    "add_liquidity": "0xturbos::pool::add_liquidity",
+    "remove_liquidity": "0xturbos::pool::remove_liquidity",
+}
+OTHER_TARGETS = ["0x2::coin::split", "0x2::pay::join", "0x2::transfer::public_transfer", "0xnft::market::buy"]
+
+
+def move_call(target: str, type_arguments=()):
+    package, module, function = target.split("::")
+    return {"MoveCall": {"package": package, "module": module, "function": function,
+                         "type_arguments": list(type_arguments), "arguments": [{"Input": 0}]}}
+
+
+def record_checkpoint(seed: int = 1):
+    rng = random.Random(seed)
+    dex_targets = [f"{contracts['router']}::router::swap" for contracts in DEX_CONTRACTS.values()]
+    transactions = []
+    for i in range(CHECKPOINT_SIZE):
+        commands = [move_call(rng.choice(OTHER_TARGETS)) for _ in range(rng.randint(2, 5))]
+        if rng.random() < 0.3:
+            commands.insert(rng.randrange(len(commands)),
+                            move_call(rng.choice(dex_targets), ["0x2::sui::SUI", "0xusdc::usdc::USDC"]))
+        if rng.random() < 0.1:
+            commands.append(move_call(rng.choice(list(DEX_FUNCTIONS.values()))))
+        commands.append({"TransferObjects": [[{"Result": 0}], {"Input": 1}]})
+        transactions.append({
+            "digest": f"D{i}",
+            "transaction": {"data": {"transaction": {"kind": "ProgrammableTransaction", "transactions": commands},
+                                     "sender": "0xuser"}},
+            "effects": {},
+            "events": [],
+            "timestampMs": str(i),
+        })
+    return transactions
+
+
+class LegacyClassifier:
+    """原 TransactionMonitor 中逐个DEX循环、重复提取目标地址的实现(节选，目标改为从MoveCall中读取)"""
+    def __init__(self):
+        self.dex_contracts = DEX_CONTRACTS
+        self.dex_functions = DEX_FUNCTIONS
+
+    def _targets(self, transaction):
+        addresses = set()
+        for call in move_calls(transaction):
+            addresses.add(call["package"])
+        return addresses
+
+    def _functions(self, transaction):
+        return {f"{call['package']}::{call['module']}::{call['function']}" for call in move_calls(transaction)}
+
+    def _is_dex(self, transaction):
+        targets = self._targets(transaction)
+        for dex in self.dex_contracts.values():
+            if dex["pool"] in targets or dex["router"] in targets:
+                return True
+        functions = self._functions(transaction)
+        return any(signature in functions for signature in self.dex_functions.values())
+
+    def _dex_info(self, transaction):
+        for name, contracts in self.dex_contracts.items():
+            targets = self._targets(transaction)
+            if contracts["pool"] in targets or contracts["router"] in targets:
+                return {"name": name}
+        return {}
+
+    def _function_info(self, transaction):
+        for name, signature in self.dex_functions.items():
+            if signature in self._functions(transaction):
+                return {"name": name}
+        return {}
+
+    def classify_batch(self, transactions):
+        return [
+            {"tx_hash": tx.get("digest"), "dex_info": self._dex_info(tx), "function_info": self._function_info(tx)}
+            for tx in transactions if self._is_dex(tx)
+        ]
+
+
+def main():
+    checkpoint = record_checkpoint()
+    classifier = DexClassifier(DEX_CONTRACTS, DEX_FUNCTIONS)
+    legacy = LegacyClassifier()
+
+    matched = len(classifier.classify_batch(checkpoint))
+    compiled_time = timeit.timeit(lambda: classifier.classify_batch(checkpoint), number=ROUNDS)
+    legacy_time = timeit.timeit(lambda: legacy.classify_batch(checkpoint), number=ROUNDS)
+
+    total = CHECKPOINT_SIZE * ROUNDS
+    print(f"checkpoint: {CHECKPOINT_SIZE} transactions, compiled classifier matched {matched}")
+    print(f"{'classifier':<12}{'tx/s':>14}{'us/tx':>10}")
+    for name, elapsed in (("legacy", legacy_time), ("compiled", compiled_time)):
+        print(f"{name:<12}{total / elapsed:>14,.0f}{elapsed / total * 1e6:>10.2f}")
+    print(f"legacy matched {len(legacy.classify_batch(checkpoint))}")
+
+
+if __name__ == "__main__":
+    main()
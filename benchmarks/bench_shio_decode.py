@@ -0,0 +1,53 @@
+"""
+Shio Feed消息解码耗时基准
+运行: python -m benchmarks.bench_shio_decode
+消息为按auctionStarted结构生成的固定样本，sideEffects中包含若干对象和事件
+"""
+import json
+import random
+import timeit
+from src.monitor.shio_codec import ShioMessageDecoder, DECODER_NAME
+
+MESSAGES = 2000
+ROUNDS = 10
+
+
+def record_messages(seed: int = 1):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(MESSAGES):
+        side_effects = {
+            "createdObjects": [{"id": f"0x{rng.getrandbits(256):064x}", "objectType": "0x2::coin::Coin<0x2::sui::SUI>"}
+                               for _ in range(rng.randint(0, 3))],
+            "mutatedObjects": [{"id": f"0x{rng.getrandbits(256):064x}", "objectType": "0xcetus::pool::Pool",
+                                "objectBcs": "A" * rng.randint(200, 800)} for _ in range(rng.randint(1, 4))],
+            "events": [{"eventType": "0xcetus::pool::SwapEvent",
+                        "eventData": {"amount_in": str(rng.randrange(10**12)), "amount_out": str(rng.randrange(10**12))}}
+                       for _ in range(rng.randint(1, 3))],
+        }
+        auction = {"txDigest": f"D{i}", "gasPrice": "750", "deadlineTimestampMs": 1700000000000 + i,
+                   "sideEffects": side_effects}
+        messages.append(json.dumps({"auctionStarted": auction}))
+    return messages
+
+
+def legacy_handle(message):
+    """原实现: json.loads 后在INFO级别格式化整个消息"""
+    data = json.loads(message)
+    f"收到消息: {data}"
+    if data.get("auctionStarted", "") != "":
+        f"收到拍卖事件: {data}"
+
+
+def main():
+    messages = record_messages()
+    decoder = ShioMessageDecoder()
+    legacy = min(timeit.repeat(lambda: [legacy_handle(m) for m in messages], number=1, repeat=ROUNDS))
+    current = min(timeit.repeat(lambda: [decoder.decode(m) for m in messages], number=1, repeat=ROUNDS))
+    print(f"messages: {MESSAGES}, decoder: {DECODER_NAME}")
+    print(f"legacy:  {legacy / MESSAGES * 1e6:.1f} us/message")
+    print(f"current: {current / MESSAGES * 1e6:.1f} us/message ({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
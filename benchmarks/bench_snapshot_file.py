@@ -0,0 +1,72 @@
+"""
+池子快照文件热启动基准
+运行: PYTHONPATH=src python -m benchmarks.bench_snapshot_file
+按主网规模生成池子: 5000个池子，约三成为CLMM池子，每个CLMM池子100个已初始化tick
+测量写入、加载(mmap + 恢复对象)以及加载到DB并建好路径图的总耗时
+"""
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+from src.db.db import DB
+from src.db.snapshot_file import StoredDex, StoredPool, load_snapshot_file, write_snapshot_file
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+from src.path.path_finder import PathConfig, PathFinder
+
+POOL_COUNT = 5000
+TOKEN_COUNT = 800
+TICKS_PER_POOL = 100
+
+
+def make_pools(seed: int = 1):
+    rng = random.Random(seed)
+    tokens = [f"0x{rng.getrandbits(256):064x}::coin::COIN" for _ in range(TOKEN_COUNT)]
+    pools = []
+    for i in range(POOL_COUNT):
+        # 少数代币(如SUI、USDC)出现在大部分池子中
+        token0 = tokens[min(int(rng.expovariate(0.05)), TOKEN_COUNT - 1)]
+        token1 = rng.choice(tokens)
+        if token1 == token0:
+            continue
+        if rng.random() < 0.3:
+            state = ClmmPoolState(token0, token1, sqrt_price=Q64, tick_current=0,
+                                  liquidity=rng.randrange(1 << 80), fee_rate=2500)
+            for tick in sorted(rng.sample(range(-50000, 50000, 60), TICKS_PER_POOL)):
+                state.set_tick(tick, rng.randrange(-(1 << 70), 1 << 70) or 1)
+            dex = ClmmDex("cetus", "0xcetus", state)
+        else:
+            dex = StoredDex(rng.choice(["kriya", "flowx"]), "0xrouter", "v2")
+        pools.append(StoredPool(f"0x{rng.getrandbits(256):064x}", token0, token1, dex,
+                                rng.randrange(1 << 60), rng.randrange(1 << 60), Decimal("0.003")))
+    return pools
+
+
+def main():
+    pools = make_pools()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pools.bin")
+        started = time.perf_counter()
+        write_snapshot_file(path, pools, {pool.address: 1 for pool in pools}, checkpoint=1)
+        written = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loaded = load_snapshot_file(path)
+        load_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        db = DB()
+        db.add_pools(loaded.pools)
+        db_time = time.perf_counter() - started
+        started = time.perf_counter()
+        PathFinder(PathConfig(max_path_length=3, blacklist_tokens=set(), blacklist_dexes=set()), db)
+        graph_time = time.perf_counter() - started
+        size = os.path.getsize(path)
+
+    print(f"pools: {len(pools)}, ticks: {sum(len(p.dex.state.tick_indexes) for p in pools if hasattr(p.dex, 'state'))}")
+    print(f"file size: {size / 1e6:.1f} MB, write: {written * 1000:.0f} ms")
+    print(f"load: {load_time * 1000:.0f} ms, DB: {db_time * 1000:.0f} ms, path graph + cycle index: {graph_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+整数兑换公式与原Decimal实现的微基准
+运行: python -m benchmarks.bench_swap_math
+"""
+import timeit
+from decimal import Decimal
+from src.dex.swap_math import get_amount_out_fee_on_input, get_path_amount_out
+
+ITERATIONS = 200_000
+
+
+class BenchDex:
+    name = "flowx"
+    dex_type = "v2"
+
+
+class BenchPool:
+    def __init__(self, token_in: str, token_out: str, reserve_in, reserve_out):
+        self.token0 = token_in
+        self.token1 = token_out
+        self.token_in = token_in
+        self.token_out = token_out
+        self.amount0 = reserve_in
+        self.amount1 = reserve_out
+        self.fee = Decimal("0.003")
+        self.dex = BenchDex()
+
+
+def decimal_amount_out(amount_in: Decimal, reserve_in: Decimal, reserve_out: Decimal, fee: Decimal) -> Decimal:
+    """原策略中的Decimal兑换公式"""
+    amount_in_with_fee = amount_in * (1 - fee)
+    return amount_in_with_fee * reserve_out / (reserve_in + amount_in_with_fee)
+
+
+def main():
+    reserve_in, reserve_out, amount_in = 123_456_789_012_345, 987_654_321_098_765, 1_234_567_890
+
+    decimal_args = (Decimal(amount_in), Decimal(reserve_in), Decimal(reserve_out), Decimal("0.003"))
+    decimal_time = timeit.timeit(lambda: decimal_amount_out(*decimal_args), number=ITERATIONS)
+    int_time = timeit.timeit(lambda: get_amount_out_fee_on_input(amount_in, reserve_in, reserve_out, 30),
+                             number=ITERATIONS)
+
+    # 原实现中池子储备为Decimal，整数实现中为链上原始整数
+    hops = (("USDC", "SUI", reserve_in, reserve_out), ("SUI", "CETUS", reserve_out, reserve_in),
+            ("CETUS", "USDC", reserve_in, reserve_out))
+    decimal_pools = [BenchPool(a, b, Decimal(x), Decimal(y)) for a, b, x, y in hops]
+    int_pools = [BenchPool(a, b, x, y) for a, b, x, y in hops]
+
+    def decimal_path():
+        amount = decimal_args[0]
+        for pool in decimal_pools:
+            amount = decimal_amount_out(amount, pool.amount0, pool.amount1, pool.fee)
+        return amount
+
+    decimal_path_time = timeit.timeit(decimal_path, number=ITERATIONS // 10)
+    int_path_time = timeit.timeit(lambda: get_path_amount_out(int_pools, amount_in), number=ITERATIONS // 10)
+
+    print(f"{'case':<28}{'decimal (ns/op)':>18}{'int (ns/op)':>14}{'speedup':>10}")
+    for name, slow, fast, iterations in (
+        ("v2 get_amount_out", decimal_time, int_time, ITERATIONS),
+        ("3-hop path (Pool objects)", decimal_path_time, int_path_time, ITERATIONS // 10),
+    ):
+        print(f"{name:<28}{slow / iterations * 1e9:>18.0f}{fast / iterations * 1e9:>14.0f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+代币价格引擎基准
+运行: PYTHONPATH=src python -m benchmarks.bench_token_price
+沿用快照文件基准的主网规模池子(5000个池子，800个代币)，以第一个代币为锚定
+测量全量计算、每个checkpoint变化少量池子时的增量重算，以及 get_token_price 的读取开销
+"""
+import random
+import time
+from src.db.db import DB
+from src.token_price.token_price import TokenPriceProvider
+from benchmarks.bench_snapshot_file import make_pools
+
+CHANGED_PER_ROUND = 20
+ROUNDS = 200
+
+
+def main():
+    pools = make_pools()
+    db = DB()
+    db.add_pools([(pool, 1) for pool in pools])
+    anchor = max(db.by_token, key=lambda token: len(db.by_token[token]))
+    provider = TokenPriceProvider(db, anchors={anchor: 6})
+
+    started = time.perf_counter()
+    provider.update_from_snapshot(db.snapshot())
+    full_time = time.perf_counter() - started
+
+    rng = random.Random(2)
+    addresses = list(db.db)
+    recomputed = 0
+    incremental_time = 0.0
+    for _ in range(ROUNDS):
+        for address in rng.sample(addresses, CHANGED_PER_ROUND):
+            pool = db._writable_pool(address)
+            pool.amount0 = max(1, int(pool.amount0 * rng.uniform(0.99, 1.01)))
+            db.bump_pool_version(address)
+        snapshot = db.snapshot()
+        started = time.perf_counter()
+        recomputed += provider.update_from_snapshot(snapshot)
+        incremental_time += time.perf_counter() - started
+
+    tokens = provider.tokens
+    started = time.perf_counter()
+    for token in tokens * 100:
+        provider.get_token_price(token)
+    lookup_time = (time.perf_counter() - started) / (len(tokens) * 100)
+
+    print(f"pools: {len(pools)}, tokens: {len(tokens)}, priced: {provider.stats()['priced']}")
+    print(f"full rebuild: {full_time * 1000:.1f} ms")
+    print(f"incremental ({CHANGED_PER_ROUND} pools changed): {incremental_time / ROUNDS * 1000:.2f} ms/round, "
+          f"{recomputed / ROUNDS:.1f} tokens repriced/round")
+    print(f"get_token_price: {lookup_time * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List
+
+
+class BloomFilter:
+    """
+    固定大小的Bloom过滤器，k个位置由一次哈希的高低32位做双重哈希得到
+    capacity和error_rate决定位数和哈希次数，插入超过capacity后误判率上升
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.bit_count = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0  # 已插入的元素数量
+
+    def _positions(self, key: str):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        bit_count = self.bit_count
+        return [(h1 + i * h2) % bit_count for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+
+class DigestDeduplicator:
+    """
+    跨数据源的交易digest去重
+    同一笔交易可能先从Shio拍卖到达，之后又出现在checkpoint中。最近ttl秒内的digest保存在LRU中精确匹配，
+    更早的历史由两代Bloom过滤器覆盖: 当前代写满capacity后成为上一代，再新建一代，内存固定为两代的大小
+    检查和插入都是O(1)。Bloom过滤器的误判会把一笔新交易当成重复，概率约为error_rate
+    """
+    def __init__(self, ttl: float = 120.0, max_size: int = 100_000,
+                 capacity: int = 1_000_000, error_rate: float = 1e-4,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clock = clock
+        self._recent: "OrderedDict[str, float]" = OrderedDict()  # digest -> 过期时间
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self.checked: Dict[str, int] = {}  # 来源 -> 检查次数
+        self.suppressed: Dict[str, int] = {}  # 来源 -> 判定为重复的次数
+        self.bloom_hits = 0  # LRU未命中但Bloom过滤器命中的次数
+
+    def _expire(self, now: float):
+        recent = self._recent
+        while recent and next(iter(recent.values())) <= now:
+            recent.popitem(last=False)
+
+    def is_duplicate(self, digest: str, source: str) -> bool:
+        """检查digest是否出现过，未出现过时记录下来"""
+        self.checked[source] = self.checked.get(source, 0) + 1
+        now = self.clock()
+        self._expire(now)
+        duplicate = digest in self._recent
+        if not duplicate and (digest in self._current or digest in self._previous):
+            duplicate = True
+            self.bloom_hits += 1
+        if duplicate:
+            self.suppressed[source] = self.suppressed.get(source, 0) + 1
+            return True
+
+        self._recent[digest] = now + self.ttl
+        if len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+        if self._current.is_full:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        self._current.add(digest)
+        return False
+
+    def filter(self, transactions: Iterable[Dict], source: str, key: str = "tx_hash") -> List[Dict]:
+        """去掉已经出现过的交易，没有digest的交易原样保留"""
+        return [transaction for transaction in transactions
+                if not transaction.get(key) or not self.is_duplicate(transaction[key], source)]
+
+    def stats(self) -> Dict:
+        return {
+            "checked": dict(self.checked),
+            "suppressed": dict(self.suppressed),
+            "bloom_hits": self.bloom_hits,
+            "recent": len(self._recent),
+            "bloom_count": self._current.count + self._previous.count,
+        }
@@ -1,12 +1,224 @@
 import asyncio
 import concurrent.futures
+import heapq
 import inspect
+import itertools
+import logging
+import math
 import os
-from collections import defaultdict
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from functools import wraps
+from typing import Any, Callable, Collection, Dict, Optional
+
+from .metrics import tracer
 
 ENABLE_SUBSCRIBERS = os.getenv("ASYNC_BUS_ENABLE_SUBSCRIBERS", True)
 
+logger = logging.getLogger(__name__)
+
+# Overflow policies for bounded subscriber queues
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # evict the oldest pending event of the least urgent priority
+OVERFLOW_COALESCE = "coalesce"  # latest wins: replace the pending event with the same key
+OVERFLOW_BLOCK = "block"  # publish() waits for space, emit() rejects the new event
+
+# Event priorities, lower values are scheduled first
+PRIORITY_CRITICAL = 0  # hard deadline, e.g. Shio auctions
+PRIORITY_NORMAL = 1
+PRIORITY_BEST_EFFORT = 2  # e.g. checkpoint polling
+
+# Coalescing key shared by all events when QueueConfig.key is omitted
+_ALL_EVENTS_KEY = object()
+
+
+def _subscriber_name(event_name, subscriber):
+    return f"{event_name}:{getattr(subscriber, '__qualname__', repr(subscriber))}"
+
+
+@dataclass
+class QueueConfig:
+    """
+    Bounded queue settings applied to every subscriber of an event
+
+    :param max_size: Maximum number of pending events per subscriber
+    :param policy: Overflow policy, one of the OVERFLOW_* constants
+    :param workers: Number of consumer workers per subscriber
+    :param key: Coalescing key function called with the event arguments,
+        all events share one key when omitted
+    :param coalesce_priorities: Priority lanes the coalesce policy applies to,
+        all lanes when omitted; events of other lanes are only evicted as under
+        the drop-oldest policy
+    """
+    max_size: int = 1024
+    policy: str = OVERFLOW_DROP_OLDEST
+    workers: int = 1
+    key: Optional[Callable[..., Any]] = None
+    coalesce_priorities: Optional[Collection[int]] = None
+
+    def coalesces(self, priority):
+        return self.policy == OVERFLOW_COALESCE and (
+            self.coalesce_priorities is None or priority in self.coalesce_priorities
+        )
+
+
+class SubscriberQueue:
+    """
+    Bounded priority queue of pending events for a single subscriber, drained by
+    a fixed number of worker tasks. Events are ordered by priority, then by
+    deadline, then by arrival; events whose deadline has passed are dropped
+    before the subscriber starts
+    """
+
+    def __init__(self, subscriber, config: QueueConfig, executor, name=None):
+        self.subscriber = subscriber
+        self.span_name = f"event_bus.{name or _subscriber_name('', subscriber)}"
+        self.config = config
+        self._executor = executor
+        self._is_async = inspect.iscoroutinefunction(subscriber)
+        # heap entries are [priority, deadline_order, seq, push_id, key, args, kwargs, deadline, alive];
+        # removed entries are marked dead and skipped when popped. A coalesced event reuses the
+        # seq of the event it replaces, so the unique push_id keeps the payload out of comparisons
+        self._heap = []
+        self._size = 0
+        self._seq = itertools.count()
+        self._push_ids = itertools.count()
+        self._by_key: Dict[Any, list] = {}
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._workers = []
+
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return self._size
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "failed": self.failed,
+        }
+
+    def start(self, event_loop):
+        """Start the consumer workers once"""
+        if self._workers or event_loop is None:
+            return
+        self._workers = [event_loop.create_task(self._work()) for _ in range(self.config.workers)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def put_nowait(self, args, kwargs, priority=PRIORITY_NORMAL, deadline=None):
+        """
+        Enqueue an event without waiting
+
+        :param priority: Lower values are scheduled first
+        :param deadline: time.monotonic() timestamp after which the event is dropped
+        :return: False if the event was rejected
+        """
+        config = self.config
+        key = None
+        seq = None
+        if config.coalesces(priority):
+            # only events of the same priority lane coalesce
+            key = (priority, config.key(*args, **kwargs) if config.key else _ALL_EVENTS_KEY)
+            pending = self._by_key.get(key)
+            if pending is not None:
+                # latest wins, but keeps the arrival order of the replaced event
+                self._remove(pending)
+                seq = pending[2]
+                self.coalesced += 1
+
+        if seq is None and self._size >= config.max_size:
+            if config.policy == OVERFLOW_BLOCK:
+                self.dropped += 1
+                return False
+            # evict the oldest event of the least urgent lane, or reject the new
+            # event when it is less urgent than everything pending
+            victim = max((entry for entry in self._heap if entry[8]), key=lambda entry: (entry[0], -entry[2]))
+            self.dropped += 1
+            if victim[0] < priority:
+                return False
+            self._remove(victim)
+
+        deadline_order = math.inf if deadline is None else deadline
+        entry = [priority, deadline_order, next(self._seq) if seq is None else seq,
+                 next(self._push_ids), key, args, kwargs, deadline, True]
+        heapq.heappush(self._heap, entry)
+        self._size += 1
+        if key is not None:
+            self._by_key[key] = entry
+        if seq is None:
+            self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._size)
+        self._not_empty.set()
+        if self._size >= config.max_size:
+            self._not_full.clear()
+        return True
+
+    async def put(self, args, kwargs, priority=PRIORITY_NORMAL, deadline=None):
+        """Enqueue an event, waiting for space under the block policy"""
+        if self.config.policy == OVERFLOW_BLOCK:
+            while self._size >= self.config.max_size:
+                await self._not_full.wait()
+        return self.put_nowait(args, kwargs, priority, deadline)
+
+    def _remove(self, entry):
+        entry[8] = False
+        self._size -= 1
+        if entry[4] is not None:
+            self._by_key.pop(entry[4], None)
+
+    async def _get(self):
+        while True:
+            while not self._size:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+            entry = heapq.heappop(self._heap)
+            if not entry[8]:
+                continue
+            self._remove(entry)
+            self._not_full.set()
+            if entry[7] is not None and time.monotonic() > entry[7]:
+                self.expired += 1
+                continue
+            return entry[5], entry[6]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            args, kwargs = await self._get()
+            start = time.perf_counter_ns()
+            try:
+                if self._is_async:
+                    await self.subscriber(*args, **kwargs)
+                else:
+                    await loop.run_in_executor(self._executor, lambda: self.subscriber(*args, **kwargs))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Subscriber {self.subscriber!r} failed: {e}")
+            finally:
+                self.processed += 1
+                tracer.record(self.span_name, time.perf_counter_ns() - start)
+
 
 class EventBus:
     """
@@ -16,6 +228,8 @@ class EventBus:
     def __init__(self, event_loop):
         self.__events_async = defaultdict(set)
         self.__events = defaultdict(set)
+        self.__queue_configs: Dict[str, QueueConfig] = {}
+        self.__queues: Dict[str, "OrderedDict[Any, SubscriberQueue]"] = defaultdict(OrderedDict)
         self._pool = concurrent.futures.ThreadPoolExecutor()
         self.event_loop = event_loop
 
@@ -66,38 +280,143 @@ class EventBus:
         else:
             self.__events[event_name].add(subscriber)
 
-    def emit(self, event_name, *args, **kwargs):
+        config = self.__queue_configs.get(event_name)
+        if config is not None and subscriber not in self.__queues[event_name]:
+            self.__queues[event_name][subscriber] = SubscriberQueue(
+                subscriber, config, self._pool, _subscriber_name(event_name, subscriber)
+            )
+
+    def configure_event(self, event_name, max_size=1024, policy=OVERFLOW_DROP_OLDEST, workers=1, key=None,
+                        coalesce_priorities=None):
+        """
+        Method for giving every subscriber of an event a bounded queue drained by
+        a fixed number of workers, instead of one task per emitted event
+
+        :param event_name: Event name to configure
+        :param max_size: Maximum number of pending events per subscriber
+        :param policy: Overflow policy, one of the OVERFLOW_* constants
+        :param workers: Number of consumer workers per subscriber
+        :param key: Coalescing key function for the coalesce policy
+        :param coalesce_priorities: Priority lanes the coalesce policy applies to,
+            all lanes when omitted
+        """
+        if policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        config = QueueConfig(max_size=max_size, policy=policy, workers=workers, key=key,
+                             coalesce_priorities=coalesce_priorities)
+        self.__queue_configs[event_name] = config
+        queues = self.__queues[event_name]
+        for subscriber in (*self.__events_async[event_name], *self.__events[event_name]):
+            if subscriber not in queues:
+                queues[subscriber] = SubscriberQueue(
+                    subscriber, config, self._pool, _subscriber_name(event_name, subscriber)
+                )
+
+    def queue_stats(self):
+        """
+        Method for returning queue depth and drop metrics of every bounded queue
+
+        :return: Metrics keyed by "event_name:subscriber"
+        """
+        return {
+            _subscriber_name(event_name, subscriber): queue.stats()
+            for event_name, queues in self.__queues.items()
+            for subscriber, queue in queues.items()
+        }
+
+    def emit(self, event_name, *args, priority=PRIORITY_NORMAL, deadline=None, **kwargs):
         """
         Method for emitting an event
 
         :param event_name: Event name for emitting their subscribers
+        :param priority: Scheduling priority, lower values run first on configured events
+        :param deadline: time.monotonic() timestamp after which subscribers that
+            have not started yet skip the event
         """
         if ENABLE_SUBSCRIBERS == "false":
             return None
 
+        queues = self.__queues.get(event_name)
+        if queues:
+            for queue in queues.values():
+                queue.start(self.event_loop)
+                queue.put_nowait(args, kwargs, priority, deadline)
+            return None
+
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+
         subscribers = self.__events[event_name]
         subscribers_async = self.__events_async[event_name]
 
         if subscribers_async and self.event_loop:
             self.event_loop.create_task(
-                self.__run_subscribers(subscribers_async, event_name, *args, **kwargs)
+                self.__run_subscribers(subscribers_async, event_name, deadline, *args, **kwargs)
             )
 
         if subscribers:
-            self.__run_subscribers_no_async(subscribers, event_name, *args, **kwargs)
+            self.__run_subscribers_no_async(subscribers, event_name, deadline, *args, **kwargs)
+
+    async def publish(self, event_name, *args, priority=PRIORITY_NORMAL, deadline=None, **kwargs):
+        """
+        Method for emitting an event with backpressure: waits for queue space
+        when the event uses the block overflow policy
+
+        :param event_name: Event name for emitting their subscribers
+        :param priority: Scheduling priority, lower values run first on configured events
+        :param deadline: time.monotonic() timestamp after which the event is dropped
+        """
+        if ENABLE_SUBSCRIBERS == "false":
+            return None
 
-    def __run_subscribers_no_async(self, subscribers, event_name, *args, **kwargs):
+        queues = self.__queues.get(event_name)
+        if not queues:
+            return self.emit(event_name, *args, priority=priority, deadline=deadline, **kwargs)
+        for queue in queues.values():
+            queue.start(self.event_loop)
+            await queue.put(args, kwargs, priority, deadline)
+
+    def close(self):
+        """
+        Method for stopping all queue workers
+        """
+        for queues in self.__queues.values():
+            for queue in queues.values():
+                queue.stop()
+
+    def __run_subscribers_no_async(self, subscribers, event_name, deadline, *args, **kwargs):
         # using threads pool to run sync subscribers
         for subscriber in subscribers:
             # thread = threading.Thread(target=subscriber, args=args, kwargs=kwargs)
             # thread.setDaemon(True)
             # thread.start()
-            self._pool.submit(subscriber, *args, **kwargs)
+            self._pool.submit(self.__run_before_deadline, subscriber, event_name, deadline, *args, **kwargs)
 
-    async def __run_subscribers(self, subscribers, event_name, *args, **kwargs):
+    @staticmethod
+    def __run_before_deadline(subscriber, event_name, deadline, *args, **kwargs):
+        # the pool may be busy, so the deadline is checked again when the thread picks it up
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+        start = time.perf_counter_ns()
+        try:
+            return subscriber(*args, **kwargs)
+        finally:
+            tracer.record(f"event_bus.{_subscriber_name(event_name, subscriber)}", time.perf_counter_ns() - start)
+
+    async def __run_subscribers(self, subscribers, event_name, deadline, *args, **kwargs):
+        if deadline is not None and time.monotonic() > deadline:
+            return None
         await asyncio.wait(
             [
-                asyncio.create_task(subscriber(*args, **kwargs))
+                asyncio.create_task(self.__run_timed(subscriber, event_name, *args, **kwargs))
                 for subscriber in subscribers
             ]
         )
+
+    @staticmethod
+    async def __run_timed(subscriber, event_name, *args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return await subscriber(*args, **kwargs)
+        finally:
+            tracer.record(f"event_bus.{_subscriber_name(event_name, subscriber)}", time.perf_counter_ns() - start)
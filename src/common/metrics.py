@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 直方图每个2的幂区间划分为 2^(SUB_BUCKET_BITS-1) 个线性子桶，相对误差约 1/32
+SUB_BUCKET_BITS = 6
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_SUB_BUCKET_HALF = _SUB_BUCKET_COUNT >> 1
+
+# 输出的分位点
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket_index(value: int) -> int:
+    """小于 _SUB_BUCKET_COUNT 的值精确计数，更大的值按 (指数, 尾数高位) 对数线性分桶"""
+    if value < _SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return _SUB_BUCKET_COUNT + (shift - 1) * _SUB_BUCKET_HALF + (value >> shift) - _SUB_BUCKET_HALF
+
+
+def _bucket_upper(index: int) -> int:
+    """桶内的最大值"""
+    if index < _SUB_BUCKET_COUNT:
+        return index
+    shift, offset = divmod(index - _SUB_BUCKET_COUNT, _SUB_BUCKET_HALF)
+    shift += 1
+    return ((offset + _SUB_BUCKET_HALF + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR风格的纳秒延迟直方图
+    记录为O(1)的整数运算，内存只随最大值的数量级增长
+    """
+    def __init__(self):
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int):
+        index = _bucket_index(value) if value > 0 else 0
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, quantile: float) -> int:
+        """返回不小于 quantile 比例样本的最小桶上界，结果不超过实际最大值"""
+        if not self.count:
+            return 0
+        target = max(1, int(quantile * self.count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Span:
+    """with语句计时，退出时记录到tracer"""
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.tracer.record(self.name, perf_counter_ns() - self.start)
+        return False
+
+
+class Tracer:
+    """
+    低开销的热路径计时
+    各阶段的耗时按名称记录到直方图，另外按交易digest统计从接收到提交交易的端到端延迟
+    所有时间戳均为 perf_counter_ns 的单调纳秒值
+    """
+    def __init__(self, enabled: bool = True, max_inflight: int = 10000):
+        self.enabled = enabled
+        self.max_inflight = max_inflight  # 等待提交的digest上限，超出时丢弃最早的
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._ingress: "OrderedDict[str, int]" = OrderedDict()
+
+    def record(self, name: str, duration_ns: int):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(duration_ns)
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def mark_ingress(self, digest: str, timestamp_ns: Optional[int] = None):
+        """记录交易进入系统的时间，重复的digest保留最早的时间"""
+        if not self.enabled or not digest or digest in self._ingress:
+            return
+        self._ingress[digest] = perf_counter_ns() if timestamp_ns is None else timestamp_ns
+        if len(self._ingress) > self.max_inflight:
+            self._ingress.popitem(last=False)
+
+    def mark_submit(self, digest: str) -> Optional[int]:
+        """记录由该交易触发的套利交易已提交，返回端到端延迟(纳秒)"""
+        start = self._ingress.pop(digest, None) if self.enabled else None
+        if start is None:
+            return None
+        latency = perf_counter_ns() - start
+        self.record("ingress_to_submit", latency)
+        return latency
+
+    def render(self) -> str:
+        """文本格式的统计，单位为微秒"""
+        header = ["name", "count", "mean_us", "min_us"] + [f"p{quantile * 100:g}_us" for quantile in PERCENTILES] + ["max_us"]
+        lines = [" ".join(header)]
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            values = [histogram.mean, histogram.min] + [histogram.percentile(q) for q in PERCENTILES] + [histogram.max]
+            lines.append(" ".join([name, str(histogram.count)] + [f"{value / 1000:.1f}" for value in values]))
+        return "\n".join(lines) + "\n"
+
+    async def dump_periodically(self, interval: float, output: Callable[[str], None] = logger.info):
+        """每隔interval秒输出一次统计"""
+        while True:
+            await asyncio.sleep(interval)
+            output(self.render())
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108) -> asyncio.AbstractServer:
+        """启动本地HTTP端点，任意路径都返回 render() 的文本"""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+                body = self.render().encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+                await writer.drain()
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+# 进程内共享的tracer
+tracer = Tracer()
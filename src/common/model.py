@@ -16,8 +16,10 @@ class Pool(TypedDict):
     token0: str
     token1: str
     dex: Dex
-    amount0: Decimal
-    amount1: Decimal
+    amount0: int  # 链上u64原始数量
+    amount1: int
     fee: Decimal
     token_in: str
-    token_out: str
\ No newline at end of file
+    token_out: str
+    object_version: int  # 链上对象版本，由DB维护
+    reserve_version: int  # 本地储备版本，每次储备变化递增
\ No newline at end of file
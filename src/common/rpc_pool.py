@@ -0,0 +1,302 @@
+import asyncio
+import itertools
+import json
+import logging
+import ssl
+import time
+from collections import deque
+from time import perf_counter
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from .metrics import tracer
+
+logger = logging.getLogger(__name__)
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class RpcError(Exception):
+    """JSON-RPC返回错误，或所有节点都请求失败"""
+
+
+class Endpoint:
+    """
+    单个RPC节点: 保持一组HTTP/1.1长连接，并记录延迟和健康状态
+    延迟按EWMA平滑用于路由，最近的样本用于计算对冲等待时间
+    """
+    def __init__(self, url: str, max_connections: int = 8, window: int = 256):
+        parsed = urlsplit(url)
+        self.url = url
+        self.host = parsed.hostname
+        self.ssl = ssl.create_default_context() if parsed.scheme == "https" else None
+        self.port = parsed.port or (443 if self.ssl else 80)
+        path = parsed.path or "/"
+        self.request_head = (f"POST {path} HTTP/1.1\r\nHost: {parsed.netloc}\r\n"
+                             "Content-Type: application/json\r\nConnection: keep-alive\r\n"
+                             "Content-Length: ").encode()
+        self.idle: Deque[Connection] = deque()  # 空闲长连接
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.ewma: Optional[float] = None  # 平滑后的延迟(秒)
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0  # 连续失败次数
+        self.ejections = 0  # 连续被剔除的次数，决定剔除时长
+        self.ejected_until = 0.0  # time.monotonic() 时间
+
+    def observe(self, latency: float, alpha: float):
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else alpha * latency + (1 - alpha) * self.ewma
+
+    def quantile(self, quantile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def score(self) -> float:
+        """越小越优先；没有样本的节点得分为0，保证新节点会被尝试"""
+        return (self.ewma or 0.0) * (1 + self.inflight)
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    async def open(self) -> Connection:
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+class RpcPool:
+    """
+    多节点JSON-RPC客户端
+    - 每个节点维护长连接池，避免每次请求重新握手
+    - 按EWMA延迟选择节点，首选节点在其p90延迟内未返回时向次优节点发出对冲请求，先返回者胜出
+    - 连续失败max_failures次的节点被剔除一段时间，多次剔除时时长指数增长
+    """
+    def __init__(self, urls: List[str],
+                 max_connections: int = 8,
+                 timeout: float = 2.0,
+                 hedge_quantile: float = 0.9,
+                 initial_hedge_delay: float = 0.1,
+                 min_hedge_delay: float = 0.005,
+                 min_samples: int = 10,
+                 max_failures: int = 3,
+                 eject_seconds: float = 5.0,
+                 ewma_alpha: float = 0.2):
+        if not urls:
+            raise ValueError("至少需要一个RPC节点")
+        self.endpoints = [Endpoint(url, max_connections) for url in urls]
+        self.timeout = timeout  # 单个节点的请求超时
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay  # 样本不足min_samples时使用的对冲等待时间
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.ewma_alpha = ewma_alpha
+        self.hedged = 0  # 发出对冲请求的次数
+        self.hedge_wins = 0  # 对冲请求先返回的次数
+        self._ids = itertools.count(1)
+
+    def ranked_endpoints(self) -> List[Endpoint]:
+        """健康节点按得分排序；全部被剔除时按恢复时间排序，总有节点可用"""
+        now = time.monotonic()
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy(now)]
+        ejected = [endpoint for endpoint in self.endpoints if not endpoint.is_healthy(now)]
+        healthy.sort(key=Endpoint.score)
+        ejected.sort(key=lambda endpoint: endpoint.ejected_until)
+        return healthy + ejected
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        if len(endpoint.latencies) < self.min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, endpoint.quantile(self.hedge_quantile))
+
+    async def call(self, method: str, params: Optional[List] = None) -> Any:
+        """发送JSON-RPC请求，返回result字段"""
+        body = json.dumps({"jsonrpc": "2.0", "id": next(self._ids), "method": method,
+                           "params": params or []}).encode()
+        candidates = self.ranked_endpoints()
+        tasks: Dict[asyncio.Task, Endpoint] = {}
+        started: Dict[asyncio.Task, float] = {}  # 各请求的发出时间
+        launched = 0
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal launched
+            endpoint = candidates[launched]
+            launched += 1
+            task = asyncio.create_task(self._timed_request(endpoint, body))
+            tasks[task] = endpoint
+            started[task] = perf_counter()
+
+        launch()
+        try:
+            with tracer.span(f"rpc.{method}"):
+                while tasks:
+                    timeout = None
+                    if not hedged and launched < len(candidates):
+                        timeout = self.hedge_delay(candidates[0])
+                    done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        # 首选节点超过p90仍未返回，向下一个节点发出对冲请求
+                        hedged = True
+                        self.hedged += 1
+                        launch()
+                        continue
+                    for task in done:
+                        endpoint = tasks.pop(task)
+                        if task.exception() is not None:
+                            last_error = task.exception()
+                            continue
+                        if hedged and endpoint is not candidates[0]:
+                            self.hedge_wins += 1
+                        self._penalize_losers(tasks, started, perf_counter() - started[task])
+                        return self._unwrap(task.result())
+                    # 请求失败且没有其他在途请求时立即换下一个节点
+                    if not tasks and launched < len(candidates):
+                        launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise RpcError(f"{method} 在所有节点上均失败: {last_error!r}")
+
+    def _penalize_losers(self, tasks: Dict[asyncio.Task, Endpoint], started: Dict[asyncio.Task, float],
+                         winner_latency: float):
+        """
+        对冲中落败、即将被取消的请求不作为真实延迟样本: 对冲请求发出较晚，其耗时只是发出后经过的时间，
+        记入会让慢节点排到前面。落败节点的延迟至少不低于胜者的延迟，按两者中较大者记一次样本
+        """
+        now = perf_counter()
+        for task, endpoint in tasks.items():
+            if not task.done():
+                endpoint.observe(max(now - started[task], winner_latency), self.ewma_alpha)
+
+    @staticmethod
+    def _unwrap(response: Dict) -> Any:
+        if "error" in response:
+            raise RpcError(response["error"])
+        return response.get("result")
+
+    async def _timed_request(self, endpoint: Endpoint, body: bytes) -> Dict:
+        """请求单个节点并更新其延迟和健康状态"""
+        endpoint.inflight += 1
+        endpoint.requests += 1
+        start = perf_counter()
+        try:
+            async with endpoint.semaphore:
+                response = await asyncio.wait_for(self._request(endpoint, body), self.timeout)
+        except asyncio.CancelledError:
+            # 被取消的请求没有完整的延迟，对冲落败者由 call 按胜者的延迟记录
+            raise
+        except Exception as e:
+            self._record_failure(endpoint, e)
+            raise
+        finally:
+            endpoint.inflight -= 1
+        endpoint.observe(perf_counter() - start, self.ewma_alpha)
+        endpoint.failures = 0
+        endpoint.ejections = 0
+        return response
+
+    def _record_failure(self, endpoint: Endpoint, error: BaseException):
+        endpoint.errors += 1
+        endpoint.failures += 1
+        if endpoint.failures >= self.max_failures:
+            duration = self.eject_seconds * (1 << min(endpoint.ejections, 5))
+            endpoint.ejected_until = time.monotonic() + duration
+            endpoint.ejections += 1
+            endpoint.close()
+            logger.warning(f"RPC节点{endpoint.url}连续失败{endpoint.failures}次，剔除{duration:.0f}秒: {error!r}")
+
+    async def _request(self, endpoint: Endpoint, body: bytes) -> Dict:
+        """复用空闲连接发送请求；空闲连接可能已被服务端关闭，失败时换新连接重试一次"""
+        while True:
+            reused = bool(endpoint.idle)
+            connection = endpoint.idle.pop() if reused else await endpoint.open()
+            try:
+                payload, keep_alive = await self._exchange(endpoint, connection, body)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                connection[1].close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                # 取消或超时时连接上可能还有未读完的响应，不能再复用
+                connection[1].close()
+                raise
+            if keep_alive:
+                endpoint.idle.append(connection)
+            else:
+                connection[1].close()
+            return json.loads(payload)
+
+    @staticmethod
+    async def _exchange(endpoint: Endpoint, connection: Connection, body: bytes) -> Tuple[bytes, bool]:
+        reader, writer = connection
+        writer.write(endpoint.request_head + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("连接已被服务端关闭")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get("connection") != "close"
+        if headers.get("transfer-encoding") == "chunked":
+            payload = await _read_chunked(reader)
+        elif "content-length" in headers:
+            payload = await reader.readexactly(int(headers["content-length"]))
+        else:
+            payload = await reader.read()
+            keep_alive = False
+        if status != 200:
+            raise RpcError(f"HTTP {status}: {payload[:200]!r}")
+        return payload, keep_alive
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": {
+                endpoint.url: {
+                    "ewma_ms": (endpoint.ewma or 0.0) * 1000,
+                    "p90_ms": (endpoint.quantile(0.9) or 0.0) * 1000,
+                    "requests": endpoint.requests,
+                    "errors": endpoint.errors,
+                    "inflight": endpoint.inflight,
+                    "idle_connections": len(endpoint.idle),
+                    "healthy": endpoint.is_healthy(now),
+                }
+                for endpoint in self.endpoints
+            },
+        }
+
+    async def close(self):
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";", 1)[0], 16)
+        if size == 0:
+            # 跳过trailer
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
@@ -1,6 +1,13 @@
 class Config:
     # Sui RPC节点配置
     SUI_RPC_URL = "https://fullnode.mainnet.sui.io:443"
+    # 共享RPC客户端使用的全部节点，按延迟路由并对慢请求发出对冲
+    SUI_RPC_URLS = [
+        SUI_RPC_URL,
+        "https://sui-rpc.publicnode.com:443",
+        "https://sui-mainnet-endpoint.blockvision.org:443",
+    ]
+    RPC_TIMEOUT = 2.0  # 单个节点的请求超时（秒）
     
     # 套利参数配置
     MIN_PROFIT_THRESHOLD = 0.01  # 最小利润阈值（以USD计）
@@ -13,5 +20,33 @@ class Config:
         "deepbook"
     ]
     
+    # 各DEX发出池子事件的package ID
+    DEX_PACKAGES = {
+        "cetus": "0x1eabed72c53feb3805120a081dc15963c204dc8d091542592abaf7a35689b2fb",
+        "turbos": "0x91bfbc386a41afcfd9b2533058d7e915a1d3829089cc268ff4333d54d6339ca1",
+        "kriya": "0xa0eba10b173538c8fecca1dff298e488402cc9ff374f8a12ca7758eebe830b66",
+    }
+    
+    # 代币定价的锚定稳定币(地址 -> 小数位数)，其余代币的价格由池子储备推导
+    PRICE_ANCHORS = {
+        "0xdba34672e30cb065b1f93e3ab55318768fd6fef66c15942c9f7cb846e2f900e7::usdc::USDC": 6,
+        "0xc060006111016b8a020ad5b33834984a437aaa7d3c74c18e09a95d48aceab08c::coin::COIN": 6,  # USDT
+    }
+    PRICE_MIN_LIQUIDITY_USD = 1000  # 流动性低于该值(USD)的池子不参与定价
+    
     # 监控配置
-    POLLING_INTERVAL = 1  # 区块监控间隔（秒） 
\ No newline at end of file
+    POLLING_INTERVAL = 1  # 区块监控间隔（秒） 
+    CHECKPOINT_CURSOR_PATH = "checkpoint_cursor"  # 最后处理的checkpoint序号，重启后从此继续
+    CHECKPOINT_FETCH_CONCURRENCY = 8  # 补齐落后的checkpoint时的并发获取数量
+    CHECKPOINT_DEAD_LETTER_PATH = "checkpoint_dead_letter"  # 反复处理失败而跳过的checkpoint序号及错误
+    DEDUP_TTL = 120  # 交易digest精确去重的保留时间（秒），更早的由Bloom过滤器覆盖
+    POOL_SNAPSHOT_PATH = "pool_snapshot.bin"  # 池子快照文件，启动时加载以跳过全量拉取
+    POOL_SNAPSHOT_INTERVAL = 30  # 后台写入池子快照的间隔（秒）
+    
+    # 策略配置
+    STRATEGY_DEADLINE = 0.5  # 每轮策略计算的时间预算（秒），超时的策略被取消
+    
+    # 延迟统计配置
+    METRICS_HOST = "127.0.0.1"
+    METRICS_PORT = 9108  # 本地统计端点，0表示不启动
+    METRICS_DUMP_INTERVAL = 60  # 定期输出统计的间隔（秒），0表示不输出
\ No newline at end of file
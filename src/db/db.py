@@ -1,21 +1,344 @@
-from typing import Dict,List
+import asyncio
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+import copy
+import logging
 from common.model import Pool
+from dex.events import EventDecoder, apply_event, object_versions
+
+logger = logging.getLogger(__name__)
+
+# 交易对索引键，两个代币按字典序排列，与方向无关
+PairKey = Tuple[str, str]
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def pair_key(token_a: str, token_b: str) -> PairKey:
+    return (token_a, token_b) if token_a <= token_b else (token_b, token_a)
+
+
+def copy_pool(pool: Pool) -> Pool:
+    """复制池子用于写入，CLMM池子的tick状态一并复制"""
+    pool = copy.copy(pool)
+    state = getattr(pool.dex, "state", None)
+    if state is not None:
+        pool.dex = copy.copy(pool.dex)
+        pool.dex.state = state.copy()
+    return pool
+
+
+class PoolSnapshot:
+    """
+    DB在某一时刻的只读视图
+    快照与DB共享数据，DB在快照之后第一次写入时才复制，快照中的池子对象不会再被修改
+    """
+    def __init__(self, pools: Dict[str, Pool], object_versions: Dict[str, int], pool_versions: Dict[str, int],
+                 by_token: Dict[str, FrozenSet[str]], by_pair: Dict[PairKey, FrozenSet[str]], change_seq: int):
+        self.pools = pools
+        self.object_versions = object_versions
+        self.pool_versions = pool_versions
+        self.by_token = by_token
+        self.by_pair = by_pair
+        self.change_seq = change_seq  # 快照对应的变更序号，可作为 changes_since 的游标
+
+    def get_pool(self, pool_id: str) -> Optional[Pool]:
+        return self.pools.get(pool_id)
+
+    def get_pools_by_token(self, token_address: str) -> List[Pool]:
+        return [self.pools[address] for address in self.by_token.get(token_address, _EMPTY)]
+
+    def get_pools_by_pair(self, token_a: str, token_b: str) -> List[Pool]:
+        return [self.pools[address] for address in self.by_pair.get(pair_key(token_a, token_b), _EMPTY)]
+
+    def get_all_pools(self) -> List[Pool]:
+        return list(self.pools.values())
+
+
 class DB:
-    def __init__(self):
-        self.db = {}
-    
-    #更新池子   
-    async def update_pool(self, transaction: Dict):
-        pass
-    
-    #获取池子
-    async def get_pool(self, pool_id: str) -> Dict:
-        pass
-    
+    """
+    内存中的池子存储
+    - 每个池子记录链上对象版本(object_versions)和单调递增的储备版本(pool_versions)
+    - 按地址、代币、交易对的O(1)索引
+    - 写时复制的快照: snapshot() 为O(1)，之后第一次写入复制字典，每个被修改的池子在本轮首次写入时复制一次
+    - 变更流: 每次池子变化分配一个递增序号，增量消费者用 changes_since 读取游标之后变化的池子
+    """
+    def __init__(self, quote_cache=None, event_decoder: Optional[EventDecoder] = None,
+                 fetch_pool_object: Optional[Callable[[str], Awaitable[Tuple[Pool, int]]]] = None,
+                 max_changes: int = 100_000):
+        self.db: Dict[str, Pool] = {}
+        self.pool_versions: Dict[str, int] = {}  # 池子地址 -> 储备版本，每次更新递增
+        self.quote_cache = quote_cache  # 策略共享的报价缓存，池子版本变化时同步失效
+        self.event_decoder = event_decoder  # 从交易事件中解码池子变化
+        self.fetch_pool_object = fetch_pool_object  # 通过RPC读取池子对象，返回 (池子, 对象版本)
+        self.object_versions: Dict[str, int] = {}  # 池子地址 -> 本地状态对应的链上对象版本
+        self.events_applied = 0  # 直接应用事件增量的次数
+        self.objects_fetched = 0  # 因版本跳跃而重新拉取对象的次数
+        self.stale_writes = 0  # 因对象版本不比本地新而丢弃的写入次数
+        # 二级索引，值为不可变集合，快照可以直接共享
+        self.by_token: Dict[str, FrozenSet[str]] = {}
+        self.by_pair: Dict[PairKey, FrozenSet[str]] = {}
+        # 变更流
+        self.change_seq = 0
+        self.changes: Deque[Tuple[int, str]] = deque(maxlen=max_changes)
+        # 写时复制状态，没有存活的快照时直接原地修改
+        self._snapshots: "weakref.WeakSet[PoolSnapshot]" = weakref.WeakSet()
+        self._shared = False  # 当前字典是否被最近的快照引用
+        self._owned: Set[str] = set()  # 最近一次快照之后新建或已复制过的池子，可以原地修改
+        # 池子新增/移除的订阅者，路径图等派生结构借此与存储保持同步
+        self.added_listeners: List[Callable[[Pool], Any]] = []
+        self.removed_listeners: List[Callable[[str], Any]] = []
+
+    #只读快照，策略在一轮计算中看到一致的储备
+    def snapshot(self) -> PoolSnapshot:
+        snapshot = PoolSnapshot(self.db, self.object_versions, self.pool_versions,
+                                self.by_token, self.by_pair, self.change_seq)
+        self._snapshots.add(snapshot)
+        self._shared = True
+        self._owned = set()
+        return snapshot
+
+    def _begin_write(self):
+        """快照之后的第一次写入复制所有字典，快照继续引用旧字典"""
+        if self._shared and len(self._snapshots):
+            self.db = dict(self.db)
+            self.object_versions = dict(self.object_versions)
+            self.pool_versions = dict(self.pool_versions)
+            self.by_token = dict(self.by_token)
+            self.by_pair = dict(self.by_pair)
+        self._shared = False
+
+    def _writable_pool(self, pool_address: str) -> Pool:
+        """返回可以原地修改的池子，仍被快照引用的池子先复制"""
+        self._begin_write()
+        pool = self.db[pool_address]
+        if pool_address not in self._owned and len(self._snapshots):
+            pool = self.db[pool_address] = copy_pool(pool)
+        self._owned.add(pool_address)
+        return pool
+
+    def _index(self, pool: Pool):
+        address = pool.address
+        for token in (pool.token0, pool.token1):
+            self.by_token[token] = self.by_token.get(token, _EMPTY) | {address}
+        key = pair_key(pool.token0, pool.token1)
+        self.by_pair[key] = self.by_pair.get(key, _EMPTY) | {address}
+
+    def _unindex(self, pool: Pool):
+        address = pool.address
+        for token in (pool.token0, pool.token1):
+            remaining = self.by_token.get(token, _EMPTY) - {address}
+            if remaining:
+                self.by_token[token] = remaining
+            else:
+                self.by_token.pop(token, None)
+        key = pair_key(pool.token0, pool.token1)
+        remaining = self.by_pair.get(key, _EMPTY) - {address}
+        if remaining:
+            self.by_pair[key] = remaining
+        else:
+            self.by_pair.pop(key, None)
+
+    #订阅池子的新增和移除，已有池子被新对象替换时不通知(储备变化走变更流)
+    def add_listener(self, on_added: Optional[Callable[[Pool], Any]] = None,
+                     on_removed: Optional[Callable[[str], Any]] = None):
+        if on_added is not None:
+            self.added_listeners.append(on_added)
+        if on_removed is not None:
+            self.removed_listeners.append(on_removed)
+
+    def _notify(self, listeners: List[Callable], arg):
+        for listener in listeners:
+            try:
+                listener(arg)
+            except Exception as e:
+                logger.error(f"池子订阅者处理{getattr(arg, 'address', arg)}失败: {e}")
+
+    #添加池子，version为池子对象的链上版本
+    def add_pool(self, pool: Pool, version: int):
+        self._begin_write()
+        old = self.db.get(pool.address)
+        if old is not None:
+            self._unindex(old)
+        self.db[pool.address] = pool
+        self._owned.add(pool.address)  # 新加入的对象不在任何快照中
+        self._index(pool)
+        pool.object_version = version
+        self.object_versions[pool.address] = version
+        self.bump_pool_version(pool.address)
+        if old is None:
+            self._notify(self.added_listeners, pool)
+
+    #批量添加池子(启动时从快照文件加载)，索引按代币合并后一次写入
+    def add_pools(self, pools: List[Tuple[Pool, int]]):
+        self._begin_write()
+        by_token: Dict[str, Set[str]] = {}
+        by_pair: Dict[PairKey, Set[str]] = {}
+        added: List[Pool] = []
+        for pool, version in pools:
+            old = self.db.get(pool.address)
+            if old is not None:
+                self._unindex(old)
+            else:
+                added.append(pool)
+            self.db[pool.address] = pool
+            self._owned.add(pool.address)
+            for token in (pool.token0, pool.token1):
+                by_token.setdefault(token, set()).add(pool.address)
+            by_pair.setdefault(pair_key(pool.token0, pool.token1), set()).add(pool.address)
+            pool.object_version = version
+            self.object_versions[pool.address] = version
+            self.bump_pool_version(pool.address)
+        for token, addresses in by_token.items():
+            self.by_token[token] = self.by_token.get(token, _EMPTY) | addresses
+        for key, addresses in by_pair.items():
+            self.by_pair[key] = self.by_pair.get(key, _EMPTY) | addresses
+        # 索引写完后再通知，订阅者看到的是完整的一批池子
+        for pool in added:
+            self._notify(self.added_listeners, pool)
+
+    #移除池子
+    def remove_pool(self, pool_address: str) -> Optional[Pool]:
+        if pool_address not in self.db:
+            return None
+        self._begin_write()
+        pool = self.db.pop(pool_address)
+        self._unindex(pool)
+        self.object_versions.pop(pool_address, None)
+        self._owned.discard(pool_address)
+        self.bump_pool_version(pool_address)
+        self._notify(self.removed_listeners, pool_address)
+        return pool
+
+    #更新池子
+    async def update_pool(self, transactions: List[Dict]):
+        """
+        根据交易事件更新池子储备，避免每个checkpoint都通过RPC重新读取池子对象
+        交易前的对象版本与本地版本一致时直接应用事件增量；本地版本落后(中间有未见到的交易)时拉取对象
+        effects中被修改但没有可解码事件的池子(FlowX、DeepBook等未登记解码器的DEX)同样拉取对象
+        先按交易顺序找出整批交易中需要拉取的池子并一次并发拉取(PoolRefresher合并为批量请求)，再按交易顺序应用事件
+        """
+        decoded = [self._decode_transaction(transaction) for transaction in transactions]
+        gaps = self._find_gaps(decoded)
+        if gaps:
+            await self._refetch_pools(gaps)
+        for pool_addresses, versions, events_by_pool in decoded:
+            for pool_address in pool_addresses:
+                events = events_by_pool.get(pool_address)
+                previous_version, new_version = versions.get(pool_address, (None, None))
+                local_version = self.object_versions.get(pool_address)
+                if pool_address not in self.db:
+                    continue
+                if new_version is not None and local_version is not None and local_version >= new_version:
+                    continue  # 已经应用过，或拉取到的对象已包含该交易
+                if not events or previous_version is None or local_version != previous_version:
+                    continue  # 已在上面拉取过，节点返回的版本仍落后时等池子下次被修改再补齐
+                pool = self._writable_pool(pool_address)
+                for event in events:
+                    apply_event(pool, event)
+                pool.object_version = new_version
+                self.object_versions[pool_address] = new_version
+                self.events_applied += 1
+                self.bump_pool_version(pool_address)
+
+    def _decode_transaction(self, transaction: Dict) -> Tuple[List[str], Dict[str, Tuple[int, int]], Dict]:
+        """返回 (交易修改的本地池子地址, 对象版本, 按池子分组的事件)"""
+        versions = object_versions(transaction.get("effects") or {})
+        events_by_pool = self.event_decoder.decode_transaction(transaction) if self.event_decoder else {}
+        pool_addresses = [address for address in versions if address in self.db]
+        pool_addresses += [address for address in events_by_pool if address in self.db and address not in versions]
+        return pool_addresses, versions, events_by_pool
+
+    #交易修改的本地池子地址，按effects和可解码事件判断，不修改池子
+    def pools_in_transaction(self, transaction: Dict) -> List[str]:
+        return self._decode_transaction(transaction)[0]
+
+    def _find_gaps(self, decoded: List[Tuple]) -> List[str]:
+        """按交易顺序推进各池子的版本，返回无法只靠事件补齐、需要拉取对象的池子(按首次出现的顺序)"""
+        expected: Dict[str, Optional[int]] = {}  # 本批中按事件推进后的版本
+        gaps: Dict[str, None] = {}
+        for pool_addresses, versions, events_by_pool in decoded:
+            for pool_address in pool_addresses:
+                if pool_address in gaps:
+                    continue
+                previous_version, new_version = versions.get(pool_address, (None, None))
+                local_version = expected.get(pool_address, self.object_versions.get(pool_address))
+                if new_version is not None and local_version is not None and local_version >= new_version:
+                    continue
+                if not events_by_pool.get(pool_address) or previous_version is None or local_version != previous_version:
+                    gaps[pool_address] = None
+                else:
+                    expected[pool_address] = new_version
+        return list(gaps)
+
+    #版本跳跃时重新读取池子对象，同时发出所有请求
+    async def _refetch_pools(self, pool_addresses: List[str]):
+        if self.fetch_pool_object is None:
+            logger.warning(f"池子{', '.join(pool_addresses)}版本不连续，且未配置对象拉取")
+            return
+        results = await asyncio.gather(*(self.fetch_pool_object(address) for address in pool_addresses),
+                                       return_exceptions=True)
+        for pool_address, result in zip(pool_addresses, results):
+            if isinstance(result, Exception):
+                logger.error(f"拉取池子{pool_address}失败: {result}")
+                continue
+            self.objects_fetched += 1
+            self.put_pool_if_newer(*result)
+
+    #写入RPC读取到的池子，对象版本不比本地新时丢弃，避免较早发出的请求覆盖较新的状态
+    def put_pool_if_newer(self, pool: Pool, version: int) -> bool:
+        local_version = self.object_versions.get(pool.address)
+        if local_version is not None and version <= local_version:
+            self.stale_writes += 1
+            return False
+        self.add_pool(pool, version)
+        return True
+
+    #池子储备变化后递增版本并记录到变更流，update_pool写入新储备后需要对每个被修改的池子调用
+    def bump_pool_version(self, pool_address: str) -> int:
+        self._begin_write()
+        version = self.pool_versions.get(pool_address, 0) + 1
+        self.pool_versions[pool_address] = version
+        if pool_address in self.db:
+            self._writable_pool(pool_address).reserve_version = version
+        self.change_seq += 1
+        self.changes.append((self.change_seq, pool_address))
+        if self.quote_cache is not None:
+            self.quote_cache.bump_version(pool_address)
+        return version
+
+    #变更流
+    def changes_since(self, cursor: int, until: Optional[int] = None) -> Tuple[int, Optional[Set[str]]]:
+        """
+        返回 (新游标, 序号在 (cursor, until] 之间变化过的池子地址)，until默认为最新序号
+        游标早于保留的变更记录时地址集合为None，消费者需要全量重建
+        """
+        until = self.change_seq if until is None else until
+        if cursor >= until:
+            return until, set()
+        if not self.changes or self.changes[0][0] > cursor + 1:
+            return until, None
+        changed = set()
+        for seq, pool_address in reversed(self.changes):
+            if seq <= cursor:
+                break
+            if seq <= until:
+                changed.add(pool_address)
+        return until, changed
+
     #获取池子
-    async def get_pool_by_token_address(self, token_address: str) -> Pool:
-        pass
-    
+    async def get_pool(self, pool_id: str) -> Optional[Pool]:
+        return self.db.get(pool_id)
+
+    #获取包含该代币的所有池子
+    async def get_pool_by_token_address(self, token_address: str) -> List[Pool]:
+        return [self.db[address] for address in self.by_token.get(token_address, _EMPTY)]
+
+    #获取该交易对的所有池子
+    def get_pools_by_pair(self, token_a: str, token_b: str) -> List[Pool]:
+        return [self.db[address] for address in self.by_pair.get(pair_key(token_a, token_b), _EMPTY)]
+
     #获取所有池子
     def get_all_pools(self) -> List[Pool]:
-        pass
+        return list(self.db.values())
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from common.model import Pool
+from common.rpc_pool import RpcPool
+from dex.objects import ObjectParser, object_version
+from .db import DB, copy_pool
+
+logger = logging.getLogger(__name__)
+
+# sui_multiGetObjects 单次最多查询的对象数量
+MULTI_GET_OBJECTS_LIMIT = 50
+
+
+class PoolRefresher:
+    """
+    基于DB的池子对象刷新服务
+    - 在window秒内收集待读取的对象ID，合并为不超过max_batch个对象的 sui_multiGetObjects 请求
+    - 同一对象已有请求在途时，后来的调用方等待同一个future(single-flight)
+    - 写回DB时检查对象版本，较早的响应不会覆盖较新的状态
+    """
+    def __init__(self, rpc: RpcPool, db: DB, object_parser: ObjectParser,
+                 window: float = 0.002, max_batch: int = MULTI_GET_OBJECTS_LIMIT):
+        self.rpc = rpc
+        self.db = db
+        self.object_parser = object_parser
+        self.window = window
+        self.max_batch = max_batch
+        self._inflight: Dict[str, asyncio.Future] = {}  # 对象ID -> 等待或正在读取的future
+        self._pending: List[str] = []  # 等待合并发送的对象ID
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.requested = 0  # fetch调用次数
+        self.coalesced = 0  # 合并到已有在途请求的次数
+        self.batches = 0  # 发出的RPC请求数
+
+    async def fetch(self, object_id: str) -> Optional[Dict]:
+        """读取对象数据(sui_multiGetObjects 返回的data字段)，对象不存在时返回None"""
+        self.requested += 1
+        future = self._inflight.get(object_id)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = self._inflight[object_id] = asyncio.get_running_loop().create_future()
+            self._pending.append(object_id)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        # 一个调用方被取消不应影响等待同一对象的其他调用方
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            asyncio.ensure_future(self._fetch_batch(batch))
+
+    async def _fetch_batch(self, object_ids: List[str]):
+        self.batches += 1
+        try:
+            results = await self.rpc.call("sui_multiGetObjects",
+                                          [object_ids, {"showType": True, "showContent": True}])
+        except Exception as e:
+            for object_id in object_ids:
+                future = self._inflight.pop(object_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # 返回结果与请求的对象ID顺序一致
+        for object_id, result in zip(object_ids, results):
+            future = self._inflight.pop(object_id)
+            if not future.done():
+                future.set_result(result.get("data"))
+        for object_id in object_ids[len(results):]:
+            future = self._inflight.pop(object_id)
+            if not future.done():
+                future.set_result(None)
+
+    async def fetch_pool_object(self, pool_address: str) -> Tuple[Pool, int]:
+        """读取池子对象并应用到本地池子的副本上，返回 (池子, 对象版本)，可作为 DB.fetch_pool_object"""
+        pool = self.db.db.get(pool_address)
+        if pool is None:
+            raise KeyError(f"本地没有池子{pool_address}")
+        data = await self.fetch(pool_address)
+        if data is None:
+            raise KeyError(f"池子对象{pool_address}不存在")
+        # 等待期间本地池子可能已被替换，以最新的本地池子为基础
+        pool = copy_pool(self.db.db.get(pool_address, pool))
+        if not self.object_parser.apply(pool, data):
+            raise ValueError(f"无法解析池子对象类型: {data.get('type')}")
+        return pool, object_version(data)
+
+    async def refresh(self, pool_address: str) -> Optional[Pool]:
+        """刷新单个池子并写回DB，返回刷新后DB中的池子"""
+        pool, version = await self.fetch_pool_object(pool_address)
+        self.db.put_pool_if_newer(pool, version)
+        return self.db.db.get(pool_address)
+
+    async def refresh_many(self, pool_addresses: List[str]) -> List[Optional[Pool]]:
+        """并发刷新多个池子，同一窗口内的请求合并为批量读取；单个池子失败时对应位置为None"""
+        results = await asyncio.gather(*(self.refresh(address) for address in pool_addresses),
+                                       return_exceptions=True)
+        pools = []
+        for address, result in zip(pool_addresses, results):
+            if isinstance(result, Exception):
+                logger.error(f"刷新池子{address}失败: {result}")
+                result = None
+            pools.append(result)
+        return pools
+
+    def stats(self) -> Dict:
+        return {
+            "requested": self.requested,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "inflight": len(self._inflight),
+            "stale_writes": self.db.stale_writes,
+        }
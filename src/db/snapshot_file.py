@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+from common.model import Pool
+from dex.clmm import ClmmDex, ClmmPoolState
+
+logger = logging.getLogger(__name__)
+
+# 池子快照文件格式(小端，所有列按8字节对齐)
+#   header: magic, 格式版本, 数据区crc32, checkpoint序号, 写入时间(毫秒), 池子数, tick数, 字符串数, 字符串区字节数
+#   池子列: 每列一个定长数组，第i个元素属于第i个池子
+#   tick列: 所有CLMM池子的tick依次排列，池子的 tick_start/tick_count 指向其区间
+#   字符串表: 偏移数组 + utf-8数据，池子列中的字符串字段保存为表中的下标，相同的代币地址只存一份
+# 加载时整个文件mmap到内存，各列通过 memoryview.cast 直接读取，不需要逐字段解析；u128/i128 拆成低64位和高64位两列
+
+MAGIC = b"SUIPOOLS"
+FORMAT_VERSION = 1
+NO_CHECKPOINT = (1 << 64) - 1
+
+_HEADER = struct.Struct("<8sIIQQIIII")
+_U64_MASK = (1 << 64) - 1
+
+# (列名, array类型码)
+POOL_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("address", "I"), ("token0", "I"), ("token1", "I"),
+    ("dex_name", "I"), ("router", "I"), ("dex_type", "I"), ("fee", "I"),
+    ("amount0", "Q"), ("amount1", "Q"), ("object_version", "Q"),
+    # CLMM状态，has_state为0的池子这些列无意义，为2表示tick未与链上同步
+    ("has_state", "B"), ("coin_a", "I"), ("coin_b", "I"),
+    ("sqrt_price_lo", "Q"), ("sqrt_price_hi", "Q"), ("liquidity_lo", "Q"), ("liquidity_hi", "Q"),
+    ("tick_current", "i"), ("fee_rate", "I"), ("tick_start", "I"), ("tick_count", "I"),
+)
+TICK_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("tick_index", "i"), ("liquidity_net_lo", "Q"), ("liquidity_net_hi", "Q"),
+)
+
+
+class StoredDex:
+    """从快照恢复的非CLMM DEX，v2池子的报价只需要名称和类型"""
+    def __init__(self, name: str, router: str, dex_type: str):
+        self.name = name
+        self.router = router
+        self.dex_type = dex_type
+
+
+class StoredPool:
+    """从快照恢复的池子"""
+    def __init__(self, address: str, token0: str, token1: str, dex, amount0: int, amount1: int, fee: Decimal):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.dex = dex
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.fee = fee
+
+
+@dataclass
+class LoadedSnapshot:
+    checkpoint: Optional[int]  # 快照对应的最后一个已处理checkpoint，启动后从下一个开始回放
+    created_ms: int
+    pools: List[Tuple[Pool, int]]  # (池子, 链上对象版本)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _split_u128(value: int) -> Tuple[int, int]:
+    value &= (1 << 128) - 1  # i128按补码存储
+    return value & _U64_MASK, value >> 64
+
+
+def _join_i128(low: int, high: int) -> int:
+    value = low | (high << 64)
+    return value - (1 << 128) if value >= 1 << 127 else value
+
+
+def write_snapshot_file(path: str, pools: List[Pool], object_versions: Dict[str, int],
+                        checkpoint: Optional[int] = None):
+    """把池子写入快照文件，先写临时文件再原子替换"""
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    columns = {name: array(typecode) for name, typecode in POOL_COLUMNS}
+    ticks = {name: array(typecode) for name, typecode in TICK_COLUMNS}
+    for pool in pools:
+        dex = pool.dex
+        columns["address"].append(intern(pool.address))
+        columns["token0"].append(intern(pool.token0))
+        columns["token1"].append(intern(pool.token1))
+        columns["dex_name"].append(intern(dex.name))
+        columns["router"].append(intern(getattr(dex, "router", "") or ""))
+        columns["dex_type"].append(intern(dex.dex_type))
+        columns["fee"].append(intern(str(getattr(pool, "fee", "0"))))
+        columns["amount0"].append(int(pool.amount0))
+        columns["amount1"].append(int(pool.amount1))
+        columns["object_version"].append(object_versions.get(pool.address, 0))
+
+        state: Optional[ClmmPoolState] = getattr(dex, "state", None)
+        columns["has_state"].append(0 if state is None else 1 if state.synced else 2)
+        columns["tick_start"].append(len(ticks["tick_index"]))
+        if state is None:
+            for name in ("coin_a", "coin_b", "sqrt_price_lo", "sqrt_price_hi", "liquidity_lo", "liquidity_hi",
+                         "tick_current", "fee_rate", "tick_count"):
+                columns[name].append(0)
+            continue
+        columns["coin_a"].append(intern(state.coin_a))
+        columns["coin_b"].append(intern(state.coin_b))
+        low, high = _split_u128(state.sqrt_price)
+        columns["sqrt_price_lo"].append(low)
+        columns["sqrt_price_hi"].append(high)
+        low, high = _split_u128(state.liquidity)
+        columns["liquidity_lo"].append(low)
+        columns["liquidity_hi"].append(high)
+        columns["tick_current"].append(state.tick_current)
+        columns["fee_rate"].append(state.fee_rate)
+        columns["tick_count"].append(len(state.tick_indexes))
+        ticks["tick_index"].extend(state.tick_indexes)
+        for liquidity_net in state.liquidity_nets:
+            low, high = _split_u128(liquidity_net)
+            ticks["liquidity_net_lo"].append(low)
+            ticks["liquidity_net_hi"].append(high)
+
+    encoded = [value.encode() for value in strings]
+    string_offsets = array("I", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    blob = b"".join(encoded)
+
+    sections = [columns[name].tobytes() for name, _ in POOL_COLUMNS]
+    sections += [ticks[name].tobytes() for name, _ in TICK_COLUMNS]
+    sections += [string_offsets.tobytes(), blob]
+    payload = bytearray()
+    for section in sections:
+        payload += section
+        payload += bytes(_align(len(payload)) - len(payload))
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, zlib.crc32(payload),
+                          NO_CHECKPOINT if checkpoint is None else checkpoint, int(time.time() * 1000),
+                          len(pools), len(ticks["tick_index"]), len(encoded), len(blob))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(bytes(_align(len(header)) - len(header)))
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot_file(path: str) -> LoadedSnapshot:
+    """读取快照文件并恢复池子，文件损坏或格式不符时抛出ValueError"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            return _decode(view)
+        finally:
+            view.release()
+
+
+def _decode(view: memoryview) -> LoadedSnapshot:
+    if len(view) < _HEADER.size:
+        raise ValueError("快照文件不完整")
+    (magic, version, crc, checkpoint, created_ms,
+     pool_count, tick_count, string_count, blob_size) = _HEADER.unpack_from(view)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"不支持的快照格式: {magic!r} v{version}")
+    payload = view[_align(_HEADER.size):]
+    offset = 0
+    sections = [payload]
+
+    def take(typecode: str, count: int) -> memoryview:
+        nonlocal offset
+        size = count * array(typecode).itemsize
+        if offset + size > len(payload):
+            raise ValueError("快照文件不完整")
+        column = payload[offset:offset + size].cast(typecode)
+        sections.append(column)
+        offset = _align(offset + size)
+        return column
+
+    try:
+        if zlib.crc32(payload) != crc:
+            raise ValueError("快照文件校验失败")
+        columns = {name: take(typecode, pool_count) for name, typecode in POOL_COLUMNS}
+        ticks = {name: take(typecode, tick_count) for name, typecode in TICK_COLUMNS}
+        string_offsets = take("I", string_count + 1)
+        blob = take("B", blob_size)
+        strings = [bytes(blob[string_offsets[i]:string_offsets[i + 1]]).decode() for i in range(string_count)]
+        pools = [_restore_pool(i, columns, ticks, strings) for i in range(pool_count)]
+    finally:
+        # mmap关闭前必须释放所有视图
+        for section in reversed(sections):
+            section.release()
+    return LoadedSnapshot(None if checkpoint == NO_CHECKPOINT else checkpoint, created_ms, pools)
+
+
+def _restore_pool(i: int, columns: Dict[str, memoryview], ticks: Dict[str, memoryview],
+                  strings: List[str]) -> Tuple[Pool, int]:
+    dex_name, router, dex_type = (strings[columns[name][i]] for name in ("dex_name", "router", "dex_type"))
+    if columns["has_state"][i]:
+        state = ClmmPoolState(
+            strings[columns["coin_a"][i]], strings[columns["coin_b"][i]],
+            sqrt_price=columns["sqrt_price_lo"][i] | (columns["sqrt_price_hi"][i] << 64),
+            tick_current=columns["tick_current"][i],
+            liquidity=columns["liquidity_lo"][i] | (columns["liquidity_hi"][i] << 64),
+            fee_rate=columns["fee_rate"][i],
+        )
+        start = columns["tick_start"][i]
+        end = start + columns["tick_count"][i]
+        state.tick_indexes.frombytes(ticks["tick_index"][start:end].cast("B"))
+        state.synced = columns["has_state"][i] == 1
+        state.liquidity_nets = [_join_i128(low, high) for low, high in
+                                zip(ticks["liquidity_net_lo"][start:end], ticks["liquidity_net_hi"][start:end])]
+        dex = ClmmDex(dex_name, router, state)
+        dex.dex_type = dex_type
+    else:
+        dex = StoredDex(dex_name, router, dex_type)
+    pool = StoredPool(
+        strings[columns["address"][i]], strings[columns["token0"][i]], strings[columns["token1"][i]], dex,
+        columns["amount0"][i], columns["amount1"][i], Decimal(strings[columns["fee"][i]]),
+    )
+    return pool, columns["object_version"][i]
+
+
+class SnapshotFileWriter:
+    """
+    定期把DB写入快照文件
+    在事件循环中取DB的写时复制快照和当前checkpoint游标，序列化和写文件在线程中进行，不阻塞事件循环
+    快照中的状态可能已包含游标之后checkpoint的部分更新，回放时DB会跳过已应用的对象版本
+    """
+    def __init__(self, db, path: str, checkpoint_source: Callable[[], Optional[int]], interval: float = 30.0):
+        self.db = db
+        self.path = path
+        self.checkpoint_source = checkpoint_source
+        self.interval = interval
+        self.written = 0
+
+    async def write_now(self):
+        snapshot = self.db.snapshot()
+        checkpoint = self.checkpoint_source()
+        started = time.monotonic()
+        await asyncio.to_thread(write_snapshot_file, self.path, snapshot.get_all_pools(),
+                                snapshot.object_versions, checkpoint)
+        self.written += 1
+        logger.info(f"池子快照已写入: {len(snapshot.pools)}个池子, checkpoint {checkpoint}, "
+                    f"耗时{time.monotonic() - started:.2f}秒")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write_now()
+            except Exception as e:
+                logger.error(f"写入池子快照失败: {e}")
@@ -0,0 +1,370 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional, Tuple
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cetus / Turbos 的价格均以 Q64.64 定点数表示的 sqrt(price) 存储
+Q64 = 1 << 64
+
+MIN_TICK = -443636
+MAX_TICK = 443636
+MIN_SQRT_PRICE_X64 = 4295048016
+MAX_SQRT_PRICE_X64 = 79226673515401279992447579055
+
+# 手续费率以百万分之一为单位
+FEE_RATE_DENOMINATOR = 1_000_000
+
+# sqrt(1.0001)^(-2^i) 的 Q64 定点表示，用于负tick
+_NEGATIVE_TICK_RATIOS = (
+    18445821805675392311, 18444899583751176498, 18443055278223354162, 18439367220385604838,
+    18431993317065449817, 18417254355718160513, 18387811781193591352, 18329067761203520168,
+    18212142134806087854, 17980523815641551639, 17526086738831147013, 16651378430235024244,
+    15030750278693429944, 12247334978882834399, 8131365268884726200, 3584323654723342297,
+    696457651847595233, 26294789957452057, 37481735321082, 76158723,
+)
+
+# sqrt(1.0001)^(2^i) 的 Q96 定点表示，用于正tick
+_POSITIVE_TICK_RATIOS = (
+    79232123823359799118286999567, 79236085330515764027303304731, 79244008939048815603706035061,
+    79259858533276714757314932305, 79291567232598584799939703904, 79355022692464371645785046466,
+    79482085999252804386437311141, 79736823300114093921829183326, 80248749790819932309965073892,
+    81282483887344747381513967011, 83390072131320151908154831281, 87770609709833776024991924138,
+    97234110755111693312479820773, 119332217159966728226237229890, 179736315981702064433883588727,
+    407748233172238350107850275304, 2098478828474011932436660412517, 55581415166113811149459800483533,
+    38992368544603139932233054999993551,
+)
+
+
+def get_sqrt_price_at_tick(tick: int) -> int:
+    """
+    计算 tick 对应的 Q64.64 sqrt价格，sqrt(1.0001^tick) * 2^64
+    与链上 tick_math 相同: 负tick在Q64精度下连乘，正tick在Q96精度下连乘后右移32位
+    """
+    if tick < MIN_TICK or tick > MAX_TICK:
+        raise ValueError(f"tick超出范围: {tick}")
+    abs_tick = abs(tick)
+    if tick < 0:
+        ratio = _NEGATIVE_TICK_RATIOS[0] if abs_tick & 0x1 else Q64
+        for bit in range(1, len(_NEGATIVE_TICK_RATIOS)):
+            if abs_tick & (1 << bit):
+                ratio = (ratio * _NEGATIVE_TICK_RATIOS[bit]) >> 64
+        return ratio
+
+    ratio = _POSITIVE_TICK_RATIOS[0] if abs_tick & 0x1 else 1 << 96
+    for bit in range(1, len(_POSITIVE_TICK_RATIOS)):
+        if abs_tick & (1 << bit):
+            ratio = (ratio * _POSITIVE_TICK_RATIOS[bit]) >> 96
+    return ratio >> 32
+
+
+def get_tick_at_sqrt_price(sqrt_price: int) -> int:
+    """计算满足 get_sqrt_price_at_tick(tick) <= sqrt_price 的最大tick"""
+    if sqrt_price < MIN_SQRT_PRICE_X64 or sqrt_price > MAX_SQRT_PRICE_X64:
+        raise ValueError(f"sqrt价格超出范围: {sqrt_price}")
+    # 先用浮点估算，再用精确的整数结果修正
+    tick = math.floor(2 * math.log(sqrt_price / Q64) / math.log(1.0001))
+    tick = max(MIN_TICK, min(MAX_TICK, tick))
+    while tick > MIN_TICK and get_sqrt_price_at_tick(tick) > sqrt_price:
+        tick -= 1
+    while tick < MAX_TICK and get_sqrt_price_at_tick(tick + 1) <= sqrt_price:
+        tick += 1
+    return tick
+
+
+def _div_round(numerator: int, denominator: int, round_up: bool) -> int:
+    quotient, remainder = divmod(numerator, denominator)
+    return quotient + 1 if round_up and remainder else quotient
+
+
+def get_delta_a(sqrt_price_0: int, sqrt_price_1: int, liquidity: int, round_up: bool) -> int:
+    """两个价格之间 token_a 的数量: L * |Δsqrt| * 2^64 / (sqrt0 * sqrt1)"""
+    delta = abs(sqrt_price_0 - sqrt_price_1)
+    if delta == 0 or liquidity == 0:
+        return 0
+    return _div_round((liquidity * delta) << 64, sqrt_price_0 * sqrt_price_1, round_up)
+
+
+def get_delta_b(sqrt_price_0: int, sqrt_price_1: int, liquidity: int, round_up: bool) -> int:
+    """两个价格之间 token_b 的数量: L * |Δsqrt| / 2^64"""
+    delta = abs(sqrt_price_0 - sqrt_price_1)
+    if delta == 0 or liquidity == 0:
+        return 0
+    return _div_round(liquidity * delta, Q64, round_up)
+
+
+def get_next_sqrt_price_from_input(sqrt_price: int, liquidity: int, amount: int, a2b: bool) -> int:
+    """投入 amount 后的sqrt价格，a2b时价格下降(向上取整)，b2a时价格上升(向下取整)"""
+    if amount == 0:
+        return sqrt_price
+    if a2b:
+        numerator = (liquidity * sqrt_price) << 64
+        denominator = (liquidity << 64) + amount * sqrt_price
+        return _div_round(numerator, denominator, True)
+    return sqrt_price + (amount << 64) // liquidity
+
+
+def get_next_sqrt_price_from_output(sqrt_price: int, liquidity: int, amount: int, a2b: bool) -> int:
+    """取出 amount 后的sqrt价格，a2b时取出token_b价格下降，b2a时取出token_a价格上升，均向远离当前价格的方向取整"""
+    if amount == 0:
+        return sqrt_price
+    if a2b:
+        return sqrt_price - _div_round(amount << 64, liquidity, True)
+    numerator = (liquidity * sqrt_price) << 64
+    denominator = (liquidity << 64) - amount * sqrt_price
+    if denominator <= 0:
+        raise ValueError(f"取出数量超过区间流动性: {amount}")
+    return _div_round(numerator, denominator, True)
+
+
+@dataclass
+class SwapStep:
+    sqrt_price_next: int
+    amount_in: int
+    amount_out: int
+    fee_amount: int
+
+
+def compute_swap_step(sqrt_price_current: int, sqrt_price_target: int, liquidity: int,
+                      amount_remaining: int, fee_rate: int, a2b: bool, by_amount_in: bool = True) -> SwapStep:
+    """
+    在单个tick区间内兑换，与链上 compute_swap_step 的取整方式一致
+    by_amount_in 时 amount_remaining 为剩余输入(含手续费)，先扣除手续费；否则为剩余的目标输出
+    输入数量和手续费向上取整，输出数量向下取整
+    """
+    if liquidity == 0:
+        return SwapStep(sqrt_price_target, 0, 0, 0)
+    if not by_amount_in:
+        return _compute_swap_step_by_amount_out(sqrt_price_current, sqrt_price_target, liquidity,
+                                                amount_remaining, fee_rate, a2b)
+
+    amount_remaining_less_fee = amount_remaining * (FEE_RATE_DENOMINATOR - fee_rate) // FEE_RATE_DENOMINATOR
+    if a2b:
+        max_amount_in = get_delta_a(sqrt_price_target, sqrt_price_current, liquidity, True)
+    else:
+        max_amount_in = get_delta_b(sqrt_price_current, sqrt_price_target, liquidity, True)
+
+    if max_amount_in > amount_remaining_less_fee:
+        # 在区间内耗尽输入
+        amount_in = amount_remaining_less_fee
+        fee_amount = amount_remaining - amount_remaining_less_fee
+        sqrt_price_next = get_next_sqrt_price_from_input(sqrt_price_current, liquidity, amount_in, a2b)
+    else:
+        # 到达区间边界
+        amount_in = max_amount_in
+        fee_amount = _div_round(amount_in * fee_rate, FEE_RATE_DENOMINATOR - fee_rate, True)
+        sqrt_price_next = sqrt_price_target
+
+    if a2b:
+        amount_out = get_delta_b(sqrt_price_current, sqrt_price_next, liquidity, False)
+    else:
+        amount_out = get_delta_a(sqrt_price_current, sqrt_price_next, liquidity, False)
+    return SwapStep(sqrt_price_next, amount_in, amount_out, fee_amount)
+
+
+def _compute_swap_step_by_amount_out(sqrt_price_current: int, sqrt_price_target: int, liquidity: int,
+                                     amount_remaining: int, fee_rate: int, a2b: bool) -> SwapStep:
+    """按目标输出兑换: 区间内能取出的数量不足时到达边界，否则按剩余输出求新价格，再反推所需输入"""
+    if a2b:
+        max_amount_out = get_delta_b(sqrt_price_target, sqrt_price_current, liquidity, False)
+    else:
+        max_amount_out = get_delta_a(sqrt_price_current, sqrt_price_target, liquidity, False)
+
+    if max_amount_out > amount_remaining:
+        amount_out = amount_remaining
+        sqrt_price_next = get_next_sqrt_price_from_output(sqrt_price_current, liquidity, amount_out, a2b)
+    else:
+        amount_out = max_amount_out
+        sqrt_price_next = sqrt_price_target
+
+    if a2b:
+        amount_in = get_delta_a(sqrt_price_next, sqrt_price_current, liquidity, True)
+    else:
+        amount_in = get_delta_b(sqrt_price_current, sqrt_price_next, liquidity, True)
+    fee_amount = _div_round(amount_in * fee_rate, FEE_RATE_DENOMINATOR - fee_rate, True)
+    return SwapStep(sqrt_price_next, amount_in, amount_out, fee_amount)
+
+
+@dataclass
+class SwapResult:
+    amount_in: int  # 实际消耗的输入(含手续费)
+    amount_out: int  # 按输出兑换时流动性不足则小于目标输出
+    fee_amount: int
+    sqrt_price_after: int
+    tick_after: int
+    liquidity_after: int
+    ticks_crossed: int
+
+
+class ClmmPoolState:
+    """
+    集中流动性池子的本地状态
+    已初始化的tick按索引有序存储在数组中，跨tick时用二分查找定位下一个边界
+    """
+    def __init__(self, coin_a: str, coin_b: str, sqrt_price: int, tick_current: int,
+                 liquidity: int, fee_rate: int):
+        self.coin_a = coin_a
+        self.coin_b = coin_b
+        self.sqrt_price = sqrt_price
+        self.tick_current = tick_current
+        self.liquidity = liquidity
+        self.fee_rate = fee_rate
+        self.tick_indexes = array('i')  # 有序的已初始化tick索引
+        self.liquidity_nets: List[int] = []  # 与tick_indexes对齐的净流动性(i128)
+        # tick数组是否与链上一致。错过事件后重新拉取池子对象只能得到价格和活跃流动性，
+        # tick保存在动态字段中无法一并刷新，此时置为False，报价和路径搜索跳过该池子，直到 load_ticks 重新加载
+        self.synced = True
+
+    def set_tick(self, tick_index: int, liquidity_net: int):
+        """新增、更新或(liquidity_net为0时)删除一个已初始化的tick"""
+        position = bisect_left(self.tick_indexes, tick_index)
+        exists = position < len(self.tick_indexes) and self.tick_indexes[position] == tick_index
+        if liquidity_net == 0:
+            if exists:
+                del self.tick_indexes[position]
+                del self.liquidity_nets[position]
+        elif exists:
+            self.liquidity_nets[position] = liquidity_net
+        else:
+            self.tick_indexes.insert(position, tick_index)
+            self.liquidity_nets.insert(position, liquidity_net)
+
+    def copy(self) -> "ClmmPoolState":
+        """复制状态，tick数组不与原状态共享"""
+        state = ClmmPoolState(self.coin_a, self.coin_b, self.sqrt_price, self.tick_current,
+                              self.liquidity, self.fee_rate)
+        state.tick_indexes = array('i', self.tick_indexes)
+        state.liquidity_nets = list(self.liquidity_nets)
+        state.synced = self.synced
+        return state
+
+    def load_ticks(self, ticks: List[Tuple[int, int]]):
+        """用链上读取的全部已初始化tick (tick索引, 净流动性) 替换本地tick数组，状态恢复为已同步"""
+        ticks = sorted((tick_index, liquidity_net) for tick_index, liquidity_net in ticks if liquidity_net)
+        self.tick_indexes = array('i', [tick_index for tick_index, _ in ticks])
+        self.liquidity_nets = [liquidity_net for _, liquidity_net in ticks]
+        self.synced = True
+
+    def liquidity_net(self, tick_index: int) -> int:
+        position = bisect_left(self.tick_indexes, tick_index)
+        if position < len(self.tick_indexes) and self.tick_indexes[position] == tick_index:
+            return self.liquidity_nets[position]
+        return 0
+
+    def update_position(self, tick_lower: int, tick_upper: int, liquidity_delta: int):
+        """增加(liquidity_delta为负时减少)区间 [tick_lower, tick_upper) 的流动性"""
+        self.set_tick(tick_lower, self.liquidity_net(tick_lower) + liquidity_delta)
+        self.set_tick(tick_upper, self.liquidity_net(tick_upper) - liquidity_delta)
+        if tick_lower <= self.tick_current < tick_upper:
+            self.liquidity += liquidity_delta
+
+    def move_to(self, sqrt_price: int, liquidity: Optional[int] = None, tick: Optional[int] = None):
+        """
+        将池子移动到链上兑换后的价格
+        事件未给出流动性时，按与 swap 相同的规则累加途经的已初始化tick的净流动性
+        """
+        if tick is None:
+            tick = get_tick_at_sqrt_price(sqrt_price)
+        if liquidity is None:
+            liquidity = self.liquidity
+            if tick < self.tick_current:
+                # 价格下降: 跨越 (tick, tick_current] 内的tick，减去净流动性
+                start = bisect_right(self.tick_indexes, tick)
+                end = bisect_right(self.tick_indexes, self.tick_current)
+                liquidity -= sum(self.liquidity_nets[start:end])
+            elif tick > self.tick_current:
+                # 价格上升: 跨越 (tick_current, tick] 内的tick，加上净流动性
+                start = bisect_right(self.tick_indexes, self.tick_current)
+                end = bisect_right(self.tick_indexes, tick)
+                liquidity += sum(self.liquidity_nets[start:end])
+        self.sqrt_price = sqrt_price
+        self.tick_current = tick
+        self.liquidity = liquidity
+
+    def swap(self, amount: int, a2b: bool, sqrt_price_limit: Optional[int] = None,
+             by_amount_in: bool = True) -> SwapResult:
+        """
+        在本地模拟多tick兑换，不修改池子状态
+        a2b: coin_a -> coin_b，价格下降
+        by_amount_in: amount 为输入金额(含手续费)，否则为目标输出金额
+        """
+        if sqrt_price_limit is None:
+            sqrt_price_limit = MIN_SQRT_PRICE_X64 if a2b else MAX_SQRT_PRICE_X64
+
+        sqrt_price, tick, liquidity = self.sqrt_price, self.tick_current, self.liquidity
+        amount_remaining = amount
+        amount_in = amount_out = fee_total = ticks_crossed = 0
+        tick_indexes = self.tick_indexes
+
+        while amount_remaining > 0 and sqrt_price != sqrt_price_limit:
+            # 二分查找价格移动方向上的下一个已初始化tick
+            if a2b:
+                position = bisect_right(tick_indexes, tick) - 1
+                next_tick = tick_indexes[position] if position >= 0 else None
+            else:
+                position = bisect_right(tick_indexes, tick)
+                next_tick = tick_indexes[position] if position < len(tick_indexes) else None
+
+            next_tick_sqrt_price = None if next_tick is None else get_sqrt_price_at_tick(next_tick)
+            if next_tick_sqrt_price is None:
+                sqrt_price_target = sqrt_price_limit
+            elif a2b:
+                sqrt_price_target = max(next_tick_sqrt_price, sqrt_price_limit)
+            else:
+                sqrt_price_target = min(next_tick_sqrt_price, sqrt_price_limit)
+
+            step = compute_swap_step(sqrt_price, sqrt_price_target, liquidity, amount_remaining, self.fee_rate,
+                                     a2b, by_amount_in)
+            amount_remaining -= step.amount_in + step.fee_amount if by_amount_in else step.amount_out
+            amount_in += step.amount_in + step.fee_amount
+            amount_out += step.amount_out
+            fee_total += step.fee_amount
+            sqrt_price = step.sqrt_price_next
+
+            if sqrt_price == next_tick_sqrt_price:
+                # 跨越tick: 价格下降时减去净流动性，上升时加上
+                liquidity_net = self.liquidity_nets[position]
+                liquidity = liquidity - liquidity_net if a2b else liquidity + liquidity_net
+                tick = next_tick - 1 if a2b else next_tick
+                ticks_crossed += 1
+            else:
+                tick = get_tick_at_sqrt_price(sqrt_price)
+
+        return SwapResult(
+            amount_in=amount_in,
+            amount_out=amount_out,
+            fee_amount=fee_total,
+            sqrt_price_after=sqrt_price,
+            tick_after=tick,
+            liquidity_after=liquidity,
+            ticks_crossed=ticks_crossed
+        )
+
+
+class ClmmDex:
+    """
+    Cetus / Turbos 等集中流动性池子的本地报价器，无需RPC往返
+    每个池子持有一个实例，实现 Dex 的 get_amount_out 接口
+    """
+    def __init__(self, name: str, router: str, state: ClmmPoolState):
+        self.name = name
+        self.router = router
+        self.dex_type = "clmm"
+        self.state = state
+
+    def get_amount_in(self, amount_out: Decimal, token_in: str, token_out: str) -> Decimal:
+        """取得 amount_out 所需的输入金额(含手续费)，池子流动性不足时抛出ValueError"""
+        a2b = token_in == self.state.coin_a
+        result = self.state.swap(int(amount_out), a2b, by_amount_in=False)
+        if result.amount_out < int(amount_out):
+            raise ValueError(f"池子流动性不足以输出 {amount_out}，最多 {result.amount_out}")
+        return Decimal(result.amount_in)
+
+    def get_amount_out(self, amount_in: Decimal, token_in: str, token_out: str) -> Decimal:
+        a2b = token_in == self.state.coin_a
+        result = self.state.swap(int(amount_in), a2b)
+        return Decimal(result.amount_out)
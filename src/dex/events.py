@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+EVENT_SWAP = "swap"
+EVENT_ADD_LIQUIDITY = "add_liquidity"
+EVENT_REMOVE_LIQUIDITY = "remove_liquidity"
+
+
+@dataclass
+class PoolEvent:
+    """从交易事件中解码出的池子变化，a/b 分别对应池子的 token0/token1"""
+    pool: str
+    kind: str
+    a2b: bool = True
+    amount_in: int = 0
+    amount_out: int = 0
+    amount_a: int = 0  # 流动性事件中两种代币的数量
+    amount_b: int = 0
+    sqrt_price_after: Optional[int] = None  # CLMM兑换后的价格
+    tick_after: Optional[int] = None
+    liquidity: Optional[int] = None  # 兑换事件: 兑换后的活跃流动性; 流动性事件: 变化量(正数)
+    tick_lower: Optional[int] = None
+    tick_upper: Optional[int] = None
+    reserve_a: Optional[int] = None  # 事件直接给出兑换后储备时使用
+    reserve_b: Optional[int] = None
+
+
+def _i32(value: Any) -> int:
+    """Move中的I32以 {"bits": u32} 的补码形式序列化"""
+    if isinstance(value, dict):
+        value = value["bits"]
+    value = int(value)
+    return value - (1 << 32) if value >= 1 << 31 else value
+
+
+def _decode_cetus_swap(data: Dict) -> PoolEvent:
+    return PoolEvent(
+        pool=data["pool"], kind=EVENT_SWAP, a2b=bool(data["atob"]),
+        amount_in=int(data["amount_in"]), amount_out=int(data["amount_out"]),
+        sqrt_price_after=int(data["after_sqrt_price"]),
+        reserve_a=int(data["vault_a_amount"]), reserve_b=int(data["vault_b_amount"])
+    )
+
+
+def _decode_cetus_liquidity(kind: str) -> Callable[[Dict], PoolEvent]:
+    def decode(data: Dict) -> PoolEvent:
+        return PoolEvent(
+            pool=data["pool"], kind=kind,
+            amount_a=int(data["amount_a"]), amount_b=int(data["amount_b"]),
+            liquidity=int(data["liquidity"]),
+            tick_lower=_i32(data["tick_lower"]), tick_upper=_i32(data["tick_upper"])
+        )
+    return decode
+
+
+def _decode_turbos_swap(data: Dict) -> PoolEvent:
+    a2b = bool(data["a_to_b"])
+    amount_a, amount_b = int(data["amount_a"]), int(data["amount_b"])
+    return PoolEvent(
+        pool=data["pool"], kind=EVENT_SWAP, a2b=a2b,
+        amount_in=amount_a if a2b else amount_b, amount_out=amount_b if a2b else amount_a,
+        sqrt_price_after=int(data["sqrt_price"]), tick_after=_i32(data["tick_current_index"]),
+        liquidity=int(data["liquidity"])
+    )
+
+
+def _decode_turbos_liquidity(kind: str) -> Callable[[Dict], PoolEvent]:
+    def decode(data: Dict) -> PoolEvent:
+        return PoolEvent(
+            pool=data["pool"], kind=kind,
+            amount_a=int(data["amount_a"]), amount_b=int(data["amount_b"]),
+            liquidity=int(data["liquidity_delta"]),
+            tick_lower=_i32(data["tick_lower_index"]), tick_upper=_i32(data["tick_upper_index"])
+        )
+    return decode
+
+
+def _decode_kriya_swap(data: Dict) -> PoolEvent:
+    # Kriya的兑换事件直接给出兑换后的储备，方向不影响结果
+    return PoolEvent(
+        pool=data["pool_id"], kind=EVENT_SWAP,
+        amount_in=int(data["amount_in"]), amount_out=int(data["amount_out"]),
+        reserve_a=int(data["reserve_x"]), reserve_b=int(data["reserve_y"])
+    )
+
+
+def _decode_kriya_liquidity(kind: str) -> Callable[[Dict], PoolEvent]:
+    def decode(data: Dict) -> PoolEvent:
+        return PoolEvent(pool=data["pool_id"], kind=kind,
+                         amount_a=int(data["amount_x"]), amount_b=int(data["amount_y"]))
+    return decode
+
+
+# (DEX, 模块, 事件结构体) -> 解码函数
+# FlowX 的 Swapped 事件不含池子ID，其池子在版本变化时走对象拉取
+EVENT_DECODERS: Dict[Tuple[str, str, str], Callable[[Dict], PoolEvent]] = {
+    ("cetus", "pool", "SwapEvent"): _decode_cetus_swap,
+    ("cetus", "pool", "AddLiquidityEvent"): _decode_cetus_liquidity(EVENT_ADD_LIQUIDITY),
+    ("cetus", "pool", "RemoveLiquidityEvent"): _decode_cetus_liquidity(EVENT_REMOVE_LIQUIDITY),
+    ("turbos", "pool", "SwapEvent"): _decode_turbos_swap,
+    ("turbos", "pool", "MintEvent"): _decode_turbos_liquidity(EVENT_ADD_LIQUIDITY),
+    ("turbos", "pool", "BurnEvent"): _decode_turbos_liquidity(EVENT_REMOVE_LIQUIDITY),
+    ("kriya", "spot_dex", "SwapEvent"): _decode_kriya_swap,
+    ("kriya", "spot_dex", "LiquidityAddedEvent"): _decode_kriya_liquidity(EVENT_ADD_LIQUIDITY),
+    ("kriya", "spot_dex", "LiquidityRemovedEvent"): _decode_kriya_liquidity(EVENT_REMOVE_LIQUIDITY),
+}
+
+
+class EventDecoder:
+    """按事件类型 package::module::Struct<...> 查找对应DEX的解码函数"""
+    def __init__(self, packages: Dict[str, str]):
+        self.packages = packages  # 事件package ID -> DEX名称
+
+    def decode(self, event: Dict) -> Optional[PoolEvent]:
+        package, module, struct = event["type"].split("<", 1)[0].split("::")
+        dex_name = self.packages.get(package)
+        decoder = EVENT_DECODERS.get((dex_name, module, struct))
+        if decoder is None:
+            return None
+        return decoder(event["parsedJson"])
+
+    def decode_transaction(self, transaction: Dict) -> Dict[str, List[PoolEvent]]:
+        """解码交易中的所有池子事件，按池子地址分组并保持事件顺序"""
+        events_by_pool: Dict[str, List[PoolEvent]] = {}
+        for event in transaction.get("events") or ():
+            try:
+                pool_event = self.decode(event)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"解码事件失败: {e}")
+                continue
+            if pool_event is not None:
+                events_by_pool.setdefault(pool_event.pool, []).append(pool_event)
+        return events_by_pool
+
+
+def object_versions(effects: Dict) -> Dict[str, Tuple[int, int]]:
+    """从交易effects中取出被修改对象的 (交易前版本, 交易后版本)"""
+    new_version = effects.get("lamportVersion")
+    versions = {}
+    for modified in effects.get("modifiedAtVersions") or ():
+        versions[modified["objectId"]] = (int(modified["sequenceNumber"]), int(new_version) if new_version else None)
+    for mutated in effects.get("mutated") or ():
+        reference = mutated["reference"]
+        previous = versions.get(reference["objectId"], (None, None))[0]
+        versions[reference["objectId"]] = (previous, int(reference["version"]))
+    return versions
+
+
+def apply_event(pool, event: PoolEvent):
+    """把事件的变化应用到本地池子，CLMM池子同时更新其本地tick状态"""
+    state = getattr(pool.dex, "state", None)
+    if event.kind == EVENT_SWAP:
+        if event.reserve_a is not None:
+            pool.amount0, pool.amount1 = event.reserve_a, event.reserve_b
+        elif event.a2b:
+            pool.amount0, pool.amount1 = pool.amount0 + event.amount_in, pool.amount1 - event.amount_out
+        else:
+            pool.amount0, pool.amount1 = pool.amount0 - event.amount_out, pool.amount1 + event.amount_in
+        if state is not None and event.sqrt_price_after is not None:
+            state.move_to(event.sqrt_price_after, event.liquidity, event.tick_after)
+        return
+
+    sign = 1 if event.kind == EVENT_ADD_LIQUIDITY else -1
+    pool.amount0 = pool.amount0 + sign * event.amount_a
+    pool.amount1 = pool.amount1 + sign * event.amount_b
+    if state is not None and event.tick_lower is not None:
+        state.update_position(event.tick_lower, event.tick_upper, sign * event.liquidity)
@@ -0,0 +1,72 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+from .events import _i32
+
+logger = logging.getLogger(__name__)
+
+
+def _fields(value: Any) -> Any:
+    """showContent返回的嵌套结构体形如 {"type": ..., "fields": {...}}"""
+    if isinstance(value, dict) and "fields" in value:
+        return value["fields"]
+    return value
+
+
+def _apply_cetus_pool(pool, fields: Dict):
+    pool.amount0, pool.amount1 = int(fields["coin_a"]), int(fields["coin_b"])
+    state = getattr(pool.dex, "state", None)
+    if state is not None:
+        state.sqrt_price = int(fields["current_sqrt_price"])
+        state.tick_current = _i32(_fields(fields["current_tick_index"]))
+        state.liquidity = int(fields["liquidity"])
+        state.fee_rate = int(fields["fee_rate"])
+        state.synced = False
+
+
+def _apply_turbos_pool(pool, fields: Dict):
+    pool.amount0, pool.amount1 = int(fields["coin_a"]), int(fields["coin_b"])
+    state = getattr(pool.dex, "state", None)
+    if state is not None:
+        state.sqrt_price = int(fields["sqrt_price"])
+        state.tick_current = _i32(_fields(fields["tick_current_index"]))
+        state.liquidity = int(fields["liquidity"])
+        state.fee_rate = int(fields["fee"])
+        state.synced = False
+
+
+def _apply_kriya_pool(pool, fields: Dict):
+    pool.amount0, pool.amount1 = int(fields["token_x"]), int(fields["token_y"])
+
+
+# (DEX, 模块, 结构体) -> 把池子对象的字段写入本地池子
+# 只刷新储备、价格和活跃流动性。CLMM的tick保存在动态字段中，对象中读不到，
+# 拉取对象意味着错过了事件，本地tick可能已过期，因此把CLMM状态标记为未同步
+POOL_OBJECT_PARSERS: Dict[Tuple[str, str, str], Callable[[Any, Dict], None]] = {
+    ("cetus", "pool", "Pool"): _apply_cetus_pool,
+    ("turbos", "pool", "Pool"): _apply_turbos_pool,
+    ("kriya", "spot_dex", "Pool"): _apply_kriya_pool,
+}
+
+
+class ObjectParser:
+    """按对象类型 package::module::Struct<...> 查找对应DEX的解析函数"""
+    def __init__(self, packages: Dict[str, str]):
+        self.packages = packages  # 池子类型的package ID -> DEX名称
+
+    def apply(self, pool, data: Dict) -> bool:
+        """把 sui_multiGetObjects 返回的对象数据写入池子，类型未登记时返回False"""
+        content = data.get("content") or {}
+        object_type = content.get("type") or data.get("type") or ""
+        parts = object_type.split("<", 1)[0].split("::")
+        if len(parts) != 3:
+            return False
+        parser = POOL_OBJECT_PARSERS.get((self.packages.get(parts[0]), parts[1], parts[2]))
+        if parser is None:
+            return False
+        parser(pool, content["fields"])
+        return True
+
+
+def object_version(data: Dict) -> Optional[int]:
+    version = data.get("version")
+    return int(version) if version is not None else None
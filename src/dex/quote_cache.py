@@ -0,0 +1,83 @@
+from collections import OrderedDict
+import threading
+from typing import Dict, List, Tuple
+from ..common.model import Pool
+from .swap_math import get_amount_out
+
+# 缓存键: (池子地址, 储备版本, 输入代币, 输入金额)
+QuoteKey = Tuple[str, int, str, int]
+
+
+class QuoteCache:
+    """
+    所有策略共享的报价缓存，避免同一轮中对相同池子和金额重复模拟兑换
+    键中包含池子的储备版本，DB更新池子时调用 bump_version，旧版本的报价不会再被命中，
+    并随LRU淘汰逐渐清出缓存
+    策略可能在线程池中并发运行，缓存的读写由锁保护，兑换计算本身在锁外进行
+    """
+    def __init__(self, max_size: int = 65536):
+        self.max_size = max_size
+        self.versions: Dict[str, int] = {}  # 池子地址 -> 储备版本
+        self._entries: "OrderedDict[QuoteKey, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def bump_version(self, pool_address: str) -> int:
+        """池子储备变化后递增版本，使该池子的已有报价失效"""
+        with self._lock:
+            version = self.versions.get(pool_address, 0) + 1
+            self.versions[pool_address] = version
+        return version
+
+    def get_amount_out(self, pool: Pool, amount_in: int) -> int:
+        """按池子的 token_in -> token_out 方向报价，未命中时用整数兑换公式计算并缓存"""
+        address = pool.address
+        # DB中的池子带有自身的储备版本，快照中的旧池子不会命中新版本的报价
+        version = getattr(pool, "reserve_version", None)
+        if version is None:
+            version = self.versions.get(address, 0)
+        key = (address, version, pool.token_in, amount_in)
+        entries = self._entries
+        with self._lock:
+            amount_out = entries.get(key)
+            if amount_out is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return amount_out
+            self.misses += 1
+
+        amount_out = get_amount_out(pool, amount_in)
+        with self._lock:
+            entries[key] = amount_out
+            if len(entries) > self.max_size:
+                entries.popitem(last=False)
+                self.evictions += 1
+        return amount_out
+
+    def get_path_amount_out(self, path: List[Pool], amount_in: int) -> int:
+        """沿路径逐跳报价，每一跳单独缓存，共享前缀的路径可以复用结果"""
+        amount = amount_in
+        for pool in path:
+            amount = self.get_amount_out(pool, amount)
+        return amount
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计，hits即节省的兑换模拟次数"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
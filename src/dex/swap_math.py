@@ -0,0 +1,110 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+from ..common.model import Pool
+from .clmm import FEE_RATE_DENOMINATOR, Q64
+
+# Move中的整数上限，链上超出会abort
+MAX_U64 = (1 << 64) - 1
+MAX_U128 = (1 << 128) - 1
+
+# 手续费以基点(万分之一)为单位
+BPS_DENOMINATOR = 10_000
+
+# CLMM的sqrt_price为Q64.64定点数
+_Q64 = float(Q64)
+
+
+@lru_cache(maxsize=256)
+def fee_to_bps(fee: Decimal) -> int:
+    """将小数形式的手续费率(如0.003)转换为基点，费率种类很少，结果缓存"""
+    return int(fee * BPS_DENOMINATOR)
+
+
+# 以下兑换函数的输出不会超过 reserve_out，因此只需检查输入是否在u64范围内
+
+def get_amount_out_fee_on_input(amount_in: int, reserve_in: int, reserve_out: int, fee_bps: int) -> int:
+    """
+    Uniswap V2 / FlowX 的取整方式: 手续费折算进分子分母，整体向下取整
+    out = amount_in * (10000 - fee) * reserve_out / (reserve_in * 10000 + amount_in * (10000 - fee))
+    """
+    if amount_in < 0 or amount_in > MAX_U64:
+        raise OverflowError(f"输入金额超出u64范围: {amount_in}")
+    amount_in_with_fee = amount_in * (BPS_DENOMINATOR - fee_bps)
+    return amount_in_with_fee * reserve_out // (reserve_in * BPS_DENOMINATOR + amount_in_with_fee)
+
+
+def get_amount_out_fee_deducted(amount_in: int, reserve_in: int, reserve_out: int, fee_bps: int) -> int:
+    """
+    先扣除手续费的取整方式(Kriya): 手续费向下取整后从输入中扣除，再按 x * y = k 向下取整
+    """
+    if amount_in < 0 or amount_in > MAX_U64:
+        raise OverflowError(f"输入金额超出u64范围: {amount_in}")
+    amount_in_after_fee = amount_in - amount_in * fee_bps // BPS_DENOMINATOR
+    return amount_in_after_fee * reserve_out // (reserve_in + amount_in_after_fee)
+
+
+# 各DEX的v2兑换公式，未登记的DEX按 Uniswap V2 的方式取整
+V2_SWAP_FUNCTIONS: Dict[str, Callable[[int, int, int, int], int]] = {
+    "flowx": get_amount_out_fee_on_input,
+    "kriya": get_amount_out_fee_deducted,
+}
+
+
+def get_amount_out(pool: Pool, amount_in: int) -> int:
+    """
+    按池子的 token_in -> token_out 方向计算整数输出金额
+    v2池子使用对应DEX的整数公式，CLMM池子使用本地tick模拟，其余交给DEX自己的报价
+    tick未同步的CLMM池子无法可靠报价，输出为0
+    """
+    dex = pool.dex
+    if dex.dex_type == "v2":
+        # 热路径，储备方向判断直接内联
+        if pool.token_in == pool.token0:
+            reserve_in, reserve_out = pool.amount0, pool.amount1
+        else:
+            reserve_in, reserve_out = pool.amount1, pool.amount0
+        swap = V2_SWAP_FUNCTIONS.get(dex.name, get_amount_out_fee_on_input)
+        return swap(amount_in, int(reserve_in), int(reserve_out), fee_to_bps(pool.fee))
+    state = getattr(dex, "state", None)
+    if dex.dex_type == "clmm" and state is not None:
+        if not state.synced:
+            return 0
+        return state.swap(amount_in, pool.token_in == state.coin_a).amount_out
+    return int(dex.get_amount_out(Decimal(amount_in), pool.token_in, pool.token_out))
+
+
+def get_path_amount_out(path: List[Pool], amount_in: int) -> int:
+    """沿路径逐跳计算最终输出金额"""
+    amount = amount_in
+    for pool in path:
+        amount = get_amount_out(pool, amount)
+    return amount
+
+
+def spot_rate(pool, token_in: str, after_fee: bool = False) -> Optional[float]:
+    """
+    池子的中间价: 1个原始单位的token_in可换得的另一代币原始单位数，无法计算时返回None
+    CLMM池子的储备字段是金库余额，不代表价格，按 sqrt_price 计算，手续费为 fee_rate(百万分之一)；
+    其余池子按储备比例计算，手续费为 pool.fee。after_fee 时返回扣除手续费后的边际汇率
+    """
+    state = getattr(getattr(pool, "dex", None), "state", None)
+    if state is not None:
+        if state.sqrt_price <= 0:
+            return None
+        price = (state.sqrt_price / _Q64) ** 2  # coin_b / coin_a
+        rate = price if token_in == state.coin_a else 1.0 / price
+        fee = state.fee_rate / FEE_RATE_DENOMINATOR
+    else:
+        if token_in == pool.token0:
+            reserve_in, reserve_out = float(pool.amount0), float(pool.amount1)
+        else:
+            reserve_in, reserve_out = float(pool.amount1), float(pool.amount0)
+        if reserve_in <= 0 or reserve_out <= 0:
+            return None
+        rate = reserve_out / reserve_in
+        fee = float(pool.fee) if after_fee else 0.0
+    if not after_fee:
+        return rate
+    fee_factor = 1.0 - fee
+    return rate * fee_factor if fee_factor > 0 else None
@@ -1,14 +1,14 @@
 from typing import Dict
-from pysui.sui.client import AsyncClient
-from pysui.sui.sui_config import SuiConfig
 from ..config import Config
 from ..common.event_bus import EventBus
 from ..token_price.token_price import TokenPriceProvider
 from ..strategy.strategies import Opportunity
+from ..common.metrics import tracer
+from ..common.rpc_pool import RpcPool
 class TransactionExecutor:
-    def __init__(self, config: Config,event_bus:EventBus,token_price_provider:TokenPriceProvider):
+    def __init__(self, config: Config,event_bus:EventBus,token_price_provider:TokenPriceProvider,rpc:RpcPool):
         self.config = config
-        self.client = AsyncClient(SuiConfig.from_rpc_url(config.SUI_RPC_URL))
+        self.rpc = rpc  # 与交易监控器共享的多节点RPC客户端
         self.event_bus = event_bus
         self.event_bus.add_event("arbitrage_opportunity",self.execute_arbitrage)
         self.token_price_provider = token_price_provider
@@ -29,7 +29,10 @@ class TransactionExecutor:
                 return False
                 
             # 发送交易
-            tx_result = await self._send_transaction(transaction)
+            with tracer.span("run_bot.submit"):
+                tx_result = await self._send_transaction(transaction)
+            for digest in arbitrage_opportunity.get("trigger_digests", []):
+                tracer.mark_submit(digest)
             
             return self._verify_transaction(tx_result)
             
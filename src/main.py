@@ -1,21 +1,32 @@
 import asyncio
 import logging
+import os
 from typing import Dict, Optional, List
 from config import Config
 from monitor.transaction_monitor import TransactionMonitor
 from analysis.price_impact import PriceImpactAnalyzer
 from strategy.strategies import Strategies
-from strategy.gradient_search_strategy import GradientSearchStrategy
+from strategy.gradient_search_strategy import GradientSearchStrategy, SEARCH_MODE_BATCHED
 from strategy.two_pool_arbitrage_strategy import TwoPoolArbitrageStrategy
+from strategy.closed_form_strategy import ClosedFormArbitrageStrategy
 
 from execution.transaction_executor import TransactionExecutor
-from db.db import DB
-from common.event_bus import EventBus
+from db.db import DB, PoolSnapshot
+from db.snapshot_file import SnapshotFileWriter, load_snapshot_file
+from db.pool_refresher import PoolRefresher
+from common.event_bus import EventBus, OVERFLOW_COALESCE, OVERFLOW_DROP_OLDEST, PRIORITY_BEST_EFFORT
+from common.metrics import tracer
+from common.rpc_pool import RpcPool
+from common.dedup import DigestDeduplicator
 from analysis.price_impact import TransactionFilters, PriceImpactFilter
 from analysis.price_impact import Pool
 from token_price.token_price import TokenPriceProvider
 from monitor.shio_feed_monitor import ShioFeedMonitor
 from path.path_finder import PathFinder, PathConfig
+from path.path_ranker import PathRanker, RankConfig
+from dex.quote_cache import QuoteCache
+from dex.events import EventDecoder
+from dex.objects import ObjectParser
 from decimal import Decimal
 logging.basicConfig(
     level=logging.INFO,
@@ -24,37 +35,87 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class AffectedPairsExtractor:
-    def __init__(self):
-        self.event_bus = EventBus(asyncio.get_event_loop())
+    """本轮交易修改的池子，加上DB变更流中上一轮之后储备变化过的池子(拉取对象、加载快照等不经过本轮交易的变化)"""
+    def __init__(self, db: DB):
+        self.db = db
+        self.cursor = db.change_seq
         
-    async def extract_affected_pairs(self, transactions: List[Dict]) -> List[Pool]:
-        pass
+    async def extract_affected_pairs(self, transactions: List[Dict], snapshot: PoolSnapshot) -> List[Pool]:
+        addresses = set()
+        for transaction in transactions:
+            addresses.update(self.db.pools_in_transaction(transaction))
+        # 只消费到快照为止的变更，快照之后的变化留给下一轮
+        self.cursor, changed = self.db.changes_since(self.cursor, snapshot.change_seq)
+        if changed is None:
+            logger.warning("变更流游标已过期，按全部池子处理")
+            return snapshot.get_all_pools()
+        addresses |= changed
+        return [pool for pool in map(snapshot.get_pool, addresses) if pool is not None]
 
 
     
 async def main():
     config = Config()
     
-    # 数据库
-    db = DB()
+    # 监控器发布交易、策略发布机会的事件总线，需在监控器之前创建
+    event_bus = EventBus(asyncio.get_event_loop())
+    
+    # 策略共享的报价缓存，池子更新时由DB使其失效
+    quote_cache = QuoteCache(max_size=65536)
+    
+    # 数据库，池子储备由交易事件增量更新
+    event_decoder = EventDecoder({package: dex_name for dex_name, package in config.DEX_PACKAGES.items()})
+    db = DB(quote_cache, event_decoder)
+    
+    # 监控器和执行器共享的多节点RPC客户端
+    rpc_pool = RpcPool(config.SUI_RPC_URLS, timeout=config.RPC_TIMEOUT)
+    
+    # 版本跳跃时的池子对象读取，同一时间窗口内的请求合并为批量读取
+    pool_refresher = PoolRefresher(rpc_pool, db, ObjectParser(event_decoder.packages))
+    db.fetch_pool_object = pool_refresher.fetch_pool_object
+    
+    # 同一笔交易先后从Shio拍卖和checkpoint到达时只触发一次策略
+    deduplicator = DigestDeduplicator(ttl=config.DEDUP_TTL)
     
     # 创建交易监控器
-    transaction_monitor = TransactionMonitor(config.SUI_RPC_URL,db)
-    shio_feed_monitor = ShioFeedMonitor()
-    transaction_monitor.start()
-    shio_feed_monitor.start()
+    transaction_monitor = TransactionMonitor(rpc_pool,db,event_bus,
+                                             cursor_path=config.CHECKPOINT_CURSOR_PATH,
+                                             max_concurrency=config.CHECKPOINT_FETCH_CONCURRENCY,
+                                             deduplicator=deduplicator,
+                                             dead_letter_path=config.CHECKPOINT_DEAD_LETTER_PATH)
+    shio_feed_monitor = ShioFeedMonitor(event_bus, deduplicator=deduplicator)
     
-    event_bus = EventBus(asyncio.get_event_loop())
+    # 从池子快照文件热启动，之后只回放快照之后的checkpoint
+    if os.path.exists(config.POOL_SNAPSHOT_PATH):
+        try:
+            loaded = load_snapshot_file(config.POOL_SNAPSHOT_PATH)
+            db.add_pools(loaded.pools)
+            if loaded.checkpoint is not None:
+                transaction_monitor.streamer.cursor = loaded.checkpoint
+            logger.info(f"从快照加载{len(loaded.pools)}个池子，从checkpoint {loaded.checkpoint}之后开始回放")
+        except (OSError, ValueError) as e:
+            logger.error(f"加载池子快照失败: {e}")
+    snapshot_writer = SnapshotFileWriter(db, config.POOL_SNAPSHOT_PATH,
+                                         lambda: transaction_monitor.streamer.cursor,
+                                         interval=config.POOL_SNAPSHOT_INTERVAL)
+    asyncio.create_task(snapshot_writer.run())
     
     # 交易过滤器
     transaction_filters = TransactionFilters()
     transaction_filters.add_filter(PriceImpactFilter())
-    affected_pairs_extractor = AffectedPairsExtractor()
+    affected_pairs_extractor = AffectedPairsExtractor(db)
+    
+    # 代币价格由池子储备推导，每轮只重算受变化池子影响的代币
+    token_price_provider = TokenPriceProvider(db, config.PRICE_ANCHORS, config.PRICE_MIN_LIQUIDITY_USD)
     
     # 策略
-    strategies = Strategies(event_bus)
+    strategies = Strategies(event_bus, quote_cache, deadline=config.STRATEGY_DEADLINE)
     strategies.add_strategy(TwoPoolArbitrageStrategy(token_price_provider=token_price_provider))
-    strategies.add_strategy(GradientSearchStrategy(token_price_provider=token_price_provider))
+    # v2路径使用解析解，其余池子类型回退到梯度搜索，所有路径堆叠成一个矩阵批量评估
+    strategies.add_strategy(ClosedFormArbitrageStrategy(
+        token_price_provider=token_price_provider,
+        fallback=GradientSearchStrategy(token_price_provider=token_price_provider, search_mode=SEARCH_MODE_BATCHED)
+    ))
     
     # 创建路径查找器
     path_config = PathConfig(
@@ -67,28 +128,64 @@ async def main():
     )
     
     path_finder = PathFinder(path_config,db)
+    # 启动之后由拉取对象或加载快照新增、移除的池子同步到路径图和环路索引
+    db.add_listener(on_added=path_finder.add_pool, on_removed=path_finder.remove_pool)
+    # 路径预排序，只把边际汇率最高的路径交给策略
+    path_ranker = PathRanker(RankConfig(min_cycle_rate=Decimal('1'), top_k=50))
 
-    token_price_provider = TokenPriceProvider()
     # 用于接收盈利的机会并执行交易
-    executor = TransactionExecutor(config,event_bus,token_price_provider)
+    executor = TransactionExecutor(config,event_bus,token_price_provider,rpc_pool)
     
     async def run_bot(transactions:List[Dict]):
         try:
             # 过滤交易
-            filterd_transactions = await transaction_filters.filter_transactions(transactions)
+            with tracer.span("run_bot.filter"):
+                filterd_transactions = await transaction_filters.filter_transactions(transactions)
+            # 本轮使用的储备快照，计算期间到达的更新不影响本轮结果
+            snapshot = db.snapshot()
+            # 策略按本轮快照的储备计算利润的USD价值
+            with tracer.span("run_bot.update_prices"):
+                token_price_provider.update_from_snapshot(snapshot)
             # 提取影响池
-            affected_pairs = await affected_pairs_extractor.extract_affected_pairs(filterd_transactions)
+            with tracer.span("run_bot.extract_affected_pairs"):
+                affected_pairs = await affected_pairs_extractor.extract_affected_pairs(filterd_transactions, snapshot)
             # 生成路径
-            path_list = await path_finder.find_paths(affected_pairs)
+            with tracer.span("run_bot.find_paths"):
+                path_list = path_finder.find_paths(affected_pairs)
+            # 丢弃汇率低于阈值的路径，保留top_k
+            with tracer.span("run_bot.rank_paths"):
+                path_list = path_ranker.rank_paths(path_list)
             # 寻找套利机会
-            await strategies.find_arbitrage_opportunities(path_list)
+            with tracer.span("run_bot.strategies"):
+                trigger_digests = [transaction.get("tx_hash") for transaction in filterd_transactions]
+                await strategies.find_arbitrage_opportunities(path_list, trigger_digests=trigger_digests)
+            logger.debug(f"报价缓存: {quote_cache.stats()}")
+            logger.debug(f"交易去重: {deduplicator.stats()}")
+            logger.debug(f"代币价格: {token_price_provider.stats()}")
         except Exception as e:
             logger.error(f"运行时发生错误: {e}")
     
+    # run_bot来不及处理时checkpoint轮询只保留最新一批交易，避免堆积的任务在过期储备上计算
+    # 每个拍卖都是不同的机会，不合并，只在队列满时挤掉轮询事件或最早的拍卖
+    # 拍卖事件优先于轮询事件处理，过了截止时间的拍卖不再处理
+    event_bus.configure_event(
+        "receive_transactions", max_size=64, policy=OVERFLOW_COALESCE, workers=1,
+        coalesce_priorities={PRIORITY_BEST_EFFORT}
+    )
+    event_bus.configure_event("arbitrage_opportunity", max_size=256, policy=OVERFLOW_DROP_OLDEST, workers=4)
     event_bus.add_event("receive_transactions", run_bot)
-    while True:
-        await token_price_provider.update_token_price()
-        await asyncio.sleep(10)
+    
+    # 订阅完成后再开始轮询checkpoint和接收拍卖，最早的交易不会在没有订阅者时丢失
+    monitor_task = asyncio.create_task(transaction_monitor.start(config.POLLING_INTERVAL))
+    asyncio.create_task(shio_feed_monitor.start())
+    
+    # 延迟统计: 本地HTTP端点和定期文本输出
+    if config.METRICS_PORT:
+        await tracer.serve(config.METRICS_HOST, config.METRICS_PORT)
+    if config.METRICS_DUMP_INTERVAL:
+        asyncio.create_task(tracer.dump_periodically(config.METRICS_DUMP_INTERVAL))
+    # 代币价格只在run_bot中按本轮快照更新；主协程等待checkpoint监控结束
+    await monitor_task
 
 if __name__ == "__main__":
     try:
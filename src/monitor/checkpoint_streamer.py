@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStreamer:
+    """
+    基于游标的checkpoint流
+    记录最后处理完成的checkpoint序号，每次轮询补齐从游标到最新序号之间的所有checkpoint。
+    区间内的checkpoint以有限并发预取，但严格按序号顺序交给处理函数；
+    游标在每个checkpoint处理完成后写入文件，重启后从下一个序号继续，既不重复也不遗漏。
+    处理失败时游标停在失败的checkpoint之前，下次轮询重试；连续失败 max_handle_failures 次后
+    记入死信文件并跳过，避免整条流卡在同一个序号上
+    """
+    def __init__(self,
+                 fetch_latest: Callable[[], Awaitable[int]],
+                 fetch_checkpoint: Callable[[int], Awaitable[Any]],
+                 handle_checkpoint: Callable[[int, Any], Awaitable[None]],
+                 cursor_path: Optional[str] = None,
+                 max_concurrency: int = 8,
+                 max_batch: int = 1000,
+                 max_retries: int = 3,
+                 retry_delay: float = 0.2,
+                 max_handle_failures: int = 5,
+                 dead_letter_path: Optional[str] = None):
+        self.fetch_latest = fetch_latest
+        self.fetch_checkpoint = fetch_checkpoint
+        self.handle_checkpoint = handle_checkpoint
+        self.cursor_path = cursor_path
+        self.max_concurrency = max_concurrency  # 同时预取的checkpoint数量上限
+        self.max_batch = max_batch  # 单次轮询最多补齐的checkpoint数量
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_handle_failures = max_handle_failures  # 同一个checkpoint处理失败的次数上限
+        self.dead_letter_path = dead_letter_path  # 跳过的checkpoint序号及错误，供事后回放
+        self.handle_failures = 0  # 游标之后的checkpoint连续处理失败的次数
+        self.dead_letters: List[int] = []  # 本次运行中跳过的checkpoint序号
+        self.cursor: Optional[int] = self._load_cursor()  # 最后处理完成的序号
+        self.processed = 0  # 已处理的checkpoint数量(累计)
+
+    def _load_cursor(self) -> Optional[int]:
+        if not self.cursor_path or not os.path.exists(self.cursor_path):
+            return None
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError) as e:
+            logger.error(f"读取checkpoint游标失败: {e}")
+            return None
+
+    def _save_cursor(self):
+        """先写临时文件再原子替换，避免崩溃时留下损坏的游标"""
+        if not self.cursor_path:
+            return
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(self.cursor))
+        os.replace(tmp_path, self.cursor_path)
+
+    def _dead_letter(self, sequence: int, error: Exception):
+        """记录反复处理失败而跳过的checkpoint"""
+        logger.error(f"checkpoint {sequence}连续{self.handle_failures}次处理失败，记入死信后跳过: {error}")
+        self.dead_letters.append(sequence)
+        if not self.dead_letter_path:
+            return
+        try:
+            with open(self.dead_letter_path, "a") as f:
+                f.write(f"{sequence}\t{error!r}\n")
+        except OSError as e:
+            logger.error(f"写入checkpoint死信失败: {e}")
+
+    async def poll(self) -> int:
+        """
+        补齐游标之后到最新序号的checkpoint
+        首次运行(没有游标)时只处理最新的checkpoint，不回溯历史
+        返回: 本次处理的checkpoint数量
+        """
+        latest = int(await self.fetch_latest())
+        start = latest if self.cursor is None else self.cursor + 1
+        if start > latest:
+            return 0
+        end = min(latest, start + self.max_batch - 1)
+        if end < latest:
+            logger.warning(f"落后{latest - start + 1}个checkpoint，本次只补齐到{end}")
+        return await self._stream_range(start, end)
+
+    async def _stream_range(self, start: int, end: int) -> int:
+        """滑动窗口预取 [start, end]，按顺序处理；某个checkpoint获取或处理失败时停在该处，下次轮询从这里继续"""
+        sequences = iter(range(start, end + 1))
+        window = deque()
+        for sequence in sequences:
+            window.append((sequence, asyncio.ensure_future(self._fetch_with_retry(sequence))))
+            if len(window) >= self.max_concurrency:
+                break
+
+        handled = 0
+        try:
+            while window:
+                sequence, task = window.popleft()
+                checkpoint = await task
+                next_sequence = next(sequences, None)
+                if next_sequence is not None:
+                    window.append((next_sequence, asyncio.ensure_future(self._fetch_with_retry(next_sequence))))
+
+                try:
+                    await self.handle_checkpoint(sequence, checkpoint)
+                except Exception as e:
+                    self.handle_failures += 1
+                    if self.handle_failures < self.max_handle_failures:
+                        logger.error(f"处理checkpoint {sequence}时发生错误"
+                                     f"({self.handle_failures}/{self.max_handle_failures})，游标停在{self.cursor}: {e}")
+                        break
+                    self._dead_letter(sequence, e)
+                self.handle_failures = 0
+                self.cursor = sequence
+                self._save_cursor()
+                handled += 1
+                self.processed += 1
+        except Exception as e:
+            logger.error(f"获取checkpoint失败，游标停在{self.cursor}: {e}")
+        finally:
+            for _, task in window:
+                task.cancel()
+        return handled
+
+    async def _fetch_with_retry(self, sequence: int) -> Any:
+        for attempt in range(self.max_retries):
+            try:
+                return await self.fetch_checkpoint(sequence)
+            except Exception:
+                if attempt == self.max_retries - 1:
+                    raise
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+    async def run(self, interval: float):
+        """持续轮询，每轮之间间隔interval秒；仍在追赶时不等待直接进入下一轮"""
+        while True:
+            try:
+                if await self.poll() >= self.max_batch:
+                    continue
+            except Exception as e:
+                logger.error(f"轮询checkpoint时发生错误: {e}")
+            await asyncio.sleep(interval)
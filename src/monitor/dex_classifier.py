@@ -0,0 +1,117 @@
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 索引值: (DEX名称, 匹配到的合约地址, 动作名称, 函数签名)，未知的部分为None
+IndexEntry = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+# 索引键: 合约地址(package ID)，或函数签名拆成的 (package, module, function)
+IndexKey = Union[str, Tuple[str, str, str]]
+
+
+def move_calls(transaction: Dict) -> List[Dict]:
+    """
+    sui_multiGetTransactionBlocks(showInput)返回的可编程交易中的MoveCall命令
+    位于 transaction.data.transaction.transactions[*].MoveCall，其余命令(SplitCoins、TransferObjects等)跳过
+    """
+    data = (transaction.get("transaction") or {}).get("data") or {}
+    commands = (data.get("transaction") or {}).get("transactions") or ()
+    return [command["MoveCall"] for command in commands if isinstance(command, dict) and "MoveCall" in command]
+
+
+class DexClassifier:
+    """
+    预编译的DEX交易分类器
+    启动时把合约地址(package ID)和函数签名(package, module, function)编入同一个哈希表，
+    分类时对每笔交易的MoveCall只遍历一次，按调用的字段直接查表，同时得到DEX、动作以及代币字段
+    """
+    def __init__(self, dex_contracts: Dict[str, Dict[str, str]], dex_functions: Dict[str, str]):
+        self.index: Dict[IndexKey, IndexEntry] = {}
+        address_to_dex: Dict[str, str] = {}
+        # 先登记的DEX优先，与配置顺序一致
+        for dex_name, contracts in dex_contracts.items():
+            for address in (contracts["pool"], contracts["router"]):
+                address_to_dex.setdefault(address, dex_name)
+                self.index.setdefault(address, (dex_name, address, None, None))
+        for action, signature in dex_functions.items():
+            parts = tuple(signature.split("::"))
+            if len(parts) != 3:
+                logger.warning(f"函数签名{signature}不是 package::module::function 形式，已忽略")
+                continue
+            dex_name = address_to_dex.get(parts[0])
+            self.index.setdefault(parts, (dex_name, parts[0] if dex_name else None, action, signature))
+
+    def _lookup(self, call: Dict) -> Optional[IndexEntry]:
+        """完整签名未登记时按package ID匹配合约"""
+        package = call.get("package")
+        entry = self.index.get((package, call.get("module"), call.get("function")))
+        if entry is None:
+            entry = self.index.get(package)
+        return entry
+
+    def classify(self, transaction: Dict) -> Optional[Dict]:
+        """识别并解析单笔交易，非DEX交易返回None"""
+        dex_entry = action_entry = swap_call = None
+        for call in move_calls(transaction):
+            entry = self._lookup(call)
+            if entry is None:
+                continue
+            if dex_entry is None and entry[0] is not None:
+                dex_entry = entry
+            if action_entry is None and entry[2] is not None:
+                action_entry = entry
+            if swap_call is None:
+                swap_call = call
+            if dex_entry is not None and action_entry is not None:
+                break
+        if dex_entry is None and action_entry is None:
+            return None
+
+        events = transaction.get("events") or []
+        timestamp = transaction.get("timestampMs")
+        return {
+            "tx_hash": transaction.get("digest"),
+            "timestamp": int(timestamp) if timestamp is not None else None,
+            "sender": transaction["transaction"]["data"].get("sender"),
+            "dex_info": {"name": dex_entry[0], "contract": dex_entry[1]} if dex_entry else {},
+            "function_info": {"name": action_entry[2], "signature": action_entry[3]} if action_entry else {},
+            "token_info": self._token_info(swap_call, events),
+            # 原样保留事件和effects，供DB按事件增量更新池子
+            "events": events,
+            "effects": transaction.get("effects") or {},
+        }
+
+    @staticmethod
+    def _token_info(call: Dict, events: List[Dict]) -> Dict:
+        """
+        代币取自命中调用的类型参数；MoveCall的参数只引用输入，金额从同一package发出的第一个带金额的事件中读取
+        """
+        type_arguments = call.get("type_arguments") or ()
+        amount_in = amount_out = 0
+        prefix = f"{call.get('package')}::"
+        for event in events:
+            parsed = event.get("parsedJson") or {}
+            if event.get("type", "").startswith(prefix) and "amount_in" in parsed:
+                amount_in, amount_out = int(parsed["amount_in"]), int(parsed.get("amount_out", 0))
+                break
+        return {
+            "token_in": type_arguments[0] if len(type_arguments) > 0 else "",
+            "token_out": type_arguments[1] if len(type_arguments) > 1 else "",
+            "amount_in": amount_in,
+            "amount_out": amount_out,
+        }
+
+    def classify_batch(self, transactions: List[Dict]) -> List[Dict]:
+        """批量处理整个checkpoint的交易，只返回DEX交易"""
+        classify = self.classify
+        parsed = []
+        for transaction in transactions:
+            try:
+                result = classify(transaction)
+            except Exception as e:
+                logger.error(f"解析DEX交易时发生错误: {e}")
+                continue
+            if result is not None:
+                parsed.append(result)
+        return parsed
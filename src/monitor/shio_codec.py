@@ -0,0 +1,109 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Optional, Union
+from ..common.metrics import tracer
+
+logger = logging.getLogger(__name__)
+
+# 可选的快速JSON解码器，优先orjson，其次msgspec，都未安装时使用标准库
+try:
+    import orjson
+    _loads: Callable[[Union[str, bytes]], Any] = orjson.loads
+    DECODER_NAME = "orjson"
+    DECODE_ERRORS: tuple = (orjson.JSONDecodeError,)
+except ImportError:
+    try:
+        import msgspec
+        _loads = msgspec.json.Decoder().decode
+        DECODER_NAME = "msgspec"
+        DECODE_ERRORS = (msgspec.DecodeError,)
+    except ImportError:
+        _loads = json.loads
+        DECODER_NAME = "json"
+        DECODE_ERRORS = (json.JSONDecodeError,)
+
+# 消息类型
+MESSAGE_PING = "ping"
+MESSAGE_AUCTION = "auction"
+MESSAGE_UNKNOWN = "unknown"
+
+
+@dataclass(slots=True)
+class AuctionStarted:
+    """auctionStarted 消息，只解析热路径用到的字段，其余保留在side_effects中"""
+    tx_digest: str
+    gas_price: int = 0
+    deadline_ms: Optional[int] = None  # 出价截止时间(毫秒时间戳)
+    side_effects: Dict = field(default_factory=dict)
+
+    def deadline(self) -> Optional[float]:
+        """将截止时间转换为 time.monotonic() 时间"""
+        if self.deadline_ms is None:
+            return None
+        return time.monotonic() + (self.deadline_ms / 1000 - time.time())
+
+
+@dataclass(slots=True)
+class ShioMessage:
+    kind: str
+    auction: Optional[AuctionStarted] = None
+
+
+def parse_message(data: Any) -> ShioMessage:
+    """把解码后的JSON转换为类型化的消息，缺少必要字段时抛出KeyError/TypeError/ValueError"""
+    if not isinstance(data, dict):
+        return ShioMessage(MESSAGE_UNKNOWN)
+    if data.get("type") == "ping":
+        return ShioMessage(MESSAGE_PING)
+    auction = data.get("auctionStarted")
+    if auction:
+        deadline_ms = auction.get("deadlineTimestampMs")
+        return ShioMessage(MESSAGE_AUCTION, AuctionStarted(
+            tx_digest=auction["txDigest"],
+            gas_price=int(auction.get("gasPrice") or 0),
+            deadline_ms=int(deadline_ms) if deadline_ms is not None else None,
+            side_effects=auction.get("sideEffects") or {},
+        ))
+    return ShioMessage(MESSAGE_UNKNOWN)
+
+
+class ShioMessageDecoder:
+    """
+    Shio Feed消息解码
+    每条消息的解码耗时记录到tracer的 shio.decode 直方图，同时累计条数、字节数和失败次数
+    """
+    def __init__(self, loads: Optional[Callable[[Union[str, bytes]], Any]] = None):
+        self.loads = loads or _loads
+        self.decoder_name = DECODER_NAME if loads is None else getattr(loads, "__module__", "custom")
+        self.decoded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.decode_ns = 0
+
+    def decode(self, message: Union[str, bytes]) -> Optional[ShioMessage]:
+        """解码失败返回None"""
+        start = perf_counter_ns()
+        try:
+            parsed = parse_message(self.loads(message))
+        except DECODE_ERRORS + (ValueError, KeyError, TypeError) as e:
+            self.failed += 1
+            logger.error("解析消息失败: %s", e)
+            return None
+        elapsed = perf_counter_ns() - start
+        self.decoded += 1
+        self.bytes += len(message)
+        self.decode_ns += elapsed
+        tracer.record("shio.decode", elapsed)
+        return parsed
+
+    def stats(self) -> Dict:
+        return {
+            "decoder": self.decoder_name,
+            "decoded": self.decoded,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "mean_decode_us": self.decode_ns / self.decoded / 1000 if self.decoded else 0.0,
+        }
@@ -2,17 +2,31 @@ import asyncio
 import json
 import logging
 import websockets
-from typing import Callable, Optional,List,Dict
+from time import perf_counter_ns
+from typing import Callable, Optional,List,Dict,Union
+from ..common.event_bus import EventBus, PRIORITY_CRITICAL
+from ..common.metrics import tracer
+from ..common.dedup import DigestDeduplicator
+from .shio_codec import AuctionStarted, ShioMessage, ShioMessageDecoder, MESSAGE_AUCTION, MESSAGE_PING
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ShioFeedMonitor:
-    def __init__(self,  proxy: Optional[str] = None):
+    def __init__(self, event_bus: EventBus, proxy: Optional[str] = None, queue_size: int = 64,
+                 decoder: Optional[ShioMessageDecoder] = None,
+                 deduplicator: Optional[DigestDeduplicator] = None):
+        self.event_bus = event_bus
         self.ws_url = "wss://rpc.getshio.com/feed"
         self.ws: Optional[websockets.WebSocketClientProtocol] = None
         self.is_running = False
         self.proxy = proxy
+        # 接收循环只负责解码和入队，处理在独立的worker中进行
+        self.decoder = decoder or ShioMessageDecoder()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0  # 队列满时丢弃的拍卖数量
+        self.worker: Optional[asyncio.Task] = None
+        self.deduplicator = deduplicator  # 与checkpoint监控共享的digest去重
         
     async def connect(self):
         """建立WebSocket连接"""
@@ -44,34 +58,74 @@ class ShioFeedMonitor:
             logger.error(f"连接Shio Feed失败: {e}")
             return False
     
-    def convert_message(self,message:str) -> List[Dict]:
-        """将消息转换为交易信息"""
-        pass
+    def convert_message(self, auction: AuctionStarted) -> List[Dict]:
+        """
+        将拍卖事件转换为与checkpoint交易相同结构的交易信息
+        sideEffects中的事件整理为RPC事件的格式(type/parsedJson)；没有事件的拍卖不会改变池子，返回空列表
+        交易尚未上链，effects不交给DB更新池子
+        """
+        events = [
+            {"type": event["eventType"], "parsedJson": event.get("eventData") or {}}
+            for event in auction.side_effects.get("events") or () if event.get("eventType")
+        ]
+        if not events:
+            return []
+        return [{
+            "tx_hash": auction.tx_digest,
+            "timestamp": None,
+            "sender": None,
+            "dex_info": {},
+            "function_info": {},
+            "token_info": {"token_in": "", "token_out": "", "amount_in": 0, "amount_out": 0},
+            "events": events,
+            "effects": {},
+            "gas_price": auction.gas_price,  # 跟单交易需要使用相同的gas价格
+        }]
     
-    async def monitor_transactions(self, message: str):
-        """处理接收到的消息"""
+    def _on_message(self, message: Union[str, bytes]) -> Optional[ShioMessage]:
+        """
+        在接收循环中解码消息，ping直接返回给调用方响应，拍卖事件放入处理队列
+        队列满时丢弃最早的拍卖：积压的旧拍卖大概率已经过了截止时间
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("收到消息: %s", message)
+        parsed = self.decoder.decode(message)
+        if parsed is None or parsed.kind != MESSAGE_AUCTION:
+            return parsed
+        auction = parsed.auction
+        if self.deduplicator is not None and self.deduplicator.is_duplicate(auction.tx_digest, "shio"):
+            return parsed
+        tracer.mark_ingress(auction.tx_digest)
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((perf_counter_ns(), auction))
+        return parsed
+    
+    async def monitor_transactions(self, auction: AuctionStarted):
+        """处理一个拍卖事件"""
         try:
-            data = json.loads(message)
-            
-            logger.debug(f"收到消息: {data}")
-                
-            # 处理ping消息
-            if data.get("type") == "ping":
-                await self.send_pong()
+            logger.info("收到拍卖事件: %s", auction.tx_digest)
+            transactions = self.convert_message(auction)
+            if not transactions:
                 return
-            
-            # 处理auction事件
-            if data.get("auctionStarted","") != "":
-                logger.info(f"收到拍卖事件: {data}")
-                transactions = self.convert_message(data)
 
-                self.event_bus.emit("receive_transactions", transactions)
-
-                    
-        except json.JSONDecodeError:
-            logger.error(f"解析消息失败: {message}")
+            # 拍卖有出价截止时间，以最高优先级调度，截止后未开始处理的事件直接丢弃
+            self.event_bus.emit("receive_transactions", transactions,
+                                priority=PRIORITY_CRITICAL, deadline=auction.deadline())
         except Exception as e:
             logger.error(f"处理消息时发生错误: {e}")
+    
+    async def _process_queue(self):
+        """处理队列中的拍卖事件，与接收循环相互独立，处理慢时不会阻塞socket读取"""
+        while True:
+            enqueued_at, auction = await self.queue.get()
+            tracer.record("shio.queue_wait", perf_counter_ns() - enqueued_at)
+            await self.monitor_transactions(auction)
+            
+    def stats(self) -> Dict:
+        """解码和队列统计"""
+        return dict(self.decoder.stats(), queued=self.queue.qsize(), dropped=self.dropped)
             
     async def send_pong(self):
         """响应ping消息"""
@@ -85,6 +139,8 @@ class ShioFeedMonitor:
     async def start(self):
         """启动监控"""
         self.is_running = True
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._process_queue())
         
         while self.is_running:
             try:
@@ -95,7 +151,9 @@ class ShioFeedMonitor:
                         continue
                         
                 async for message in self.ws:
-                    await self.monitor_transactions(message)
+                    parsed = self._on_message(message)
+                    if parsed is not None and parsed.kind == MESSAGE_PING:
+                        await self.send_pong()
                     
             except websockets.exceptions.ConnectionClosed:
                 logger.warning("WebSocket连接断开，尝试重连...")
@@ -107,6 +165,9 @@ class ShioFeedMonitor:
     async def stop(self):
         """停止监控"""
         self.is_running = False
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
         if self.ws:
             await self.ws.close()
             self.ws = None
@@ -1,14 +1,39 @@
-from typing import List, Dict, Set
-from pysui import AsyncClient
-from pysui import SuiConfig
+import asyncio
+import logging
+from typing import List, Dict, Set, Optional
+from time import perf_counter_ns
 from ..config import Config
 from abc import ABC, abstractmethod
 from .monitor import Monitor
+from .checkpoint_streamer import CheckpointStreamer
+from .dex_classifier import DexClassifier
 from ..db.db import DB
+from ..common.event_bus import EventBus, PRIORITY_BEST_EFFORT
+from ..common.metrics import tracer
+from ..common.rpc_pool import RpcPool
+from ..common.dedup import DigestDeduplicator
+
+logger = logging.getLogger(__name__)
+
+# sui_multiGetTransactionBlocks 单次最多查询的交易数量
+MULTI_GET_LIMIT = 50
+
 class TransactionMonitor(Monitor):
-    def __init__(self, rpc_url: str,db:DB):
-        self.client = AsyncClient(SuiConfig.from_rpc_url(rpc_url))
+    def __init__(self, rpc: RpcPool,db:DB,event_bus:EventBus,cursor_path:Optional[str]=None,max_concurrency:int=8,
+                 deduplicator:Optional[DigestDeduplicator]=None,dead_letter_path:Optional[str]=None):
+        self.rpc = rpc  # 与执行器共享的多节点RPC客户端
         self.db = db
+        self.event_bus = event_bus
+        self.deduplicator = deduplicator  # 与Shio监控共享，已从拍卖收到的交易不再重复触发策略
+        # 按游标逐个补齐checkpoint，游标持久化到cursor_path
+        self.streamer = CheckpointStreamer(
+            fetch_latest=self._fetch_latest,
+            fetch_checkpoint=self._fetch_checkpoint,
+            handle_checkpoint=self._handle_checkpoint,
+            cursor_path=cursor_path,
+            max_concurrency=max_concurrency,
+            dead_letter_path=dead_letter_path
+        )
         # DEX合约地址映射
         self.dex_contracts = {
             "turbos": {
@@ -31,178 +56,61 @@ class TransactionMonitor(Monitor):
             "add_liquidity": "0x...",
             "remove_liquidity": "0x..."
         }
+        # 合约地址和函数签名预编译为哈希索引
+        self.classifier = DexClassifier(self.dex_contracts, self.dex_functions)
+        
+    async def start(self, interval: float = Config.POLLING_INTERVAL):
+        """持续轮询checkpoint"""
+        await self.streamer.run(interval)
+        
+    async def _fetch_latest(self) -> int:
+        return int(await self.rpc.call("sui_getLatestCheckpointSequenceNumber"))
+        
+    async def _fetch_checkpoint(self, sequence: int) -> List[Dict]:
+        """读取checkpoint中的全部交易，包含输入、effects和事件"""
+        checkpoint = await self.rpc.call("sui_getCheckpoint", [str(sequence)])
+        digests = checkpoint["transactions"]
+        options = {"showInput": True, "showEffects": True, "showEvents": True}
+        batches = await asyncio.gather(*(
+            self.rpc.call("sui_multiGetTransactionBlocks", [digests[i:i + MULTI_GET_LIMIT], options])
+            for i in range(0, len(digests), MULTI_GET_LIMIT)
+        ))
+        return [transaction for batch in batches for transaction in batch]
         
     async def monitor_transactions(self):
         """
         监控链上交易，识别潜在的套利机会
+        处理从上次游标到最新checkpoint之间的所有checkpoint
         """
         try:
-            # 获取最新区块
-            latest_block = await self.client.get_latest_checkpoint_sequence_number()
-            
-            # 获取区块中的交易
-            transactions = await self.client.get_checkpoint(latest_block)
-            
-            # 过滤出DEX相关交易
-            dex_transactions = self._filter_dex_transactions(transactions)
-            
-            # 更新池子
-            await self.db.update_pool(dex_transactions)
-            
-            self.event_bus.emit("receive_transactions", dex_transactions)
-            
+            return await self.streamer.poll()
         except Exception as e:
-            print(f"监控交易时发生错误: {e}")
-            return []
+            logger.error(f"监控交易时发生错误: {e}")
+            return 0
             
-    def _filter_dex_transactions(self, transactions: List[Dict]) -> List[Dict]:
-        """
-        过滤出DEX相关的交易
-        """
-        filtered_txs = []
-        for tx in transactions:
-            if self._is_dex_transaction(tx):
-                # 解析交易详情
-                parsed_tx = self._parse_dex_transaction(tx)
-                if parsed_tx:
-                    filtered_txs.append(parsed_tx)
-        return filtered_txs
+    async def _handle_checkpoint(self, sequence: int, transactions: List[Dict]):
+        """按序号顺序处理单个checkpoint中的交易"""
+        ingress_ns = perf_counter_ns()
         
-    def _is_dex_transaction(self, transaction: Dict) -> bool:
-        """
-        判断是否为DEX交易
-        """
-        try:
-            # 检查交易目标地址是否是已知的DEX合约
-            target_addresses = self._extract_target_addresses(transaction)
-            for dex in self.dex_contracts.values():
-                if dex["pool"] in target_addresses or dex["router"] in target_addresses:
-                    return True
-                    
-            # 检查交易调用的函数是否是DEX相关函数
-            function_signature = self._extract_function_signature(transaction)
-            return function_signature in self.dex_functions.values()
-            
-        except Exception as e:
-            print(f"检查DEX交易时发生错误: {e}")
-            return False
-            
-    def _parse_dex_transaction(self, transaction: Dict) -> Dict:
-        """
-        解析DEX交易详情
-        """
-        try:
-            # 基础交易信息
-            parsed_tx = {
-                "tx_hash": transaction.get("digest"),
-                "timestamp": transaction.get("timestamp_ms"),
-                "sender": transaction.get("sender"),
-                "dex_info": self._get_dex_info(transaction),
-                "function_info": self._get_function_info(transaction),
-                "token_info": self._get_token_info(transaction)
-            }
-            
-            return parsed_tx
-            
-        except Exception as e:
-            print(f"解析DEX交易时发生错误: {e}")
-            return None
-            
-    def _extract_target_addresses(self, transaction: Dict) -> Set[str]:
-        """
-        提取交易的目标地址
-        """
-        addresses = set()
-        try:
-            # 从交易数据中提取所有目标地址
-            if "target" in transaction:
-                addresses.add(transaction["target"])
-            if "calls" in transaction:
-                for call in transaction["calls"]:
-                    if "target" in call:
-                        addresses.add(call["target"])
-        except Exception as e:
-            print(f"提取目标地址时发生错误: {e}")
-        return addresses
+        # 过滤出DEX相关交易
+        dex_transactions = self._filter_dex_transactions(transactions)
+        for transaction in dex_transactions:
+            tracer.mark_ingress(transaction["tx_hash"], ingress_ns)
         
-    def _extract_function_signature(self, transaction: Dict) -> str:
-        """
-        提取交易的函数签名
-        """
-        try:
-            if "function" in transaction:
-                return transaction["function"]
-            return ""
-        except Exception as e:
-            print(f"提取函数签名时发生错误: {e}")
-            return ""
-            
-    def _get_dex_info(self, transaction: Dict) -> Dict:
-        """
-        获取DEX相关信息
-        """
-        for dex_name, contracts in self.dex_contracts.items():
-            addresses = self._extract_target_addresses(transaction)
-            if contracts["pool"] in addresses or contracts["router"] in addresses:
-                return {
-                    "name": dex_name,
-                    "contract": contracts["pool"] if contracts["pool"] in addresses else contracts["router"]
-                }
-        return {}
+        # 更新池子，按全部交易的effects检查，经聚合器或未识别合约修改的池子也不会遗漏
+        await self.db.update_pool(transactions)
         
-    def _get_function_info(self, transaction: Dict) -> Dict:
-        """
-        获取函数调用信息
-        """
-        function_sig = self._extract_function_signature(transaction)
-        for fname, fsig in self.dex_functions.items():
-            if fsig == function_sig:
-                return {
-                    "name": fname,
-                    "signature": fsig
-                }
-        return {}
+        # 池子仍按全部交易更新，只去掉已经触发过策略的交易
+        if self.deduplicator is not None:
+            dex_transactions = self.deduplicator.filter(dex_transactions, "checkpoint")
+            if not dex_transactions:
+                return
         
-    def _get_token_info(self, transaction: Dict) -> Dict:
-        """
-        获取代币相关信息
-        """
-        try:
-            # 从交易输入数据中解析代币信息
-            return {
-                "token_in": self._parse_token_input(transaction),
-                "token_out": self._parse_token_output(transaction),
-                "amount_in": self._parse_amount_in(transaction),
-                "amount_out": self._parse_amount_out(transaction)
-            }
-        except Exception as e:
-            print(f"获取代币信息时发生错误: {e}")
-            return {}
+        # 轮询到的交易没有截止时间，让位于拍卖事件
+        self.event_bus.emit("receive_transactions", dex_transactions, priority=PRIORITY_BEST_EFFORT)
             
-    def _parse_token_input(self, transaction: Dict) -> str:
-        """
-        解析输入代币
-        """
-        # TODO: 实现输入代币解析逻辑
-        return ""
-        
-    def _parse_token_output(self, transaction: Dict) -> str:
-        """
-        解析输出代币
-        """
-        # TODO: 实现输出代币解析逻辑
-        return ""
-        
-    def _parse_amount_in(self, transaction: Dict) -> int:
-        """
-        解析输入金额
-        """
-        # TODO: 实现输入金额解析逻辑
-        return 0
-        
-    def _parse_amount_out(self, transaction: Dict) -> int:
+    def _filter_dex_transactions(self, transactions: List[Dict]) -> List[Dict]:
         """
-        解析输出金额
+        过滤出DEX相关的交易，识别与解析由预编译的分类器一次完成
         """
-        # TODO: 实现输出金额解析逻辑
-        return 0 
\ No newline at end of file
+        return self.classifier.classify_batch(transactions)
\ No newline at end of file
@@ -1,11 +1,22 @@
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Tuple
 from decimal import Decimal
+import copy
 import logging
+import math
 from dataclasses import dataclass
-from ..analysis.price_impact import Pool
+from ..common.model import Pool
 from ..db.db import DB
+from .pool_graph import PoolGraph, POOL_REMOVED, POOL_UNSYNCED, POOL_INDEX_EXCLUDED
 logger = logging.getLogger(__name__)
 
+# 环路中的一跳: (池子ID, 输入代币ID)
+Hop = Tuple[int, int]
+Cycle = Tuple[Hop, ...]
+
+# 路径搜索模式
+SEARCH_MODE_INDEX = "index"  # 预计算环路索引，枚举所有长度不超过max_path_length的环路
+SEARCH_MODE_NEGATIVE_CYCLE = "negative_cycle"  # 以-log(汇率)为边权，搜索负权环(即有利可图的环路)
+
 @dataclass
 class PathConfig:
     max_path_length: int = 3  # 最大路径长度
@@ -14,43 +25,89 @@ class PathConfig:
     start_tokens: List[str] = None  # 指定起始代币
     blacklist_tokens: Set[str] = None  # 黑名单代币
     blacklist_dexes: Set[str] = None  # 黑名单DEX
+    search_mode: str = SEARCH_MODE_INDEX  # 路径搜索模式
+    min_cycle_log_rate: float = 1e-9  # 负权环模式下环路对数汇率的最小值(汇率乘积需大于1)
 
 class PathFinder:
     def __init__(self, config: PathConfig, db: DB):
         self.config = config
-        self.pool_graph: Dict[str, Dict[str, List[Pool]]] = {}  # token_from -> token_to -> [pools]
+        self.graph = PoolGraph()  # 整数索引的池子图
+        self.cycle_index: Dict[int, Set[Cycle]] = {}  # pool_id -> 经过该池子的所有环路(规范形式)
+        self.duplicates_pruned = 0  # 搜索过程中被剪掉的重复环路数量(累计)
         self.db = db
         # 初始化时从数据库加载所有池子并构建图
         self._build_graph()
         
     def _build_graph(self):
-        """从数据库加载所有池子并构建图"""
-        self.pool_graph.clear()
-        all_pools = self.db.get_all_pools()
-        for pool in all_pools:
-            self.add_pool(pool)
+        """从数据库加载所有池子并构建图和环路索引"""
+        self.graph = PoolGraph()
+        self.cycle_index.clear()
+        all_pools = self.db.get_all_pools() or []
+        pool_ids = [self._register_pool(pool) for pool in all_pools]
+        # 批量建图后压缩一次邻接数组；新图的池子ID连续，每个环路在其ID最大的池子处被发现一次
+        self.graph.compact()
+        if self.config.search_mode == SEARCH_MODE_INDEX:
+            for pool_id in pool_ids:
+                self._index_cycles(pool_id, anchor=pool_id)
             
     def add_pool(self, pool: Pool):
-        """添加池子到图中"""
+        """添加池子到图中，并增量更新环路索引"""
+        if pool.address in self.graph.pool_ids:
+            self.remove_pool(pool.address)
+        pool_id = self._register_pool(pool)
+        if self.config.search_mode == SEARCH_MODE_INDEX:
+            # 池子ID可能复用自已移除的池子，不按ID限制其余池子；经过新池子的环路都是新的，不会重复
+            self._index_cycles(pool_id, anchor=len(self.graph.pools))
         
-        # 添加正向边
-        if pool.token0 not in self.pool_graph:
-            self.pool_graph[pool.token0] = {}
-        if pool.token1 not in self.pool_graph[pool.token0]:
-            self.pool_graph[pool.token0][pool.token1] = []
-        self.pool_graph[pool.token0][pool.token1].append(pool)
+    def remove_pool(self, pool_address: str) -> Optional[Pool]:
+        """从图中移除池子，并删除索引中所有经过该池子的环路"""
+        pool_id = self.graph.pool_ids.get(pool_address)
+        if pool_id is None:
+            return None
+        pool = self.graph.pools[pool_id]
+        self.graph.remove_pool(pool_address)
         
-        # 添加反向边
-        if pool.token1 not in self.pool_graph:
-            self.pool_graph[pool.token1] = {}
-        if pool.token0 not in self.pool_graph[pool.token1]:
-            self.pool_graph[pool.token1][pool.token0] = []
-        self.pool_graph[pool.token1][pool.token0].append(pool)
+        for cycle in self.cycle_index.pop(pool_id, ()):
+            for other_id, _ in cycle:
+                if other_id != pool_id:
+                    self.cycle_index[other_id].discard(cycle)
+        return pool
         
+    def _register_pool(self, pool: Pool) -> int:
+        """为池子和代币分配ID"""
+        for token in (pool.token0, pool.token1):
+            self.graph.intern_token(token, blacklisted=bool(self._is_blacklisted_token(token)))
+        pool_id = self.graph.add_pool(pool, blacklisted=bool(self._is_blacklisted_pool(pool)))
+        self.cycle_index[pool_id] = set()
+        return pool_id
+
+    def _index_cycles(self, pool_id: int, anchor: int):
+        """搜索经过该池子且其余池子ID都小于anchor的环路(两个方向)，加入索引"""
+        graph = self.graph
+        token0, token1 = graph.pool_token0[pool_id], graph.pool_token1[pool_id]
+        if (graph.pool_flags[pool_id] & POOL_INDEX_EXCLUDED or graph.token_blacklisted[token0]
+                or graph.token_blacklisted[token1]):
+            return
+
+        cycles: List[Cycle] = []
+        for token_in, token_out in ((token0, token1), (token1, token0)):
+            self._find_cycles(
+                start_token=token_in,
+                current_token=token_out,
+                current_path=[(pool_id, token_in)],
+                visited={token_in, token_out},
+                anchor=anchor,
+                cycles=cycles
+            )
+        for cycle in cycles:
+            cycle = self._canonical_cycle(cycle)
+            for cycle_pool_id, _ in cycle:
+                self.cycle_index[cycle_pool_id].add(cycle)
+
     def find_paths(self, affected_pools: List[Pool]) -> List[List[Pool]]:
         """
         根据受影响的池子寻找可能的套利路径
-        从数据库中的所有池子中搜索与受影响池子相关的套利路径
+        直接从环路索引中查找经过受影响池子的环路并合并
         """
         paths = []
         affected_tokens = set()
@@ -59,6 +116,8 @@ class PathFinder:
         for pool in affected_pools:
             affected_tokens.add(pool.token0)
             affected_tokens.add(pool.token1)
+            # 受影响池子的储备已变化，同步储备数组
+            self.graph.update_reserves(pool)
             
         # 如果有自定义路径，检查是否与受影响代币相关
         if self.config.custom_paths:
@@ -71,98 +130,203 @@ class PathFinder:
             if paths:  # 如果找到了相关的自定义路径，直接返回
                 return paths
             
-        # 从受影响的代币开始搜索路径
-        for start_token in affected_tokens:
-            if self._is_blacklisted_token(start_token):
+        if self.config.search_mode == SEARCH_MODE_NEGATIVE_CYCLE:
+            seed_tokens = {self.graph.token_ids[token] for token in affected_tokens
+                           if token in self.graph.token_ids}
+            for cycle in self._find_negative_cycles(seed_tokens):
+                paths.append(self._materialize_path(cycle))
+            return paths
+
+        # 合并所有受影响池子的环路，经过多个受影响池子的环路只保留一份
+        min_liquidity = float(self.config.min_liquidity)
+        liquidity = self.graph.pool_liquidity
+        pool_flags = self.graph.pool_flags
+        seen: Set[Cycle] = set()
+        for pool in affected_pools:
+            pool_id = self.graph.pool_ids.get(pool.address)
+            if pool_id is None:
                 continue
-            
-            # 从每个受影响的代币开始搜索
-            self._find_cycles(
-                start_token=start_token,
-                current_token=start_token,
-                current_path=[],
-                visited=set(),
-                paths=paths,
-                affected_pools=set(affected_pools)  # 转换为set以提高查找效率
-            )
+            for cycle in self.cycle_index[pool_id]:
+                if cycle in seen:
+                    self.duplicates_pruned += 1
+                    continue
+                seen.add(cycle)
+                # 流动性和tick同步状态随储备变化，在查询时检查
+                if all(liquidity[cycle_pool_id] >= min_liquidity and not pool_flags[cycle_pool_id] & POOL_UNSYNCED
+                       for cycle_pool_id, _ in cycle):
+                    paths.append(self._materialize_path(cycle))
             
         return paths
         
-    def _find_cycles(self, start_token: str, current_token: str, 
-                     current_path: List[Pool], visited: Set[str], 
-                     paths: List[List[Pool]], affected_pools: Set[Pool]):
-        """使用DFS寻找套利环路，优先考虑受影响的池子"""
+    def _find_cycles(self, start_token: int, current_token: int,
+                     current_path: List[Hop], visited: Set[int],
+                     anchor: int, cycles: List[Cycle]):
+        """在邻接数组上使用DFS寻找从current_token回到start_token的环路，只经过ID小于anchor的池子"""
+        graph = self.graph
+        offsets, ends = graph.offsets, graph.ends
+        neighbor_tokens, neighbor_pools = graph.neighbor_tokens, graph.neighbor_pools
+        pool_flags, token_blacklisted = graph.pool_flags, graph.token_blacklisted
+        can_extend = len(current_path) + 1 < self.config.max_path_length
         
-        # 如果路径长度达到上限，只检查是否可以回到起点
-        if len(current_path) >= self.config.max_path_length:
-            if start_token in self.pool_graph.get(current_token, {}):
-                # 找到一条回到起点的边
-                for pool in self.pool_graph[current_token][start_token]:
-                    if not self._is_blacklisted_pool(pool):
-                        # 确保路径中至少包含一个受影响的池子
-                        if any(p in affected_pools for p in current_path) or pool in affected_pools:
-                            paths.append(current_path + [pool])
-            return
-            
-        # 继续搜索
-        for next_token in self.pool_graph.get(current_token, {}):
-            if self._is_blacklisted_token(next_token):
+        for edge in range(offsets[current_token], ends[current_token]):
+            pool_id = neighbor_pools[edge]
+            if pool_id >= anchor or pool_flags[pool_id] & POOL_INDEX_EXCLUDED:
                 continue
-                
-            # 对于非最后一步，避免访问已访问的节点
-            if next_token != start_token and next_token in visited:
+            if any(pool_id == used_id for used_id, _ in current_path):
+                continue
+            next_token = neighbor_tokens[edge]
+
+            # 找到一条回到起点的边
+            if next_token == start_token:
+                cycles.append(tuple(current_path) + ((pool_id, current_token),))
                 continue
                 
-            # 优先考虑受影响的池子
-            pools = self.pool_graph[current_token][next_token]
-            # 将受影响的池子排在前面
-            sorted_pools = sorted(pools, 
-                                key=lambda p: p in affected_pools, 
-                                reverse=True)
-            
-            for pool in sorted_pools:
-                if self._is_blacklisted_pool(pool):
-                    continue
-                    
-                if not self._check_pool_liquidity(pool):
-                    continue
+            # 路径长度达到上限时不再继续搜索
+            if not can_extend or next_token in visited or token_blacklisted[next_token]:
+                continue
                     
-                # 继续搜索
-                visited.add(next_token)
-                current_path.append(pool)
+            visited.add(next_token)
+            current_path.append((pool_id, current_token))
                 
-                self._find_cycles(
-                    start_token=start_token,
-                    current_token=next_token,
-                    current_path=current_path,
-                    visited=visited,
-                    paths=paths,
-                    affected_pools=affected_pools
-                )
+            self._find_cycles(
+                start_token=start_token,
+                current_token=next_token,
+                current_path=current_path,
+                visited=visited,
+                anchor=anchor,
+                cycles=cycles
+            )
                 
-                current_path.pop()
-                visited.remove(next_token)
+            current_path.pop()
+            visited.remove(next_token)
+
+    def _find_negative_cycles(self, seed_tokens: Set[int]) -> List[Cycle]:
+        """
+        以 -log((1 - fee) * reserve_out / reserve_in) 为边权，从每个种子代币出发运行
+        限制跳数的Bellman-Ford(SPFA剪枝)，回到起点且总权重为负的环路即汇率乘积大于1的套利环路
+        每轮只扩展距离被改进的代币，单个种子的代价为 O(max_path_length * E)
+        """
+        graph = self.graph
+        offsets, ends = graph.offsets, graph.ends
+        neighbor_tokens, neighbor_pools = graph.neighbor_tokens, graph.neighbor_pools
+        pool_flags, token_blacklisted = graph.pool_flags, graph.token_blacklisted
+        min_liquidity = float(self.config.min_liquidity)
+        threshold = -self.config.min_cycle_log_rate
+        cycles: List[Cycle] = []
+        seen: Set[Cycle] = set()  # 不同种子代币会找到同一环路的不同旋转
+
+        for start_token in seed_tokens:
+            if token_blacklisted[start_token]:
+                continue
+            best = {start_token: 0.0}
+            frontier = {start_token: 0.0}
+            # layers[k][token] = (上一个代币, 池子ID)，用于回溯第k跳到达token的路径
+            layers: List[Dict[int, Tuple[int, int]]] = [{}]
+
+            for hop in range(1, self.config.max_path_length + 1):
+                next_frontier: Dict[int, float] = {}
+                layer: Dict[int, Tuple[int, int]] = {}
+                for token, distance in frontier.items():
+                    for edge in range(offsets[token], ends[token]):
+                        pool_id = neighbor_pools[edge]
+                        if pool_flags[pool_id] or graph.pool_liquidity[pool_id] < min_liquidity:
+                            continue
+                        log_rate = graph.log_rate(pool_id, token)
+                        if log_rate is None:
+                            continue
+                        next_token = neighbor_tokens[edge]
+                        weight = distance - log_rate
+
+                        if next_token == start_token:
+                            if hop >= 2 and weight < threshold:
+                                cycle = self._trace_cycle(layers, hop - 1, token, start_token, pool_id)
+                                if cycle is None:
+                                    continue
+                                cycle = self._canonical_cycle(cycle)
+                                if cycle in seen:
+                                    self.duplicates_pruned += 1
+                                    continue
+                                seen.add(cycle)
+                                cycles.append(cycle)
+                            continue
+
+                        if token_blacklisted[next_token] or weight >= best.get(next_token, math.inf):
+                            continue
+                        best[next_token] = weight
+                        next_frontier[next_token] = weight
+                        layer[next_token] = (token, pool_id)
+
+                if not next_frontier:
+                    break
+                layers.append(layer)
+                frontier = next_frontier
+
+        return cycles
+
+    def _trace_cycle(self, layers: List[Dict[int, Tuple[int, int]]], depth: int,
+                     last_token: int, start_token: int, closing_pool: int) -> Optional[Cycle]:
+        """沿前驱回溯出环路，代币或池子重复的非简单环路返回None"""
+        hops = [(closing_pool, last_token)]
+        token = last_token
+        for layer in range(depth, 0, -1):
+            previous_token, pool_id = layers[layer][token]
+            hops.append((pool_id, previous_token))
+            token = previous_token
+        hops.reverse()
+
+        tokens = [token_in for _, token_in in hops]
+        pool_ids = [pool_id for pool_id, _ in hops]
+        if len(set(tokens)) != len(tokens) or len(set(pool_ids)) != len(pool_ids):
+            return None
+        return tuple(hops)
+
+    @staticmethod
+    def _canonical_cycle(cycle: Cycle) -> Cycle:
+        """
+        环路的规范形式: 旋转到池子ID最小的一跳开始，保留方向
+        同一环路的所有旋转得到相同的规范形式，两个方向是不同的交易，不会合并
+        """
+        start = min(range(len(cycle)), key=lambda i: cycle[i][0])
+        return cycle[start:] + cycle[:start]
+
+    def _materialize_path(self, cycle: Cycle) -> List[Pool]:
+        """将环路转换为带方向的池子列表，只有返回的路径才会生成池子对象"""
+        return [self._orient_pool(pool_id, token_in) for pool_id, token_in in cycle]
+
+    def _orient_pool(self, pool_id: int, token_in: int) -> Pool:
+        """复制池子并设置交易方向，同一个池子在不同路径中方向可能不同"""
+        graph = self.graph
+        oriented = copy.copy(graph.pools[pool_id])
+        oriented.token_in = graph.token_names[token_in]
+        oriented.token_out = graph.token_names[graph.other_token(pool_id, token_in)]
+        return oriented
                 
     def _build_path_from_tokens(self, token_path: List[str]) -> Optional[List[Pool]]:
         """根据代币序列构建池子路径"""
+        graph = self.graph
         path = []
         for i in range(len(token_path) - 1):
-            token_from = token_path[i]
-            token_to = token_path[i + 1]
+            token_from = graph.token_ids.get(token_path[i])
+            token_to = graph.token_ids.get(token_path[i + 1])
+            
+            # 选择连接这两个代币且流动性最大的池子
+            best_pool = None
+            if token_from is not None and token_to is not None:
+                for edge in range(graph.offsets[token_from], graph.ends[token_from]):
+                    pool_id = graph.neighbor_pools[edge]
+                    if graph.neighbor_tokens[edge] != token_to or graph.pool_flags[pool_id] & (POOL_REMOVED | POOL_UNSYNCED):
+                        continue
+                    if best_pool is None or graph.pool_liquidity[pool_id] > graph.pool_liquidity[best_pool]:
+                        best_pool = pool_id
             
             # 检查是否存在连接这两个代币的池子
-            if token_from not in self.pool_graph or token_to not in self.pool_graph[token_from]:
-                logger.warning(f"找不到连接 {token_from} 和 {token_to} 的池子")
+            if best_pool is None:
+                logger.warning(f"找不到连接 {token_path[i]} 和 {token_path[i + 1]} 的池子")
                 return None
                 
-            # 选择流动性最大的池子
-            best_pool = max(
-                self.pool_graph[token_from][token_to],
-                key=lambda p: p.amount0 + p.amount1
-            )
-            path.append(best_pool)
+            path.append((best_pool, token_from))
             
-        return path
+        return self._materialize_path(tuple(path))
         
     def _is_blacklisted_token(self, token: str) -> bool:
         """检查代币是否在黑名单中"""
@@ -173,8 +337,4 @@ class PathFinder:
         """检查池子是否在黑名单DEX中"""
         return (self.config.blacklist_dexes and 
                 pool.dex.name in self.config.blacklist_dexes)
-                
-    def _check_pool_liquidity(self, pool: Pool) -> bool:
-        """检查池子是否满足最小流动性要求"""
-        total_liquidity = pool.amount0 + pool.amount1
-        return total_liquidity >= self.config.min_liquidity 
+                
\ No newline at end of file
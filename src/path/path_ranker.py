@@ -0,0 +1,62 @@
+from typing import List, Optional, Tuple
+from decimal import Decimal
+import heapq
+import logging
+import math
+from dataclasses import dataclass
+from ..common.model import Pool
+from ..dex.swap_math import spot_rate
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RankConfig:
+    min_cycle_rate: Decimal = Decimal('1')  # 环路边际汇率(手续费后)的最小值，低于该值的路径直接丢弃
+    top_k: int = 50  # 最多交给策略的路径数量
+
+class PathRanker:
+    """
+    在PathFinder和策略之间对候选路径做廉价的预排序
+    用当前价格计算环路的边际汇率(各池子手续费后现货价格的乘积)，
+    丢弃低于阈值的路径，并用堆只保留汇率最高的top_k条
+    """
+    def __init__(self, config: RankConfig):
+        self.config = config
+        self.pruned_below_threshold = 0  # 因汇率低于阈值被丢弃的路径数量(累计)
+        self.pruned_by_top_k = 0  # 因超出top_k被丢弃的路径数量(累计)
+
+    def rank_paths(self, path_list: List[List[Pool]]) -> List[List[Pool]]:
+        """返回按边际汇率从高到低排序的路径"""
+        min_log_rate = math.log(self.config.min_cycle_rate)
+        heap: List[Tuple[float, int, List[Pool]]] = []
+
+        for index, path in enumerate(path_list):
+            log_rate = self.cycle_log_rate(path)
+            if log_rate is None or log_rate < min_log_rate:
+                self.pruned_below_threshold += 1
+                continue
+
+            # 小顶堆，堆顶是当前保留路径中汇率最低的一条；index用于避免比较路径本身
+            item = (log_rate, index, path)
+            if len(heap) < self.config.top_k:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+                self.pruned_by_top_k += 1
+
+        return [path for _, _, path in sorted(heap, reverse=True)]
+
+    def cycle_log_rate(self, path: List[Pool]) -> Optional[float]:
+        """计算环路边际汇率的对数，任一池子储备为空时返回None"""
+        total = 0.0
+        for pool in path:
+            log_rate = self.spot_log_rate(pool)
+            if log_rate is None:
+                return None
+            total += log_rate
+        return total
+
+    @staticmethod
+    def spot_log_rate(pool: Pool) -> Optional[float]:
+        """池子按 token_in -> token_out 方向的手续费后现货价格的对数，CLMM池子按sqrt_price计算"""
+        rate = spot_rate(pool, pool.token_in, after_fee=True)
+        return math.log(rate) if rate else None
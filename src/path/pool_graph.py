@@ -0,0 +1,200 @@
+from array import array
+import math
+from typing import Dict, List, Optional
+from ..common.model import Pool
+from ..dex.swap_math import spot_rate
+
+# 池子状态标志位
+POOL_REMOVED = 1  # 已从图中移除
+POOL_BLACKLISTED = 2  # 所属DEX或代币在黑名单中
+POOL_UNSYNCED = 4  # CLMM的tick未与链上同步，随储备更新，不影响环路索引
+POOL_INDEX_EXCLUDED = POOL_REMOVED | POOL_BLACKLISTED  # 建立环路索引时排除的池子
+
+
+class PoolGraph:
+    """
+    整数索引的池子图
+    代币和池子地址被映射为连续的整数ID，储备、双向对数汇率、流动性和黑名单标志保存在按池子ID对齐的并行数组中。
+    邻接关系以留有空位的CSR存储: 每个代币的出边占邻居数组中 offsets[token]..ends[token] 的连续区间，
+    区间后预留容量，增删池子只修改两端代币的区间，不重建整个结构:
+    - 新增的边写入区间末尾的空位，容量用尽时把区间按两倍容量搬到数组末尾，旧位置成为空洞
+    - 删除的边由区间最后一条边填补；移除池子的ID放入空闲列表，由之后新增的池子复用
+    - 空洞超过有效边数量时整体压缩一次，均摊到每次增删仍为O(1)
+    """
+
+    def __init__(self):
+        # 代币ID表
+        self.token_ids: Dict[str, int] = {}
+        self.token_names: List[str] = []
+        self.token_blacklisted = array('b')
+
+        # 池子ID表及并行数组
+        self.pool_ids: Dict[str, int] = {}
+        self.pools: List[Optional[Pool]] = []
+        self.pool_token0 = array('i')
+        self.pool_token1 = array('i')
+        self.pool_reserve0 = array('d')
+        self.pool_reserve1 = array('d')
+        # 手续费后边际汇率的对数，token0->token1 与 token1->token0 两个方向，无法计算时为NaN
+        self.pool_log_rate0 = array('d')
+        self.pool_log_rate1 = array('d')
+        self.pool_liquidity = array('d')
+        self.pool_flags = array('b')
+        self.free_pool_ids: List[int] = []  # 已移除、可复用的池子ID
+
+        # 邻接结构: token -> offsets[token]..ends[token] 区间内的 (邻居代币, 池子)，容量为 capacities[token]
+        self.offsets = array('i')
+        self.ends = array('i')
+        self.capacities = array('i')
+        self.neighbor_tokens = array('i')
+        self.neighbor_pools = array('i')
+        self.edge_count = 0  # 有效边数量
+        self.compactions = 0  # 整体压缩的次数(累计)
+
+    def intern_token(self, token: str, blacklisted: bool = False) -> int:
+        """获取代币ID，不存在时分配新ID"""
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = len(self.token_names)
+            self.token_ids[token] = token_id
+            self.token_names.append(token)
+            self.token_blacklisted.append(1 if blacklisted else 0)
+            self.offsets.append(len(self.neighbor_tokens))
+            self.ends.append(len(self.neighbor_tokens))
+            self.capacities.append(0)
+        return token_id
+
+    def add_pool(self, pool: Pool, blacklisted: bool = False) -> int:
+        """添加池子并返回池子ID，优先复用已移除池子的ID"""
+        token0, token1 = self.token_ids[pool.token0], self.token_ids[pool.token1]
+        flags = POOL_BLACKLISTED if blacklisted else 0
+        if self.free_pool_ids:
+            pool_id = self.free_pool_ids.pop()
+            self.pools[pool_id] = pool
+            self.pool_token0[pool_id] = token0
+            self.pool_token1[pool_id] = token1
+            self.pool_flags[pool_id] = flags
+        else:
+            pool_id = len(self.pools)
+            self.pools.append(pool)
+            self.pool_token0.append(token0)
+            self.pool_token1.append(token1)
+            self.pool_reserve0.append(0.0)
+            self.pool_reserve1.append(0.0)
+            self.pool_log_rate0.append(math.nan)
+            self.pool_log_rate1.append(math.nan)
+            self.pool_liquidity.append(0.0)
+            self.pool_flags.append(flags)
+        self.pool_ids[pool.address] = pool_id
+        self._set_reserves(pool_id, pool)
+        self._insert_edge(token0, token1, pool_id)
+        self._insert_edge(token1, token0, pool_id)
+        return pool_id
+
+    def remove_pool(self, pool_address: str) -> Optional[int]:
+        """移除池子及其两条边，ID放入空闲列表"""
+        pool_id = self.pool_ids.pop(pool_address, None)
+        if pool_id is None:
+            return None
+        self._remove_edge(self.pool_token0[pool_id], pool_id)
+        self._remove_edge(self.pool_token1[pool_id], pool_id)
+        self.pool_flags[pool_id] |= POOL_REMOVED
+        self.pools[pool_id] = None
+        self.free_pool_ids.append(pool_id)
+        return pool_id
+
+    def _insert_edge(self, token_from: int, token_to: int, pool_id: int):
+        end = self.ends[token_from]
+        if end - self.offsets[token_from] == self.capacities[token_from]:
+            self._grow(token_from)
+            end = self.ends[token_from]
+        self.neighbor_tokens[end] = token_to
+        self.neighbor_pools[end] = pool_id
+        self.ends[token_from] = end + 1
+        self.edge_count += 1
+
+    def _remove_edge(self, token: int, pool_id: int):
+        """用区间最后一条边覆盖被删除的边"""
+        last = self.ends[token] - 1
+        neighbor_pools = self.neighbor_pools
+        for edge in range(self.offsets[token], last + 1):
+            if neighbor_pools[edge] == pool_id:
+                self.neighbor_tokens[edge] = self.neighbor_tokens[last]
+                neighbor_pools[edge] = neighbor_pools[last]
+                self.ends[token] = last
+                self.edge_count -= 1
+                return
+
+    def _grow(self, token: int):
+        """区间已满: 空洞过多时整体压缩，否则把区间以两倍容量搬到数组末尾"""
+        if len(self.neighbor_tokens) - self.edge_count > max(self.edge_count, 64):
+            self.compact()
+            if self.ends[token] - self.offsets[token] < self.capacities[token]:
+                return
+        start, end = self.offsets[token], self.ends[token]
+        capacity = max(4, self.capacities[token] * 2)
+        new_start = len(self.neighbor_tokens)
+        padding = array('i', [0]) * (capacity - (end - start))
+        self.neighbor_tokens.extend(self.neighbor_tokens[start:end])
+        self.neighbor_tokens.extend(padding)
+        self.neighbor_pools.extend(self.neighbor_pools[start:end])
+        self.neighbor_pools.extend(padding)
+        self.offsets[token] = new_start
+        self.ends[token] = new_start + end - start
+        self.capacities[token] = capacity
+
+    def compact(self):
+        """按代币顺序重新排列所有区间，去掉空洞，每个区间保留当前边数一半的空位"""
+        neighbor_tokens, neighbor_pools = array('i'), array('i')
+        for token in range(len(self.token_names)):
+            start, end = self.offsets[token], self.ends[token]
+            capacity = (end - start) + (end - start) // 2
+            self.offsets[token] = len(neighbor_tokens)
+            self.ends[token] = len(neighbor_tokens) + end - start
+            self.capacities[token] = capacity
+            neighbor_tokens.extend(self.neighbor_tokens[start:end])
+            neighbor_pools.extend(self.neighbor_pools[start:end])
+            padding = array('i', [0]) * (capacity - (end - start))
+            neighbor_tokens.extend(padding)
+            neighbor_pools.extend(padding)
+        self.neighbor_tokens = neighbor_tokens
+        self.neighbor_pools = neighbor_pools
+        self.compactions += 1
+
+    def update_reserves(self, pool: Pool):
+        """根据池子当前储备更新储备和流动性数组；DB写时复制后池子对象可能已替换，一并更新"""
+        pool_id = self.pool_ids.get(pool.address)
+        if pool_id is not None:
+            self.pools[pool_id] = pool
+            self._set_reserves(pool_id, pool)
+
+    def _set_reserves(self, pool_id: int, pool: Pool):
+        reserve0, reserve1 = float(pool.amount0), float(pool.amount1)
+        self.pool_reserve0[pool_id] = reserve0
+        self.pool_reserve1[pool_id] = reserve1
+        # 与路径预排序和代币定价共用同一个汇率函数，CLMM池子按sqrt_price而不是金库余额计算
+        rate0, rate1 = spot_rate(pool, pool.token0, after_fee=True), spot_rate(pool, pool.token1, after_fee=True)
+        self.pool_log_rate0[pool_id] = math.log(rate0) if rate0 else math.nan
+        self.pool_log_rate1[pool_id] = math.log(rate1) if rate1 else math.nan
+        self.pool_liquidity[pool_id] = reserve0 + reserve1
+        state = getattr(pool.dex, "state", None)
+        if state is not None and not state.synced:
+            self.pool_flags[pool_id] |= POOL_UNSYNCED
+        else:
+            self.pool_flags[pool_id] &= ~POOL_UNSYNCED
+
+    def other_token(self, pool_id: int, token_id: int) -> int:
+        """返回池子中另一侧的代币ID"""
+        token0 = self.pool_token0[pool_id]
+        return self.pool_token1[pool_id] if token0 == token_id else token0
+
+    def log_rate(self, pool_id: int, token_in: int) -> Optional[float]:
+        """
+        边的对数汇率，即手续费后边际汇率的对数，随储备更新时计算
+        无法计算(储备为空或价格无效)时返回None
+        """
+        if self.pool_token0[pool_id] == token_in:
+            log_rate = self.pool_log_rate0[pool_id]
+        else:
+            log_rate = self.pool_log_rate1[pool_id]
+        return None if math.isnan(log_rate) else log_rate
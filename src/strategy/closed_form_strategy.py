@@ -0,0 +1,94 @@
+from decimal import Decimal
+from typing import List, Optional, Tuple
+import threading
+from ..common.model import Pool
+from .strategies import Strategy,Opportunity
+import logging
+from ..token_price.token_price import TokenPriceProvider
+
+logger = logging.getLogger(__name__)
+
+class ClosedFormArbitrageStrategy(Strategy):
+    """
+    任意长度 x * y = k 路径的解析解策略
+    单个池子的输出 out(x) = a * x / (b + c * x)，多个池子复合后仍是同样的形式，
+    因此整条路径可以折叠为 (a, b, c) 三个参数，利润最大点为 x* = (sqrt(a * b) - b) / c
+    非v2池子的路径交给fallback策略(如梯度搜索)处理
+    """
+    def __init__(self, profit_threshold: Decimal = Decimal('0'),
+                 token_price_provider: TokenPriceProvider = None,
+                 fallback: Optional[Strategy] = None):
+        self.profit_threshold = profit_threshold
+        self.token_price_provider = token_price_provider
+        self.fallback = fallback
+        # fallback为计算密集的策略时整体放到线程池中运行
+        self.cpu_bound = getattr(fallback, "cpu_bound", False)
+
+    def set_quote_cache(self, quote_cache):
+        """fallback策略也使用同一个报价缓存"""
+        super().set_quote_cache(quote_cache)
+        if self.fallback:
+            self.fallback.set_quote_cache(quote_cache)
+
+    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]],
+                                         cancel: Optional[threading.Event] = None) -> List[Opportunity]:
+        """v2路径直接求解析解，其余路径交给fallback策略"""
+        opportunities = []
+        fallback_paths = []
+
+        for path in path_list:
+            if len(path) < 2:  # 至少需要两个池子
+                continue
+            if any(pool.dex.dex_type != "v2" for pool in path):
+                fallback_paths.append(path)
+                continue
+
+            amount, profit = self._find_optimal_amount(path)
+            if amount > 0 and profit > self.profit_threshold:
+                opportunities.append(
+                    Opportunity(
+                        path=path,
+                        input_amount=amount,
+                        expected_profit=profit,
+                        profit_token=path[-1].token_out,
+                        usd_profit=profit * Decimal(str(self.token_price_provider.get_token_price(path[-1].token_out)))
+                    )
+                )
+
+        if self.fallback and fallback_paths:
+            opportunities.extend(await self.fallback.find_arbitrage_opportunity(fallback_paths, cancel))
+        return opportunities
+
+    def _find_optimal_amount(self, path: List[Pool]) -> Tuple[Decimal, Decimal]:
+        """
+        求解最优输入金额，利润用与链上一致的整数运算复核
+        返回: (最优金额, 预期利润)，无利可图时返回 (0, 0)
+        """
+        a, b, c = self._fold_path(path)
+        # 零输入处的边际汇率 a / b 不大于1时不存在套利空间
+        if a <= b:
+            return Decimal('0'), Decimal('0')
+
+        amount = ((a * b).sqrt() - b) / c
+        amount = amount.to_integral_value(rounding='ROUND_FLOOR')
+        if amount <= 0:
+            return Decimal('0'), Decimal('0')
+        profit = Decimal(self._get_path_amount_out(path, int(amount))) - amount
+        return amount, profit
+
+    @staticmethod
+    def _fold_path(path: List[Pool]) -> Tuple[Decimal, Decimal, Decimal]:
+        """
+        将路径折叠为 out(x) = a * x / (b + c * x) 的参数
+        单个池子: a = gamma * reserve_out, b = reserve_in, c = gamma
+        复合 f2(f1(x)): a = a1 * a2, b = b1 * b2, c = c1 * b2 + a1 * c2
+        """
+        a, b, c = Decimal('1'), Decimal('1'), Decimal('0')
+        for pool in path:
+            if pool.token_in == pool.token0:
+                reserve_in, reserve_out = pool.amount0, pool.amount1
+            else:
+                reserve_in, reserve_out = pool.amount1, pool.amount0
+            gamma = Decimal('1') - pool.fee
+            a, b, c = a * gamma * reserve_out, b * reserve_in, c * reserve_in + a * gamma
+        return a, b, c
@@ -1,6 +1,10 @@
 from decimal import Decimal
 from typing import List, Optional, Tuple, Dict
-from ..analysis.price_impact import Pool
+import threading
+from ..common.model import Pool
+from ..dex.swap_math import (
+    BPS_DENOMINATOR, MAX_U64, V2_SWAP_FUNCTIONS, fee_to_bps, get_amount_out_fee_deducted
+)
 from .strategies import Strategy,Opportunity
 import numpy as np
 import logging
@@ -8,27 +12,50 @@ from ..token_price.token_price import TokenPriceProvider
 
 logger = logging.getLogger(__name__)
 
+# 搜索模式
+SEARCH_MODE_GRADIENT = "gradient"  # 逐条路径的数值梯度下降
+SEARCH_MODE_BATCHED = "batched"  # 对数网格批量评估 + 黄金分割细化
+
+# 黄金分割比例 (sqrt(5) - 1) / 2
+GOLDEN_RATIO = (np.sqrt(5.0) - 1.0) / 2.0
+
 class GradientSearchStrategy(Strategy):
     """
     使用梯度下降搜索最优输入金额的策略
     """
+    cpu_bound = True
     def __init__(self, learning_rate: float = 0.01, max_iterations: int = 1000, 
                  profit_threshold: Decimal = Decimal('0.1'), 
-                 min_gradient: float = 1e-6,token_price_provider: TokenPriceProvider = None):
+                 min_gradient: float = 1e-6,token_price_provider: TokenPriceProvider = None,
+                 search_mode: str = SEARCH_MODE_GRADIENT, grid_size: int = 16,
+                 refine_iterations: int = 24, max_input_ratio: float = 0.5):
         self.learning_rate = learning_rate
         self.max_iterations = max_iterations
         self.profit_threshold = profit_threshold  # 达到此利润即可停止
         self.min_gradient = min_gradient  # 最小梯度阈值
         self.token_price_provider = token_price_provider
-    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]]) -> List[Opportunity]:
-        """分析所有可能的套利机会"""
+        self.search_mode = search_mode
+        self.grid_size = grid_size  # 批量模式下对数网格的点数
+        self.refine_iterations = refine_iterations  # 批量模式下黄金分割的迭代次数
+        self.max_input_ratio = max_input_ratio  # 批量模式下输入金额上限占第一个池子输入储备的比例
+    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]],
+                                         cancel: Optional[threading.Event] = None) -> List[Opportunity]:
+        """分析所有可能的套利机会，cancel被设置后在下一次搜索迭代时停止，已超时的结果会被丢弃"""
         opportunities = []
+        path_list = [path for path in path_list if len(path) >= 2]  # 至少需要两个池子
         
-        for path in path_list:
-            if len(path) < 2:  # 至少需要两个池子
-                continue
+        if self.search_mode == SEARCH_MODE_BATCHED:
+            results = zip(path_list, *self._find_optimal_amounts_batch(path_list, cancel))
+        else:
+            results = []
+            for path in path_list:
+                if self._cancelled(cancel):
+                    return []
+                results.append((path, *await self._find_optimal_amount(path, cancel)))
+            if self._cancelled(cancel):
+                return []
                 
-            amount, profit = self._find_optimal_amount(path)
+        for path, amount, profit in results:
             if profit > 0:  # 只要有利润就记录
                 opportunities.append(
                     Opportunity(
@@ -36,17 +63,170 @@ class GradientSearchStrategy(Strategy):
                         input_amount=amount,
                         expected_profit=profit,
                         profit_token=path[-1].token_out,
-                        usd_profit=profit * self.token_price_provider.get_token_price(path[-1].token_out)
+                        usd_profit=profit * Decimal(str(self.token_price_provider.get_token_price(path[-1].token_out)))
                     )
                 )
                 
         return opportunities
         
     def get_initial_amount(self, path: List[Pool]) -> Decimal:
-        """获取初始输入金额"""
-        pass
+        """获取初始输入金额: 第一个池子输入储备的1%，至少为一个最小单位"""
+        pool = path[0]
+        reserve_in = pool.amount0 if pool.token_in == pool.token0 else pool.amount1
+        return max(Decimal(int(reserve_in) // 100), Decimal('1'))
+
+    def _find_optimal_amounts_batch(self, path_list: List[List[Pool]],
+                                    cancel: Optional[threading.Event] = None) -> Tuple[List[Decimal], List[Decimal]]:
+        """
+        批量搜索最优输入金额
+        1. 每条路径在 [1, 输入储备 * max_input_ratio] 上取对数均匀的网格，所有路径堆叠为一个矩阵一次评估
+        2. 以网格最优点的左右邻点为区间，对所有路径同时做黄金分割细化
+        每条路径固定需要 grid_size + refine_iterations + 2 次兑换评估，浮点估计有利润的路径再做一次整数复核
+        返回: (最优金额列表, 预期利润列表)，cancel被设置时返回空列表
+        """
+        if not path_list:
+            return [], []
+
+        stacked = self._stack_paths(path_list)
+        upper = np.array([max(self._max_input(path), 2.0) for path in path_list])
+        # grid[i, j] 为第i条路径的第j个候选输入金额
+        grid = np.geomspace(np.ones_like(upper), upper, self.grid_size, axis=1)
+        grid_profits = self._evaluate(path_list, stacked, grid)
+
+        rows = np.arange(len(path_list))
+        best_index = np.argmax(grid_profits, axis=1)
+        best_amounts = grid[rows, best_index]
+        best_profits = grid_profits[rows, best_index]
+
+        # 最优点左右邻点构成包含极大值的区间(利润关于输入是单峰的)
+        low = grid[rows, np.maximum(best_index - 1, 0)]
+        high = grid[rows, np.minimum(best_index + 1, self.grid_size - 1)]
+        inner_low = high - GOLDEN_RATIO * (high - low)
+        inner_high = low + GOLDEN_RATIO * (high - low)
+        profit_low = self._evaluate(path_list, stacked, inner_low[:, None])[:, 0]
+        profit_high = self._evaluate(path_list, stacked, inner_high[:, None])[:, 0]
+
+        for _ in range(self.refine_iterations):
+            if self._cancelled(cancel):
+                return [], []
+            # 左内点更优时极大值在 [low, inner_high]，否则在 [inner_low, high]
+            keep_left = profit_low > profit_high
+            high = np.where(keep_left, inner_high, high)
+            low = np.where(keep_left, low, inner_low)
+            new_inner_high = np.where(keep_left, inner_low, low + GOLDEN_RATIO * (high - low))
+            new_inner_low = np.where(keep_left, high - GOLDEN_RATIO * (high - low), inner_high)
+            probe = np.where(keep_left, new_inner_low, new_inner_high)
+            probe_profit = self._evaluate(path_list, stacked, probe[:, None])[:, 0]
+            profit_low, profit_high = (np.where(keep_left, probe_profit, profit_high),
+                                       np.where(keep_left, profit_low, probe_profit))
+            inner_low, inner_high = new_inner_low, new_inner_high
+
+        for amounts, profits in ((inner_low, profit_low), (inner_high, profit_high)):
+            improved = profits > best_profits
+            best_amounts = np.where(improved, amounts, best_amounts)
+            best_profits = np.where(improved, profits, best_profits)
+
+        amounts = [Decimal(int(amount)) for amount in best_amounts]
+        profits = [Decimal('0')] * len(path_list)
+        # 矩阵评估是浮点近似，浮点估计有利润的路径都用与链上一致的整数运算(CLMM按tick模拟)复核，
+        # 复核后输出不大于输入的路径利润记为0，不会被报告
+        for i, path in enumerate(path_list):
+            if self._cancelled(cancel):
+                return [], []
+            if best_profits[i] <= 0 or amounts[i] <= 0:
+                continue
+            try:
+                profit = Decimal(self._get_path_amount_out(path, int(amounts[i]))) - amounts[i]
+            except Exception as e:
+                logger.error(f"复核利润时发生错误: {e}")
+                continue
+            if profit > 0:
+                profits[i] = profit
+        return amounts, profits
+
+    def _max_input(self, path: List[Pool]) -> float:
+        """批量模式下的输入金额上限"""
+        pool = path[0]
+        reserve_in = pool.amount0 if pool.token_in == pool.token0 else pool.amount1
+        return float(reserve_in) * self.max_input_ratio
+
+    @staticmethod
+    def _stack_paths(path_list: List[List[Pool]]) -> Tuple:
+        """
+        把所有路径的v2池子参数堆叠为 (路径数, 最大跳数) 的矩阵
+        返回: (输入储备, 输出储备, 手续费基点, 是否先扣手续费, 是否为v2跳, 每一跳的非v2池子)
+        较短路径末尾的空跳和非v2跳在矩阵中原样传递金额，非v2跳另行逐条报价
+        """
+        shape = (len(path_list), max(len(path) for path in path_list))
+        reserve_in = np.ones(shape)
+        reserve_out = np.zeros(shape)
+        fee_bps = np.zeros(shape)
+        deducted = np.zeros(shape, dtype=bool)
+        is_v2 = np.zeros(shape, dtype=bool)
+        others: List[List[Tuple[int, Pool]]] = [[] for _ in range(shape[1])]  # 跳 -> [(路径下标, 池子)]
+        for i, path in enumerate(path_list):
+            for hop, pool in enumerate(path):
+                if pool.dex.dex_type != "v2":
+                    others[hop].append((i, pool))
+                    continue
+                if pool.token_in == pool.token0:
+                    reserve_in[i, hop], reserve_out[i, hop] = float(pool.amount0), float(pool.amount1)
+                else:
+                    reserve_in[i, hop], reserve_out[i, hop] = float(pool.amount1), float(pool.amount0)
+                fee_bps[i, hop] = fee_to_bps(pool.fee)
+                deducted[i, hop] = V2_SWAP_FUNCTIONS.get(pool.dex.name) is get_amount_out_fee_deducted
+                is_v2[i, hop] = True
+        return reserve_in, reserve_out, fee_bps, deducted, is_v2, others
+
+    def _evaluate(self, path_list: List[List[Pool]], stacked: Tuple, amounts: np.ndarray) -> np.ndarray:
+        """
+        所有路径在 (路径数, 候选数) 的金额矩阵上逐跳同时计算利润
+        v2跳按对应DEX的整数公式向量化计算(浮点近似)，非v2跳逐条路径报价；
+        超出u64或计算失败时利润为 -inf
+        """
+        reserve_in, reserve_out, fee_bps, deducted, is_v2, others = stacked
+        amounts = np.floor(amounts)
+        current = amounts
+        invalid = np.zeros(amounts.shape, dtype=bool)
+        for hop in range(reserve_in.shape[1]):
+            r_in, r_out, fee = reserve_in[:, hop, None], reserve_out[:, hop, None], fee_bps[:, hop, None]
+            v2 = is_v2[:, hop, None]
+            invalid |= v2 & (current > MAX_U64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                with_fee = current * (BPS_DENOMINATOR - fee)
+                fee_on_input = np.floor(with_fee * r_out / (r_in * BPS_DENOMINATOR + with_fee))
+                after_fee = current - np.floor(current * fee / BPS_DENOMINATOR)
+                fee_deducted = np.floor(after_fee * r_out / (r_in + after_fee))
+            out = np.where(v2, np.where(deducted[:, hop, None], fee_deducted, fee_on_input), current)
+            for i, pool in others[hop]:
+                if invalid[i].all():
+                    continue
+                try:
+                    out[i] = self._quote_batch(pool, current[i])
+                except Exception as e:
+                    logger.error(f"批量计算利润时发生错误: {e}")
+                    invalid[i] = True
+            current = out
+        profits = current - amounts
+        profits[invalid | np.isnan(profits)] = -np.inf
+        return profits
+
+    def _quote_batch(self, pool: Pool, amounts: np.ndarray) -> np.ndarray:
+        """
+        对一组输入金额报价
+        DEX提供向量化的 get_amounts_out 时直接使用，否则逐个用整数兑换公式计算
+        """
+        get_amounts_out = getattr(pool.dex, "get_amounts_out", None)
+        if get_amounts_out is not None:
+            return np.asarray(get_amounts_out(amounts, pool.token_in, pool.token_out), dtype=np.float64)
+        return np.fromiter(
+            (float(self._get_amount_out(pool, int(amount))) for amount in amounts),
+            dtype=np.float64,
+            count=len(amounts)
+        )
         
-    async def _find_optimal_amount(self, path: List[Pool]) -> Tuple[Decimal, Decimal]:
+    async def _find_optimal_amount(self, path: List[Pool],
+                                   cancel: Optional[threading.Event] = None) -> Tuple[Decimal, Decimal]:
         """
         使用梯度下降寻找最优输入金额
         返回: (最优金额, 预期利润)
@@ -57,6 +237,8 @@ class GradientSearchStrategy(Strategy):
         best_profit = await self._calculate_profit(path, current_amount)
         
         for i in range(self.max_iterations):
+            if self._cancelled(cancel):
+                break
             # 计算当前利润
             current_profit = await self._calculate_profit(path, current_amount)
             
@@ -66,7 +248,7 @@ class GradientSearchStrategy(Strategy):
                 best_amount = current_amount
                 
             # 如果达到利润门槛，提前停止
-            if self.token_price_provider.get_token_price(path[-1].token_out) * current_profit >= self.profit_threshold:
+            if Decimal(str(self.token_price_provider.get_token_price(path[-1].token_out))) * current_profit >= self.profit_threshold:
                 break
                 
             # 计算梯度
@@ -84,9 +266,10 @@ class GradientSearchStrategy(Strategy):
             
         return best_amount, best_profit
         
-    async def _calculate_gradient(self, path: List[Pool], amount: Decimal, delta: float = 1e-6) -> float:
+    async def _calculate_gradient(self, path: List[Pool], amount: Decimal, delta: float = 1.0) -> float:
         """
         计算梯度（数值微分）
+        利润按整数金额计算，delta至少为一个最小单位
         """
         profit_plus = await self._calculate_profit(path, amount + Decimal(str(delta)))
         profit_minus = await self._calculate_profit(path, amount - Decimal(str(delta)))
@@ -94,21 +277,15 @@ class GradientSearchStrategy(Strategy):
         return float(profit_plus - profit_minus) / (2 * delta)
         
     async def _calculate_profit(self, path: List[Pool], amount_in: Decimal) -> Decimal:
-        """计算给定路径和输入金额的预期利润"""
+        """用与链上一致的整数运算计算给定路径和输入金额的预期利润"""
         try:
-            current_amount = amount_in
+            amount = int(amount_in)
             
             # 沿着路径计算最终输出金额
-            for i in range(len(path)):
-                pool = path[i]
-                current_amount = pool.dex.get_amount_out(
-                    current_amount,
-                    pool.token_in,
-                    pool.token_out
-                )
+            final_amount = self._get_path_amount_out(path, amount)
                 
             # 计算利润
-            return current_amount - amount_in
+            return Decimal(final_amount - amount)
             
         except Exception as e:
             logger.error(f"计算利润时发生错误: {e}")
@@ -1,9 +1,18 @@
-from typing import Dict, List, TypedDict
+from typing import Dict, List, Optional, Set, TypedDict
 from decimal import Decimal
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import logging
+import threading
 from ..config import Config
 from abc import ABC, abstractmethod
-from ..analysis.price_impact import Pool
+from ..common.model import Pool
 from ..common.event_bus import EventBus 
+from ..dex.quote_cache import QuoteCache
+from ..common.metrics import tracer
+from ..dex.swap_math import get_amount_out, get_path_amount_out
+
+logger = logging.getLogger(__name__)
 
 class Opportunity(TypedDict):
     path: List[Pool]
@@ -11,27 +20,135 @@ class Opportunity(TypedDict):
     expected_profit: Decimal
     profit_token: str
     usd_profit: Decimal
+    trigger_digests: List[str]  # 触发该机会的交易digest，用于统计端到端延迟
     
 class Strategy(ABC):
+    quote_cache: Optional[QuoteCache] = None  # 由Strategies注入的共享报价缓存
+    cpu_bound: bool = False  # 计算密集的策略放到线程池中运行，不阻塞事件循环
+
     @abstractmethod
-    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]]) -> List[Opportunity]:
+    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]],
+                                         cancel: Optional[threading.Event] = None) -> List[Opportunity]:
+        """
+        cancel: 本轮超过时间预算时被设置；线程中的计算无法从外部中断，
+        计算密集的策略需要在搜索迭代之间检查并提前返回
+        """
         pass    
 
+    @staticmethod
+    def _cancelled(cancel: Optional[threading.Event]) -> bool:
+        return cancel is not None and cancel.is_set()
+
+    def set_quote_cache(self, quote_cache: QuoteCache):
+        self.quote_cache = quote_cache
+
+    def _get_amount_out(self, pool: Pool, amount_in: int) -> int:
+        """整数报价，有共享缓存时优先查缓存"""
+        if self.quote_cache is not None:
+            return self.quote_cache.get_amount_out(pool, amount_in)
+        return get_amount_out(pool, amount_in)
+
+    def _get_path_amount_out(self, path: List[Pool], amount_in: int) -> int:
+        if self.quote_cache is not None:
+            return self.quote_cache.get_path_amount_out(path, amount_in)
+        return get_path_amount_out(path, amount_in)
+
 
 class Strategies:
-    def __init__(self,event_bus:EventBus):
+    """
+    并发运行所有策略
+    每个策略完成后立即发送其找到的机会，超过时间预算仍未完成的策略被取消
+    线程中的策略无法取消，只能通知其停止并丢弃结果，单独计数
+    """
+    def __init__(self,event_bus:EventBus,quote_cache:QuoteCache=None,
+                 deadline:Optional[float]=None,max_workers:Optional[int]=None):
         self.event_bus = event_bus
         self.strategies = []
+        # 所有策略共享同一个报价缓存，DB更新池子时需要对其调用 bump_version
+        self.quote_cache = quote_cache if quote_cache is not None else QuoteCache()
+        self.deadline = deadline  # 默认的每轮时间预算(秒)，None表示不限时
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="strategy")
+        self.timed_out = 0  # 超过时间预算的策略运行次数(累计)，包括下面被放弃的
+        self.abandoned = 0  # 超时时已在线程中运行、只能放弃结果的策略运行次数(累计)
+        self._abandoned_running: Set[Future] = set()  # 已放弃但线程中仍在运行的计算
         
     def add_strategy(self,strategy:Strategy):
+        strategy.set_quote_cache(self.quote_cache)
         self.strategies.append(strategy)
         
-    async def find_arbitrage_opportunities(self,path_list:List[List[Pool]]):
-        for strategy in self.strategies:
-            opportunities = await strategy.find_arbitrage_opportunity(path_list)
-            # 对每个找到的机会都发送事件
-            for opportunity in opportunities:
-                self.event_bus.emit("arbitrage_opportunity", opportunity)
+    async def find_arbitrage_opportunities(self,path_list:List[List[Pool]],
+                                           deadline:Optional[float]=None,
+                                           trigger_digests:Optional[List[str]]=None) -> List[Opportunity]:
+        """
+        并发运行所有策略，按完成顺序发送机会事件
+        deadline: 本轮的时间预算(秒)，不传时使用构造时的默认值
+        trigger_digests: 触发本轮计算的交易digest，附加到每个机会上
+        返回: 预算内找到的所有机会
+        """
+        budget = self.deadline if deadline is None else deadline
+        cancel = threading.Event()
+        tasks = [asyncio.ensure_future(self._run_strategy(strategy, path_list, cancel))
+                 for strategy in self.strategies]
+        found = []
+        try:
+            for completed in asyncio.as_completed(tasks, timeout=budget):
+                try:
+                    opportunities = await completed
+                except asyncio.TimeoutError:
+                    raise
+                except Exception as e:
+                    logger.error(f"策略运行时发生错误: {e}")
+                    continue
+                # 对每个找到的机会都发送事件
+                for opportunity in opportunities:
+                    if trigger_digests:
+                        opportunity["trigger_digests"] = trigger_digests
+                    self.event_bus.emit("arbitrage_opportunity", opportunity)
+                found.extend(opportunities)
+        except asyncio.TimeoutError:
+            cancel.set()
+            pending = [task for task in tasks if not task.done()]
+            abandoned = self.abandoned
+            for task in pending:
+                task.cancel()
+            # 等待取消处理完成，_run_strategy在其中登记被放弃的线程计算
+            await asyncio.gather(*pending, return_exceptions=True)
+            abandoned = self.abandoned - abandoned
+            self.timed_out += len(pending)
+            logger.warning(f"{len(pending)}个策略超过时间预算{budget}s: {len(pending) - abandoned}个已取消，"
+                           f"{abandoned}个已在线程中运行，已通知停止并丢弃其结果"
+                           f"(仍在运行的放弃计算: {self.abandoned_running})")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        return found
+
+    @property
+    def abandoned_running(self) -> int:
+        """已放弃结果但线程中仍在运行的策略计算数量"""
+        return len(self._abandoned_running)
+
+    async def _run_strategy(self, strategy: Strategy, path_list: List[List[Pool]],
+                            cancel: threading.Event) -> List[Opportunity]:
+        with tracer.span(f"strategy.{type(strategy).__name__}"):
+            if not strategy.cpu_bound:
+                return await strategy.find_arbitrage_opportunity(path_list, cancel)
+            future = self._executor.submit(self._run_in_thread, strategy, path_list, cancel)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # 尚未开始的任务直接取消；已开始的计算无法中断，在策略检查cancel之前继续占用线程
+                if not future.cancel():
+                    self.abandoned += 1
+                    self._abandoned_running.add(future)
+                    future.add_done_callback(self._abandoned_running.discard)
+                raise
+
+    @staticmethod
+    def _run_in_thread(strategy: Strategy, path_list: List[List[Pool]],
+                       cancel: threading.Event) -> List[Opportunity]:
+        return asyncio.run(strategy.find_arbitrage_opportunity(path_list, cancel))
 
 
     
\ No newline at end of file
@@ -1,9 +1,10 @@
 from decimal import Decimal
-from typing import Tuple, List
-from ..analysis.price_impact import Pool
+from typing import Tuple, List, Optional
+import threading
+from ..common.model import Pool
 from .strategies import Strategy,Opportunity
-import math
 import logging
+import numpy as np
 from ..token_price.token_price import TokenPriceProvider
 logger = logging.getLogger(__name__)
 
@@ -14,33 +15,88 @@ class TwoPoolArbitrageStrategy(Strategy):
     基于 Uniswap V2 的 x * y = k 公式
     """
     
-    def __init__(self,profit_threshold:Decimal=Decimal('0'),token_price_provider: TokenPriceProvider = None):
+    def __init__(self,profit_threshold:Decimal=Decimal('0'),token_price_provider: TokenPriceProvider = None,
+                 batch_mode: bool = True):
         self.profit_threshold = profit_threshold 
         self.token_price_provider = token_price_provider
+        self.batch_mode = batch_mode  # 批量模式: 用NumPy一次性求解所有两池子路径
         
-    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]]) -> List[Opportunity]:
-        """分析两个池子之间的套利机会"""
-        for path in path_list:  
-            if len(path) != 2:  # 只处理两池子路径
-                continue
+    async def find_arbitrage_opportunity(self, path_list: List[List[Pool]],
+                                         cancel: Optional[threading.Event] = None) -> List[Opportunity]:
+        """分析两个池子之间的套利机会，返回所有有利可图的机会(在事件循环中运行，超时直接取消，不检查cancel)"""
+        candidates = [path for path in path_list if self._is_candidate(path)]
+        if self.batch_mode:
+            return self._find_opportunities_batch(candidates)
                 
+        opportunities = []
+        for path in candidates:
             pool1, pool2 = path[0], path[1]
-            if pool1.dex.dex_type != "v2" or pool2.dex.dex_type != "v2":
-                continue
-            
             optimal_amount = self._calculate_optimal_amount(pool1, pool2)
             
             if optimal_amount > 0:
                 profit = self._calculate_profit(pool1, pool2, optimal_amount)
                 if profit > self.profit_threshold:
-                    return Opportunity(
-                        path=path,
-                        input_amount=optimal_amount,
-                        expected_profit=profit,
-                        profit_token=pool2.token_out,
-                        usd_profit=profit * self.token_price_provider.get_token_price(pool2.token_out)
-                    )
-        return None
+                    opportunities.append(self._build_opportunity(path, optimal_amount, profit))
+        return opportunities
+
+    def _is_candidate(self, path: List[Pool]) -> bool:
+        """只处理两个v2池子组成的路径"""
+        if len(path) != 2:
+            return False
+        return path[0].dex.dex_type == "v2" and path[1].dex.dex_type == "v2"
+
+    def _find_opportunities_batch(self, path_list: List[List[Pool]]) -> List[Opportunity]:
+        """
+        将所有路径的储备和手续费打包成float64数组，一次向量化计算出最优输入和利润，
+        只对浮点结果有利可图的路径用整数精确计算复核
+        """
+        if not path_list:
+            return []
+
+        reserves = np.array(
+            [self._oriented_reserves(pool1) + self._oriented_reserves(pool2) for pool1, pool2 in path_list],
+            dtype=np.float64
+        )
+        fees = np.array([[float(pool1.fee), float(pool2.fee)] for pool1, pool2 in path_list], dtype=np.float64)
+        reserve_in1, reserve_out1, reserve_in2, reserve_out2 = reserves.T
+        gamma1, gamma2 = 1.0 - fees[:, 0], 1.0 - fees[:, 1]
+
+        # 两跳复合后 out(x) = a * x / (b + c * x)，利润最大点 x* = (sqrt(a * b) - b) / c
+        a = gamma1 * gamma2 * reserve_out1 * reserve_out2
+        b = reserve_in1 * reserve_in2
+        c = gamma1 * reserve_in2 + gamma1 * gamma2 * reserve_out1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            optimal_amounts = (np.sqrt(a * b) - b) / c
+            profits = a * optimal_amounts / (b + c * optimal_amounts) - optimal_amounts
+
+        # a > b 等价于零输入处的边际汇率大于1
+        winners = np.nonzero((a > b) & (optimal_amounts >= 1) & (profits > float(self.profit_threshold)))[0]
+
+        opportunities = []
+        for index in winners:
+            pool1, pool2 = path_list[index]
+            amount_in = int(optimal_amounts[index])
+            profit = self._calculate_profit(pool1, pool2, Decimal(amount_in))
+            if profit > self.profit_threshold:
+                opportunities.append(self._build_opportunity(path_list[index], Decimal(amount_in), profit))
+        return opportunities
+
+    def _build_opportunity(self, path: List[Pool], amount_in: Decimal, profit: Decimal) -> Opportunity:
+        profit_token = path[-1].token_out
+        return Opportunity(
+            path=path,
+            input_amount=amount_in,
+            expected_profit=profit,
+            profit_token=profit_token,
+            usd_profit=profit * Decimal(str(self.token_price_provider.get_token_price(profit_token)))
+        )
+
+    @staticmethod
+    def _oriented_reserves(pool: Pool) -> Tuple[Decimal, Decimal]:
+        """按交易方向返回 (输入代币储备, 输出代币储备)"""
+        if pool.token_in == pool.token0:
+            return pool.amount0, pool.amount1
+        return pool.amount1, pool.amount0
         
     def _calculate_optimal_amount(self, pool1: Pool, pool2: Pool) -> Decimal:
         """
@@ -48,37 +104,37 @@ class TwoPoolArbitrageStrategy(Strategy):
         通过求导 d(profit)/d(x) = 0 来获得最大利润点
         """
         try:
-            x1, y1 = pool1.amount0, pool1.amount1
-            x2, y2 = pool2.amount0, pool2.amount1
+            x1, y1 = self._oriented_reserves(pool1)
+            x2, y2 = self._oriented_reserves(pool2)
             
             # 考虑手续费的系数
             fee1 = Decimal('1') - pool1.fee
             fee2 = Decimal('1') - pool2.fee
             
-            # 修正后的最优输入量公式
-            # dx = sqrt((x1 * x2 * y1 * fee1 * fee2) / y2) - x1
-            numerator = Decimal(x1 * x2 * y1 * fee1 * fee2)
-            denominator = Decimal(y2)
+            # 两跳复合后 out(dx) = a * dx / (b + c * dx)
+            # dx = (sqrt(a * b) - b) / c
+            a = fee1 * fee2 * y1 * y2
+            b = x1 * x2
+            c = fee1 * x2 + fee1 * fee2 * y1
             
-            optimal_amount = Decimal(math.sqrt(numerator / denominator)) - Decimal(x1)
-            return max(optimal_amount, Decimal('0'))
+            optimal_amount = ((a * b).sqrt() - b) / c
+            # 链上金额为整数，向下取整
+            return max(optimal_amount.to_integral_value(rounding='ROUND_FLOOR'), Decimal('0'))
             
         except Exception as e:
             logger.error(f"计算最优输入金额时发生错误: {e}")
             return Decimal('0')
             
     def _calculate_profit(self, pool1: Pool, pool2: Pool, amount_in: Decimal) -> Decimal:
-        """计算给定输入金额的预期利润"""
+        """用与链上一致的整数运算(向下取整)计算给定输入金额的预期利润"""
         try:
-            # 第一个池子的输出
-            amount_out1 = pool1.dex.get_amount_out(amount_in,pool1.token_in,pool1.token_out)
-            
-            # 第二个池子的输出
-            final_amount = pool2.dex.get_amount_out(amount_out1,pool2.token_in,pool2.token_out)
+            amount = int(amount_in)
+            # 沿两个池子计算最终输出
+            final_amount = self._get_path_amount_out([pool1, pool2], amount)
             
             # 计算利润
-            return final_amount - amount_in
+            return Decimal(final_amount - amount)
             
         except Exception as e:
             logger.error(f"计算利润时发生错误: {e}")
-            return Decimal('0') 
\ No newline at end of file
+            return Decimal('0') 
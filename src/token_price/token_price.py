@@ -1,10 +1,243 @@
+import heapq
+import logging
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ..dex.swap_math import spot_rate
+
+logger = logging.getLogger(__name__)
+
+
 class TokenPriceProvider:
-    def __init__(self):
-        pass
-    
-    def get_token_price(self,token_address:str)->float:
-        pass
-    
-    async def update_token_price(self):
-        pass
-    
\ No newline at end of file
+    """
+    由池子储备推导的代币USD价格，不依赖外部行情
+    - 价格以每个链上原始单位(u64)计，策略的利润和gas都是原始单位，直接相乘即得USD
+    - 锚定代币(稳定币)的价格固定为 10^-decimals，其余代币沿流动性最好的池子向外传播:
+      每个代币选择瓶颈流动性最大的路径(路径上各池子输入侧储备的USD价值的最小值)，按最宽路径的Dijkstra求解。
+      瓶颈相同时依次比较跳数(少者优先)、最后一个池子的流动性和池子地址，路径每延长一跳都严格变差，
+      因此结果唯一，增量更新与全量重算一致
+    - 价格按代币下标存放在数组中，get_token_price 为一次字典查找加一次数组读取
+    - 重算在工作数组上进行，完成后复制一份并以一次赋值发布 (代币下标, 价格数组)；
+      策略线程读取的始终是某次更新完成后的完整价格表，不会读到重置为0或只更新了一半的价格
+    - 每个代币记录定价所用的池子，构成以锚定代币为根的树。增量更新时只重置经过变化池子的子树，
+      再从未受影响的邻居重新传播；变化的池子让某个代币的瓶颈变宽时，该代币及其子树一并重算
+    """
+    def __init__(self, db=None, anchors: Optional[Dict[str, int]] = None, min_liquidity_usd: float = 0.0):
+        self.db = db
+        self.anchors = dict(anchors or {})  # 锚定代币地址 -> 小数位数
+        self.min_liquidity_usd = min_liquidity_usd  # 低于该流动性(USD)的池子不参与定价
+        self.cursor: Optional[int] = None  # DB变更流游标，None表示尚未全量计算
+        # 按代币下标存放的价格表
+        self.token_index: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self.prices = array('d')  # 工作数组: 每原始单位的USD价格，0表示无法定价
+        self.widths = array('d')  # 定价路径的瓶颈流动性(USD)
+        self.hops = array('q')  # 定价路径的跳数
+        self.edge_liquidity = array('d')  # 定价所用池子的流动性(USD)
+        self.parents: List[Optional[str]] = []  # 定价所用的池子地址
+        self.parent_tokens = array('q')  # 定价所用池子另一侧的代币下标，-1表示没有
+        self.stamps = array('q')  # 价格每次变化递增，用于识别堆中过期的候选
+        # 定价树
+        self.children: List[Set[int]] = []  # 代币下标 -> 通过它定价的代币下标
+        self.pool_children: Dict[str, Set[int]] = {}  # 池子地址 -> 通过它定价的代币下标
+        self._seq = 0
+        self.full_rebuilds = 0
+        self.incremental_updates = 0
+        self.last_recomputed = 0  # 最近一次更新重新定价的代币数量
+        for token in self.anchors:
+            self._settle_anchor(self._index(token))
+        self._table: Tuple[Dict[str, int], array] = ({}, array('d'))  # 已发布的价格表
+        self._publish()
+
+    def get_token_price(self, token_address: str) -> float:
+        """每个原始单位的USD价格，无法定价的代币返回0"""
+        token_index, prices = self._table
+        index = token_index.get(token_address)
+        return prices[index] if index is not None else 0.0
+
+    def _publish(self):
+        """发布工作数组的副本，代币下标只在新增代币时复制"""
+        token_index = self._table[0]
+        if len(token_index) != len(self.tokens):
+            token_index = dict(self.token_index)
+        self._table = (token_index, array('d', self.prices))
+
+    async def update_token_price(self) -> int:
+        """按DB当前快照更新价格"""
+        if self.db is None:
+            return 0
+        return self.update_from_snapshot(self.db.snapshot())
+
+    def update_from_snapshot(self, snapshot) -> int:
+        """读取上次更新到快照之间变化的池子并增量重算，返回重新定价的代币数量"""
+        if self.cursor is None:
+            self.cursor = snapshot.change_seq
+            return self.rebuild(snapshot)
+        self.cursor, changed = self.db.changes_since(self.cursor, snapshot.change_seq)
+        if changed is None:
+            logger.warning("变更流游标已过期，全量重算代币价格")
+            return self.rebuild(snapshot)
+        if not changed:
+            return 0
+        return self.update_pools(snapshot, changed)
+
+    def rebuild(self, snapshot) -> int:
+        """全量重算"""
+        for index in range(len(self.tokens)):
+            self._reset(index)
+        heap: list = []
+        for token in self.anchors:
+            index = self._index(token)
+            self._settle_anchor(index)
+            self._relax(snapshot, index, heap)
+        self.full_rebuilds += 1
+        self.last_recomputed = self._run(snapshot, heap)
+        self._publish()
+        return self.last_recomputed
+
+    def update_pools(self, snapshot, changed: Iterable[str]) -> int:
+        """只重算受变化池子影响的代币"""
+        heap: list = []
+        dirty: Set[int] = set()
+        for pool_address in changed:
+            for index in list(self.pool_children.get(pool_address, ())):
+                self._invalidate(index, dirty)
+        self._seed(snapshot, dirty, dirty, heap)
+        # 变化的池子可能为两端的代币提供更宽的路径
+        for pool_address in changed:
+            pool = snapshot.get_pool(pool_address)
+            if pool is None:
+                continue
+            for token in (pool.token0, pool.token1):
+                index = self._index(token)
+                if self.prices[index] > 0:
+                    self._relax_pool(index, pool, heap)
+        self.incremental_updates += 1
+        self.last_recomputed = self._run(snapshot, heap, dirty)
+        self._publish()
+        return self.last_recomputed
+
+    def stats(self) -> Dict:
+        return {
+            "tokens": len(self.tokens),
+            "priced": sum(1 for price in self.prices if price > 0),
+            "full_rebuilds": self.full_rebuilds,
+            "incremental_updates": self.incremental_updates,
+            "last_recomputed": self.last_recomputed,
+        }
+
+    def _index(self, token: str) -> int:
+        index = self.token_index.get(token)
+        if index is None:
+            index = self.token_index[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.prices.append(0.0)
+            self.widths.append(0.0)
+            self.hops.append(0)
+            self.edge_liquidity.append(0.0)
+            self.parents.append(None)
+            self.parent_tokens.append(-1)
+            self.stamps.append(0)
+            self.children.append(set())
+        return index
+
+    def _settle_anchor(self, index: int):
+        self.prices[index] = 10.0 ** -self.anchors[self.tokens[index]]
+        self.widths[index] = math.inf
+        self.hops[index] = 0
+        self.edge_liquidity[index] = math.inf
+        self.stamps[index] += 1
+
+    def _reset(self, index: int):
+        """清除代币的价格并从定价树上摘下，子节点由调用方处理"""
+        parent_pool = self.parents[index]
+        if parent_pool is not None:
+            self.pool_children[parent_pool].discard(index)
+            self.children[self.parent_tokens[index]].discard(index)
+        self.parents[index] = None
+        self.parent_tokens[index] = -1
+        if self.tokens[index] in self.anchors:
+            return
+        self.prices[index] = 0.0
+        self.widths[index] = 0.0
+        self.hops[index] = 0
+        self.edge_liquidity[index] = 0.0
+        self.stamps[index] += 1
+
+    def _key(self, index: int) -> Tuple[float, int, float, str]:
+        """代币当前定价路径的排序键，越小越优；未定价的代币排在任何候选之后"""
+        return -self.widths[index], self.hops[index], -self.edge_liquidity[index], self.parents[index] or ""
+
+    def _invalidate(self, root: int, dirty: Set[int]) -> List[int]:
+        """重置root及通过它定价的所有代币，加入dirty并返回本次重置的代币"""
+        reset = []
+        stack = [root]
+        while stack:
+            index = stack.pop()
+            if index in dirty:
+                continue
+            dirty.add(index)
+            reset.append(index)
+            stack.extend(self.children[index])
+            self._reset(index)
+        return reset
+
+    def _seed(self, snapshot, indexes: Iterable[int], dirty: Set[int], heap: list):
+        """从已定价的邻居出发为被重置的代币生成候选"""
+        for index in indexes:
+            for pool_address in snapshot.by_token.get(self.tokens[index], ()):
+                pool = snapshot.pools[pool_address]
+                other = self._index(pool.token1 if pool.token0 == self.tokens[index] else pool.token0)
+                if other not in dirty and self.prices[other] > 0:
+                    self._relax_pool(other, pool, heap)
+
+    def _relax(self, snapshot, index: int, heap: list):
+        for pool_address in snapshot.by_token.get(self.tokens[index], ()):
+            self._relax_pool(index, snapshot.pools[pool_address], heap)
+
+    def _relax_pool(self, index: int, pool, heap: list):
+        """以已定价的代币index为输入侧，为池子另一侧的代币生成候选"""
+        token = self.tokens[index]
+        rate = spot_rate(pool, token)
+        if not rate:
+            return
+        reserve = pool.amount0 if token == pool.token0 else pool.amount1
+        liquidity = reserve * self.prices[index]
+        if liquidity < self.min_liquidity_usd:
+            return
+        other = self._index(pool.token1 if token == pool.token0 else pool.token0)
+        key = (-min(self.widths[index], liquidity), self.hops[index] + 1, -liquidity, pool.address)
+        if key >= self._key(other):
+            return
+        self._seq += 1
+        heapq.heappush(heap, (key, self._seq, other, index, self.stamps[index], self.prices[index] / rate))
+
+    def _run(self, snapshot, heap: list, dirty: Optional[Set[int]] = None) -> int:
+        """最宽路径Dijkstra，按排序键从优到劣确定代币价格"""
+        settled = 0
+        dirty = set() if dirty is None else dirty
+        while heap:
+            key, _, index, source, stamp, price = heapq.heappop(heap)
+            # 输入侧代币的价格在入堆之后变化过，候选已过期
+            if self.stamps[source] != stamp or key >= self._key(index):
+                continue
+            if index not in dirty:
+                # 已定价的代币找到更优的路径，子树的价格随之变化
+                reset = []
+                for child in list(self.children[index]):
+                    reset += self._invalidate(child, dirty)
+                self._seed(snapshot, reset, dirty, heap)
+            self._reset(index)
+            self.children[source].add(index)
+            negative_width, hops, negative_liquidity, pool_address = key
+            self.prices[index] = price
+            self.widths[index] = -negative_width
+            self.hops[index] = hops
+            self.edge_liquidity[index] = -negative_liquidity
+            self.parents[index] = pool_address
+            self.parent_tokens[index] = source
+            self.pool_children.setdefault(pool_address, set()).add(index)
+            dirty.discard(index)
+            settled += 1
+            self._relax(snapshot, index, heap)
+        return settled
@@ -0,0 +1,118 @@
+import asyncio
+from src.monitor.checkpoint_streamer import CheckpointStreamer
+
+class MockChain:
+    """按序号返回checkpoint，记录同时进行中的请求数量"""
+    def __init__(self, latest: int, fail_once=()):
+        self.latest = latest
+        self.fail_once = set(fail_once)
+        self.in_flight = 0
+        self.peak = 0
+        self.fetched = []
+
+    async def fetch_latest(self):
+        return self.latest
+
+    async def fetch_checkpoint(self, sequence: int):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            # 序号越小返回越慢，验证乱序完成时仍按顺序交付
+            await asyncio.sleep(0.001 * (10 - sequence % 10))
+            if sequence in self.fail_once:
+                self.fail_once.discard(sequence)
+                raise ConnectionError("timeout")
+            self.fetched.append(sequence)
+            return [f"tx{sequence}"]
+        finally:
+            self.in_flight -= 1
+
+def make_streamer(chain, handled, failing=None, **kwargs):
+    async def handle(sequence, checkpoint):
+        # failing: 序号 -> 剩余的失败次数
+        if failing and failing.get(sequence, 0) > 0:
+            failing[sequence] -= 1
+            raise RuntimeError("handler failed")
+        handled.append((sequence, checkpoint))
+    return CheckpointStreamer(chain.fetch_latest, chain.fetch_checkpoint, handle, retry_delay=0, **kwargs)
+
+def test_first_poll_starts_at_latest():
+    chain, handled = MockChain(100), []
+    streamer = make_streamer(chain, handled)
+    assert asyncio.run(streamer.poll()) == 1
+    assert handled == [(100, ["tx100"])]
+    assert streamer.cursor == 100
+
+def test_gap_filled_in_order_with_bounded_concurrency():
+    chain, handled = MockChain(100), []
+    streamer = make_streamer(chain, handled, max_concurrency=4)
+    streamer.cursor = 80
+    assert asyncio.run(streamer.poll()) == 20
+    assert [sequence for sequence, _ in handled] == list(range(81, 101))
+    assert 1 < chain.peak <= 4
+
+def test_cursor_persisted_and_resumed(tmp_path):
+    cursor_path = str(tmp_path / "cursor")
+    chain, handled = MockChain(10), []
+    asyncio.run(make_streamer(chain, handled, cursor_path=cursor_path).poll())
+    chain.latest = 13
+
+    # 重启后从游标的下一个序号继续
+    resumed = make_streamer(chain, handled, cursor_path=cursor_path)
+    assert resumed.cursor == 10
+    asyncio.run(resumed.poll())
+    assert [sequence for sequence, _ in handled] == [10, 11, 12, 13]
+
+def test_fetch_failure_stops_at_gap():
+    chain, handled = MockChain(20, fail_once={15}), []
+    streamer = make_streamer(chain, handled, max_retries=1)
+    streamer.cursor = 10
+    asyncio.run(streamer.poll())
+    assert streamer.cursor == 14
+
+    # 下次轮询从失败的序号继续，不留空洞
+    asyncio.run(streamer.poll())
+    assert [sequence for sequence, _ in handled] == list(range(11, 21))
+
+def test_retry_recovers_transient_failure():
+    chain, handled = MockChain(20, fail_once={15}), []
+    streamer = make_streamer(chain, handled, max_retries=2)
+    streamer.cursor = 10
+    assert asyncio.run(streamer.poll()) == 10
+
+def test_batch_limit():
+    chain, handled = MockChain(100), []
+    streamer = make_streamer(chain, handled, max_batch=5)
+    streamer.cursor = 0
+    assert asyncio.run(streamer.poll()) == 5
+    assert streamer.cursor == 5
+
+def test_handler_failure_keeps_cursor_and_retries():
+    chain, handled = MockChain(20), []
+    streamer = make_streamer(chain, handled, failing={15: 1})
+    streamer.cursor = 10
+    asyncio.run(streamer.poll())
+    # 失败的checkpoint之前的已处理，游标不越过失败的序号
+    assert streamer.cursor == 14
+
+    asyncio.run(streamer.poll())
+    assert [sequence for sequence, _ in handled] == list(range(11, 21))
+    assert streamer.dead_letters == []
+
+def test_repeated_handler_failure_dead_lettered(tmp_path):
+    dead_letter_path = str(tmp_path / "dead")
+    chain, handled = MockChain(20), []
+    streamer = make_streamer(chain, handled, failing={15: 100}, max_handle_failures=3,
+                             dead_letter_path=dead_letter_path)
+    streamer.cursor = 10
+    for _ in range(2):
+        asyncio.run(streamer.poll())
+        assert streamer.cursor == 14
+
+    # 第三次失败后记入死信并跳过
+    asyncio.run(streamer.poll())
+    assert streamer.cursor == 20
+    assert streamer.dead_letters == [15]
+    assert [sequence for sequence, _ in handled] == [11, 12, 13, 14, 16, 17, 18, 19, 20]
+    with open(dead_letter_path) as f:
+        assert f.read().startswith("15\t")
@@ -0,0 +1,106 @@
+import pytest
+from decimal import Decimal, localcontext
+from src.dex.clmm import (
+    ClmmDex, ClmmPoolState, Q64, MIN_TICK, MAX_TICK, MIN_SQRT_PRICE_X64, MAX_SQRT_PRICE_X64,
+    get_sqrt_price_at_tick, get_tick_at_sqrt_price
+)
+
+@pytest.mark.parametrize("tick", [0, 1, -1, 60, -60, 12345, -12345, 200000, -200000])
+def test_sqrt_price_at_tick_matches_float(tick):
+    with localcontext() as context:
+        context.prec = 60
+        expected = (Decimal("1.0001") ** tick).sqrt() * Q64
+        assert abs(get_sqrt_price_at_tick(tick) - expected) / expected < Decimal("1e-15")
+
+def test_sqrt_price_bounds():
+    assert get_sqrt_price_at_tick(0) == Q64
+    assert get_sqrt_price_at_tick(MIN_TICK) == MIN_SQRT_PRICE_X64
+    assert get_sqrt_price_at_tick(MAX_TICK) == MAX_SQRT_PRICE_X64
+
+@pytest.mark.parametrize("tick", [0, 1, -1, 887, -887, 100000, -100000])
+def test_tick_at_sqrt_price_inverse(tick):
+    sqrt_price = get_sqrt_price_at_tick(tick)
+    assert get_tick_at_sqrt_price(sqrt_price) == tick
+    assert get_tick_at_sqrt_price(sqrt_price + 1) == tick
+    assert get_tick_at_sqrt_price(sqrt_price - 1) == tick - 1
+
+def make_state(liquidity: int = 10**12, fee_rate: int = 2500) -> ClmmPoolState:
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=liquidity, fee_rate=fee_rate)
+    # 一个覆盖 [-1000, 1000) 的仓位: 下边界净流动性为正，上边界为负
+    state.set_tick(-1000, liquidity)
+    state.set_tick(1000, -liquidity)
+    return state
+
+def test_swap_within_range_matches_constant_product():
+    # 不跨tick时等价于虚拟储备 x = y = L 的 x * y = k 池子
+    liquidity = 10**12
+    state = make_state(liquidity)
+    amount_in = 10**9
+
+    result = state.swap(amount_in, a2b=True)
+
+    amount_in_less_fee = amount_in * (1 - 0.0025)
+    expected = amount_in_less_fee * liquidity / (liquidity + amount_in_less_fee)
+    assert result.ticks_crossed == 0
+    assert result.amount_in == amount_in
+    assert abs(result.amount_out - expected) <= 2
+    assert result.amount_out < expected  # 输出向下取整
+
+def test_swap_crosses_ticks_and_updates_liquidity():
+    # 再加一个覆盖 [-500, 1000) 的仓位，向下穿过-500后流动性减少
+    state = make_state(liquidity=10**12)
+    state.liquidity += 5 * 10**11
+    state.set_tick(-500, 5 * 10**11)
+    state.set_tick(1000, -15 * 10**11)
+
+    result = state.swap(10**12, a2b=True)
+
+    assert result.ticks_crossed == 2
+    assert result.tick_after < -1000
+    assert result.liquidity_after == 0
+    # 流动性耗尽，输入没有全部成交
+    assert result.amount_in < 10**12
+
+def test_swap_does_not_mutate_state():
+    state = make_state()
+    state.swap(10**11, a2b=False)
+    assert state.sqrt_price == Q64
+    assert state.liquidity == 10**12
+
+def test_set_tick_keeps_sorted_and_removes():
+    state = make_state()
+    state.set_tick(0, 5)
+    state.set_tick(-1000, 0)
+    assert list(state.tick_indexes) == [0, 1000]
+    assert state.liquidity_nets == [5, -10**12]
+
+def test_dex_quote_direction():
+    state = make_state()
+    dex = ClmmDex("cetus", "0x...", state)
+    assert dex.get_amount_out(Decimal(10**9), "A", "B") == Decimal(state.swap(10**9, a2b=True).amount_out)
+    assert dex.get_amount_out(Decimal(10**9), "B", "A") == Decimal(state.swap(10**9, a2b=False).amount_out)
+
+@pytest.mark.parametrize("token_in, token_out", [("A", "B"), ("B", "A")])
+@pytest.mark.parametrize("amount_out", [1, 10**9, 5 * 10**10])
+def test_dex_amount_in_inverts_amount_out(token_in, token_out, amount_out):
+    # 再加一个覆盖 [-500, 500) 的仓位，5 * 10**10 的输出需要跨越它的边界
+    state = make_state(liquidity=10**12)
+    state.liquidity += 5 * 10**11
+    state.set_tick(-500, 5 * 10**11)
+    state.set_tick(500, -5 * 10**11)
+    dex = ClmmDex("cetus", "0x...", state)
+
+    amount_in = dex.get_amount_in(Decimal(amount_out), token_in, token_out)
+
+    # 输入向上取整，足以取得目标输出，少一个单位则不够
+    assert dex.get_amount_out(amount_in, token_in, token_out) >= amount_out
+    assert dex.get_amount_out(amount_in - 1, token_in, token_out) < amount_out
+
+def test_dex_amount_in_rejects_output_beyond_liquidity():
+    state = make_state()
+    dex = ClmmDex("cetus", "0x...", state)
+    # 流动性只覆盖 [-1000, 1000)，能取出的token_b有限
+    available = state.swap(10**15, a2b=True).amount_out
+    assert dex.get_amount_in(Decimal(available), "A", "B") > 0
+    with pytest.raises(ValueError):
+        dex.get_amount_in(Decimal(available + 1), "A", "B")
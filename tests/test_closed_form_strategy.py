@@ -0,0 +1,79 @@
+import asyncio
+from decimal import Decimal
+from src.strategy.closed_form_strategy import ClosedFormArbitrageStrategy
+
+class MockDex:
+    def __init__(self, dex_type: str = "v2"):
+        self.name = "mock_dex"
+        self.dex_type = dex_type
+
+class MockPool:
+    def __init__(self, address: str, token_in: str, token_out: str, reserve_in: int, reserve_out: int,
+                 fee: Decimal = Decimal("0.003"), dex_type: str = "v2"):
+        self.address = address
+        self.token0 = token_in
+        self.token1 = token_out
+        self.amount0 = Decimal(reserve_in)
+        self.amount1 = Decimal(reserve_out)
+        self.token_in = token_in
+        self.token_out = token_out
+        self.fee = fee
+        self.dex = MockDex(dex_type)
+
+class MockTokenPriceProvider:
+    def get_token_price(self, token_address: str) -> float:
+        return 1.0
+
+class MockFallback:
+    def __init__(self):
+        self.path_list = None
+
+    async def find_arbitrage_opportunity(self, path_list, cancel=None):
+        self.path_list = path_list
+        return []
+
+def simulate(path, amount: Decimal) -> Decimal:
+    # 逐跳模拟 x * y = k 兑换
+    for pool in path:
+        amount_with_fee = amount * (1 - pool.fee)
+        amount = amount_with_fee * pool.amount1 / (pool.amount0 + amount_with_fee)
+    return amount
+
+def three_hop_path():
+    return [
+        MockPool("0x1", "USDC", "SUI", 10**12, 2 * 10**12),
+        MockPool("0x2", "SUI", "CETUS", 10**12, 10**12),
+        MockPool("0x3", "CETUS", "USDC", 2 * 10**12, 1_100_000_000_000),
+    ]
+
+def test_closed_form_matches_simulation():
+    strategy = ClosedFormArbitrageStrategy(token_price_provider=MockTokenPriceProvider())
+    path = three_hop_path()
+
+    opportunities = asyncio.run(strategy.find_arbitrage_opportunity([path]))
+
+    assert len(opportunities) == 1
+    amount = opportunities[0]["input_amount"]
+    profit = opportunities[0]["expected_profit"]
+    # 整数运算每跳最多向下取整一个单位
+    assert 0 <= simulate(path, amount) - amount - profit < len(path)
+    # 最优点两侧的利润都不应更高
+    for other in (amount * Decimal("0.99"), amount * Decimal("1.01")):
+        assert simulate(path, other) - other <= profit
+
+def test_unprofitable_path_is_skipped():
+    strategy = ClosedFormArbitrageStrategy(token_price_provider=MockTokenPriceProvider())
+    path = three_hop_path()
+    path[2].amount1 = Decimal(10**12)
+
+    assert asyncio.run(strategy.find_arbitrage_opportunity([path])) == []
+
+def test_non_v2_paths_go_to_fallback():
+    fallback = MockFallback()
+    strategy = ClosedFormArbitrageStrategy(token_price_provider=MockTokenPriceProvider(), fallback=fallback)
+    clmm_path = three_hop_path()
+    clmm_path[1].dex = MockDex("clmm")
+
+    asyncio.run(strategy.find_arbitrage_opportunity([three_hop_path(), clmm_path]))
+
+    assert fallback.path_list == [clmm_path]
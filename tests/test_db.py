@@ -0,0 +1,149 @@
+import asyncio
+from src.db.db import DB
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64, get_sqrt_price_at_tick
+from src.dex.events import EventDecoder
+
+KRIYA = "0xkriya"
+CETUS = "0xcetus"
+
+class MockDex:
+    def __init__(self):
+        self.name = "kriya"
+        self.dex_type = "v2"
+
+class MockPool:
+    def __init__(self, address, token0, token1, amount0=1000, amount1=2000, dex=None):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.dex = dex or MockDex()
+
+def swap_transaction(pool_address, previous_version, reserve_x, reserve_y):
+    return {
+        "effects": {
+            "modifiedAtVersions": [{"objectId": pool_address, "sequenceNumber": str(previous_version)}],
+            "mutated": [{"reference": {"objectId": pool_address, "version": str(previous_version + 1)}}],
+        },
+        "events": [{
+            "type": f"{KRIYA}::spot_dex::SwapEvent<A, B>",
+            "parsedJson": {"pool_id": pool_address, "amount_in": "1", "amount_out": "1",
+                           "reserve_x": str(reserve_x), "reserve_y": str(reserve_y)},
+        }],
+    }
+
+def make_db():
+    db = DB(event_decoder=EventDecoder({KRIYA: "kriya", CETUS: "cetus"}))
+    db.add_pool(MockPool("0x1", "A", "B"), version=1)
+    db.add_pool(MockPool("0x2", "B", "A"), version=1)
+    db.add_pool(MockPool("0x3", "B", "C"), version=1)
+    return db
+
+def addresses(pools):
+    return sorted(pool.address for pool in pools)
+
+def test_indexes():
+    db = make_db()
+    assert addresses(asyncio.run(db.get_pool_by_token_address("B"))) == ["0x1", "0x2", "0x3"]
+    assert addresses(db.get_pools_by_pair("A", "B")) == ["0x1", "0x2"]
+    assert addresses(db.get_pools_by_pair("C", "B")) == ["0x3"]
+    assert db.get_pools_by_pair("A", "C") == []
+
+    db.remove_pool("0x2")
+    assert addresses(db.get_pools_by_pair("B", "A")) == ["0x1"]
+    assert addresses(db.get_all_pools()) == ["0x1", "0x3"]
+    db.remove_pool("0x3")
+    assert "C" not in db.by_token
+
+def test_versions_tracked_on_pools():
+    db = make_db()
+    asyncio.run(db.update_pool([swap_transaction("0x1", 1, 1100, 1900)]))
+    pool = asyncio.run(db.get_pool("0x1"))
+    assert (pool.object_version, pool.reserve_version) == (2, 2)
+    assert db.pool_versions["0x1"] == 2 and db.object_versions["0x1"] == 2
+
+def test_snapshot_is_isolated_from_updates():
+    db = make_db()
+    snapshot = db.snapshot()
+    before = snapshot.get_pool("0x1")
+
+    asyncio.run(db.update_pool([swap_transaction("0x1", 1, 1100, 1900)]))
+    db.add_pool(MockPool("0x4", "A", "C"), version=1)
+
+    # 快照中的池子、版本和索引都保持拍快照时的状态
+    assert (before.amount0, before.amount1) == (1000, 2000)
+    assert snapshot.object_versions["0x1"] == 1
+    assert snapshot.get_pool("0x4") is None
+    assert snapshot.get_pools_by_pair("A", "C") == []
+    # DB看到的是新状态，且只复制了被修改的池子
+    current = asyncio.run(db.get_pool("0x1"))
+    assert current is not before and (current.amount0, current.amount1) == (1100, 1900)
+    assert asyncio.run(db.get_pool("0x3")) is snapshot.get_pool("0x3")
+    assert addresses(db.get_pools_by_pair("A", "C")) == ["0x4"]
+
+def test_updates_in_place_without_live_snapshots():
+    db = make_db()
+    pool = asyncio.run(db.get_pool("0x1"))
+    snapshot = db.snapshot()
+    del snapshot
+    asyncio.run(db.update_pool([swap_transaction("0x1", 1, 1100, 1900)]))
+    assert asyncio.run(db.get_pool("0x1")) is pool and pool.amount0 == 1100
+
+def test_clmm_state_copied_on_write():
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=10**12, fee_rate=2500)
+    db = DB(event_decoder=EventDecoder({CETUS: "cetus"}))
+    db.add_pool(MockPool("0xc", "A", "B", dex=ClmmDex("cetus", "0xrouter", state)), version=1)
+    snapshot = db.snapshot()
+    swap = {
+        "effects": {"modifiedAtVersions": [{"objectId": "0xc", "sequenceNumber": "1"}],
+                    "mutated": [{"reference": {"objectId": "0xc", "version": "2"}}]},
+        "events": [{"type": f"{CETUS}::pool::SwapEvent",
+                    "parsedJson": {"pool": "0xc", "atob": True, "amount_in": "1", "amount_out": "1",
+                                   "after_sqrt_price": str(get_sqrt_price_at_tick(-10)),
+                                   "vault_a_amount": "1", "vault_b_amount": "1"}}],
+    }
+    asyncio.run(db.update_pool([swap]))
+    assert snapshot.get_pool("0xc").dex.state.tick_current == 0
+    assert asyncio.run(db.get_pool("0xc")).dex.state.tick_current == -10
+
+def test_change_feed():
+    db = make_db()
+    cursor = db.change_seq
+    asyncio.run(db.update_pool([swap_transaction("0x1", 1, 1100, 1900),
+                                swap_transaction("0x3", 1, 1100, 1900)]))
+    snapshot = db.snapshot()
+    asyncio.run(db.update_pool([swap_transaction("0x2", 1, 1100, 1900)]))
+
+    cursor, changed = db.changes_since(cursor, snapshot.change_seq)
+    assert changed == {"0x1", "0x3"}
+    cursor, changed = db.changes_since(cursor)
+    assert changed == {"0x2"}
+    assert db.changes_since(cursor) == (cursor, set())
+
+def test_change_feed_gap_requires_rebuild():
+    db = DB(max_changes=2)
+    for i in range(4):
+        db.add_pool(MockPool(f"0x{i}", "A", "B"), version=1)
+    assert db.changes_since(0) == (4, None)
+    assert db.changes_since(2) == (4, {"0x2", "0x3"})
+
+def test_listeners_notified_on_new_and_removed_pools():
+    db = make_db()
+    added, removed = [], []
+    db.add_listener(on_added=lambda pool: added.append(pool.address), on_removed=removed.append)
+    db.add_pool(MockPool("0x4", "C", "D"), version=1)
+    db.add_pools([(MockPool("0x5", "D", "E"), 1), (MockPool("0x1", "A", "B"), 2)])
+    # 已有池子被新对象替换不通知
+    db.put_pool_if_newer(MockPool("0x3", "B", "C"), 2)
+    assert added == ["0x4", "0x5"]
+    db.remove_pool("0x4")
+    db.remove_pool("0x9")
+    assert removed == ["0x4"]
+
+def test_pools_in_transaction():
+    db = make_db()
+    assert db.pools_in_transaction(swap_transaction("0x1", 1, 10, 20)) == ["0x1"]
+    assert db.pools_in_transaction(swap_transaction("0x9", 1, 10, 20)) == []
+    # 只读取交易，不应用事件
+    assert db.object_versions["0x1"] == 1
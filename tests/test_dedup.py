@@ -0,0 +1,53 @@
+import random
+from src.common.dedup import BloomFilter, DigestDeduplicator
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cross_source_duplicates_counted_per_source():
+    deduplicator = DigestDeduplicator()
+    assert not deduplicator.is_duplicate("D1", "shio")
+    assert deduplicator.is_duplicate("D1", "checkpoint")
+    assert deduplicator.is_duplicate("D1", "checkpoint")
+    assert not deduplicator.is_duplicate("D2", "checkpoint")
+    stats = deduplicator.stats()
+    assert stats["checked"] == {"shio": 1, "checkpoint": 3}
+    assert stats["suppressed"] == {"checkpoint": 2}
+
+def test_filter_keeps_new_and_digestless_transactions():
+    deduplicator = DigestDeduplicator()
+    deduplicator.is_duplicate("D1", "shio")
+    transactions = [{"tx_hash": "D1"}, {"tx_hash": "D2"}, {"tx_hash": None}, {"tx_hash": "D2"}]
+    assert deduplicator.filter(transactions, "checkpoint") == [{"tx_hash": "D2"}, {"tx_hash": None}]
+
+def test_expired_digests_still_caught_by_bloom_filter():
+    clock = FakeClock()
+    deduplicator = DigestDeduplicator(ttl=10, clock=clock)
+    deduplicator.is_duplicate("D1", "shio")
+    clock.now = 11
+    assert deduplicator.is_duplicate("D1", "checkpoint")
+    assert deduplicator.stats()["recent"] == 0
+    assert deduplicator.bloom_hits == 1
+
+def test_memory_is_bounded():
+    deduplicator = DigestDeduplicator(max_size=100, capacity=1000)
+    for i in range(5000):
+        deduplicator.is_duplicate(f"D{i}", "checkpoint")
+    stats = deduplicator.stats()
+    assert stats["recent"] == 100
+    # 只保留两代Bloom过滤器，最早的digest已经被轮换出去
+    assert stats["bloom_count"] <= 2000
+    assert not deduplicator.is_duplicate("D0", "checkpoint")
+    assert deduplicator.is_duplicate("D4999", "checkpoint")
+
+def test_bloom_false_positive_rate():
+    bloom = BloomFilter(capacity=10000, error_rate=1e-3)
+    rng = random.Random(3)
+    for _ in range(10000):
+        bloom.add(f"{rng.getrandbits(128):032x}")
+    false_positives = sum(f"other{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 3e-3
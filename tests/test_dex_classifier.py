@@ -0,0 +1,92 @@
+from src.monitor.dex_classifier import DexClassifier, move_calls
+
+DEX_CONTRACTS = {
+    "turbos": {"pool": "0xturbos_pool", "router": "0xturbos"},
+    "cetus": {"pool": "0xcetus_pool", "router": "0xcetus"},
+}
+DEX_FUNCTIONS = {
+    "swap_exact_input": "0xcetus::router::swap_exact_input",
+    "add_liquidity": "0xturbos::pool::add_liquidity",
+}
+
+def make_classifier():
+    return DexClassifier(DEX_CONTRACTS, DEX_FUNCTIONS)
+
+def move_call(package, module, function, type_arguments=()):
+    return {"MoveCall": {"package": package, "module": module, "function": function,
+                         "type_arguments": list(type_arguments), "arguments": [{"Input": 0}]}}
+
+def transaction_block(digest, commands, events=(), sender="0xuser"):
+    """sui_multiGetTransactionBlocks(showInput, showEffects, showEvents) 返回的交易结构"""
+    return {
+        "digest": digest,
+        "transaction": {
+            "data": {
+                "messageVersion": "v1",
+                "transaction": {
+                    "kind": "ProgrammableTransaction",
+                    "inputs": [{"type": "pure", "valueType": "u64", "value": "1000"}],
+                    "transactions": list(commands),
+                },
+                "sender": sender,
+                "gasData": {"owner": sender, "price": "750", "budget": "5000000"},
+            },
+            "txSignatures": ["sig"],
+        },
+        "effects": {"status": {"status": "success"}, "lamportVersion": "11"},
+        "events": list(events),
+        "timestampMs": "1700000000000",
+        "checkpoint": "100",
+    }
+
+def test_swap_call_classified_in_one_pass():
+    transaction = transaction_block("D1", [
+        {"SplitCoins": ["GasCoin", [{"Input": 0}]]},
+        move_call("0x2", "coin", "split"),
+        move_call("0xcetus", "router", "swap_exact_input", ["0x2::sui::SUI", "0xusdc::usdc::USDC"]),
+        {"TransferObjects": [[{"Result": 2}], {"Input": 1}]},
+    ], events=[
+        {"type": "0x2::coin::Split", "parsedJson": {"amount_in": "1"}},
+        {"type": "0xcetus::pool::SwapEvent", "parsedJson": {"amount_in": "1000", "amount_out": "990"}},
+    ])
+    parsed = make_classifier().classify(transaction)
+    assert parsed["tx_hash"] == "D1"
+    assert parsed["sender"] == "0xuser"
+    assert parsed["timestamp"] == 1700000000000
+    assert parsed["dex_info"] == {"name": "cetus", "contract": "0xcetus"}
+    assert parsed["function_info"] == {"name": "swap_exact_input", "signature": "0xcetus::router::swap_exact_input"}
+    assert parsed["token_info"] == {
+        "token_in": "0x2::sui::SUI", "token_out": "0xusdc::usdc::USDC", "amount_in": 1000, "amount_out": 990
+    }
+    assert parsed["effects"] == transaction["effects"]
+
+def test_unknown_function_of_known_package():
+    transaction = transaction_block("D2", [move_call("0xturbos", "pool", "flash_swap")])
+    parsed = make_classifier().classify(transaction)
+    assert parsed["dex_info"]["name"] == "turbos"
+    assert parsed["function_info"] == {}
+    assert parsed["token_info"]["amount_in"] == 0
+
+def test_dex_and_action_from_different_calls():
+    transaction = transaction_block("D3", [
+        move_call("0xcetus_pool", "pool", "flash_swap"),
+        move_call("0xturbos", "pool", "add_liquidity"),
+    ])
+    parsed = make_classifier().classify(transaction)
+    assert parsed["dex_info"] == {"name": "cetus", "contract": "0xcetus_pool"}
+    assert parsed["function_info"]["name"] == "add_liquidity"
+
+def test_move_calls_skip_other_commands_and_missing_input():
+    transaction = transaction_block("D4", [{"MergeCoins": ["GasCoin", []]}, move_call("0x2", "pay", "split")])
+    assert [call["function"] for call in move_calls(transaction)] == ["split"]
+    assert move_calls({"digest": "D5", "effects": {}}) == []
+
+def test_batch_skips_non_dex_and_malformed():
+    transactions = [
+        transaction_block("A", [move_call("0x2", "pay", "split")]),
+        transaction_block("B", [move_call("0xcetus", "router", "swap_exact_input")],
+                          events=[{"type": "0xcetus::pool::SwapEvent", "parsedJson": {"amount_in": "bad"}}]),
+        transaction_block("C", [move_call("0xcetus", "router", "swap_exact_input")]),
+        {"digest": "E", "effects": {}},
+    ]
+    assert [parsed["tx_hash"] for parsed in make_classifier().classify_batch(transactions)] == ["C"]
@@ -0,0 +1,211 @@
+import asyncio
+import time
+import pytest
+from src.common.event_bus import (
+    EventBus, OVERFLOW_BLOCK, OVERFLOW_COALESCE, OVERFLOW_DROP_OLDEST,
+    PRIORITY_BEST_EFFORT, PRIORITY_CRITICAL, PRIORITY_NORMAL
+)
+
+def run(coroutine_function):
+    async def runner():
+        event_bus = EventBus(asyncio.get_running_loop())
+        try:
+            return await coroutine_function(event_bus)
+        finally:
+            event_bus.close()
+    return asyncio.run(runner())
+
+def make_handler(received, release=None):
+    async def handler(value):
+        if release is not None:
+            await release.wait()
+        received.append(value)
+    return handler
+
+def test_drop_oldest_keeps_latest_events():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx", max_size=2, policy=OVERFLOW_DROP_OLDEST)
+        event_bus.add_event("tx", make_handler(received, release))
+        for value in range(5):
+            event_bus.emit("tx", value)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    assert received == [3, 4]
+    (queue_stats,) = stats.values()
+    assert queue_stats["dropped"] == 3
+    assert queue_stats["max_depth"] == 2
+    assert queue_stats["depth"] == 0
+
+def test_coalesce_latest_wins_by_key():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx", max_size=8, policy=OVERFLOW_COALESCE, key=lambda value: value[0])
+        event_bus.add_event("tx", make_handler(received, release))
+        for value in ("a1", "b1", "a2", "a3", "b2"):
+            event_bus.emit("tx", value)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    # 每个key只保留最新的事件，且保持首次入队的顺序
+    assert received == ["a3", "b2"]
+    assert next(iter(stats.values()))["coalesced"] == 3
+
+def test_block_policy_applies_backpressure():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx", max_size=1, policy=OVERFLOW_BLOCK)
+        event_bus.add_event("tx", make_handler(received, release))
+        await event_bus.publish("tx", 1)
+        await asyncio.sleep(0)  # worker取走第一个事件后阻塞在handler中
+        await event_bus.publish("tx", 2)
+        # 队列已满: emit拒绝，publish等待
+        event_bus.emit("tx", 3)
+        waiting = asyncio.ensure_future(event_bus.publish("tx", 4))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        release.set()
+        await waiting
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    assert received == [1, 2, 4]
+    assert next(iter(stats.values()))["dropped"] == 1
+
+def test_workers_run_concurrently_and_sync_subscribers():
+    async def scenario(event_bus):
+        active, peak, sync_received = [0], [0], []
+
+        async def handler(value):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+        event_bus.configure_event("tx", workers=3)
+        event_bus.add_event("tx", handler)
+        event_bus.add_event("tx", sync_received.append)
+        for value in range(6):
+            event_bus.emit("tx", value)
+        await asyncio.sleep(0.1)
+        return peak[0], sorted(sync_received)
+
+    peak, sync_received = run(scenario)
+    assert peak == 3
+    assert sync_received == list(range(6))
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        EventBus(None).configure_event("tx", policy="fifo")
+
+def test_priority_then_deadline_order():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx")
+        event_bus.add_event("tx", make_handler(received, release))
+        now = time.monotonic()
+        event_bus.emit("tx", "blocker")
+        await asyncio.sleep(0)  # worker取走blocker后阻塞
+        event_bus.emit("tx", "poll", priority=PRIORITY_BEST_EFFORT)
+        event_bus.emit("tx", "normal")
+        event_bus.emit("tx", "auction-late", priority=PRIORITY_CRITICAL, deadline=now + 20)
+        event_bus.emit("tx", "auction-early", priority=PRIORITY_CRITICAL, deadline=now + 10)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received
+
+    assert run(scenario) == ["blocker", "auction-early", "auction-late", "normal", "poll"]
+
+def test_expired_events_dropped_before_handler_starts():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx")
+        event_bus.add_event("tx", make_handler(received, release))
+        event_bus.emit("tx", "blocker")
+        await asyncio.sleep(0)
+        event_bus.emit("tx", "auction", priority=PRIORITY_CRITICAL, deadline=time.monotonic() + 0.01)
+        event_bus.emit("tx", "poll", priority=PRIORITY_BEST_EFFORT)
+        await asyncio.sleep(0.02)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    assert received == ["blocker", "poll"]
+    assert next(iter(stats.values()))["expired"] == 1
+
+def test_overflow_evicts_least_urgent_lane():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx", max_size=2, policy=OVERFLOW_COALESCE)
+        event_bus.add_event("tx", make_handler(received, release))
+        event_bus.emit("tx", "poll-1", priority=PRIORITY_BEST_EFFORT)
+        event_bus.emit("tx", "normal-1", priority=PRIORITY_NORMAL)
+        # 同一优先级内后到的覆盖先到的
+        event_bus.emit("tx", "poll-2", priority=PRIORITY_BEST_EFFORT)
+        # 队列已满，拍卖事件挤掉优先级最低的轮询事件
+        event_bus.emit("tx", "auction", priority=PRIORITY_CRITICAL)
+        # 比所有待处理事件都不紧急的新事件被拒绝
+        event_bus.emit("tx", "poll-3", priority=PRIORITY_BEST_EFFORT)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received
+
+    assert run(scenario) == ["auction", "normal-1"]
+
+def test_expired_event_skipped_without_queue():
+    async def scenario(event_bus):
+        received = []
+        event_bus.add_event("tx", make_handler(received))
+        event_bus.emit("tx", "late", deadline=time.monotonic() - 1)
+        event_bus.emit("tx", "ok", deadline=time.monotonic() + 1)
+        await asyncio.sleep(0.01)
+        return received
+
+    assert run(scenario) == ["ok"]
+
+def test_coalesce_only_selected_lanes():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event(
+            "tx", max_size=8, policy=OVERFLOW_COALESCE, coalesce_priorities={PRIORITY_BEST_EFFORT}
+        )
+        event_bus.add_event("tx", make_handler(received, release))
+        event_bus.emit("tx", "blocker", priority=PRIORITY_CRITICAL)
+        await asyncio.sleep(0)  # worker取走第一个事件后阻塞在handler中
+        event_bus.emit("tx", "checkpoint-1", priority=PRIORITY_BEST_EFFORT)
+        event_bus.emit("tx", "auction-1", priority=PRIORITY_CRITICAL)
+        event_bus.emit("tx", "checkpoint-2", priority=PRIORITY_BEST_EFFORT)
+        # 不同的拍卖不能互相覆盖
+        event_bus.emit("tx", "auction-2", priority=PRIORITY_CRITICAL)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    assert received == ["blocker", "auction-1", "auction-2", "checkpoint-2"]
+    assert next(iter(stats.values()))["coalesced"] == 1
+
+def test_coalesce_with_unorderable_payloads():
+    async def scenario(event_bus):
+        received, release = [], asyncio.Event()
+        event_bus.configure_event("tx", max_size=8, policy=OVERFLOW_COALESCE)
+        event_bus.add_event("tx", make_handler(received, release))
+        event_bus.emit("tx", [{"tx_hash": "blocker"}], priority=PRIORITY_BEST_EFFORT)
+        await asyncio.sleep(0)  # worker取走第一个事件后阻塞在handler中
+        # 被覆盖的事件与新事件的排序字段相同，不能比较到字典载荷
+        for digest in ("D1", "D2", "D3"):
+            event_bus.emit("tx", [{"tx_hash": digest}], priority=PRIORITY_BEST_EFFORT)
+        release.set()
+        await asyncio.sleep(0.01)
+        return received, event_bus.queue_stats()
+
+    received, stats = run(scenario)
+    assert received == [[{"tx_hash": "blocker"}], [{"tx_hash": "D3"}]]
+    assert next(iter(stats.values()))["coalesced"] == 2
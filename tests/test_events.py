@@ -0,0 +1,134 @@
+import asyncio
+from src.db.db import DB
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64, get_sqrt_price_at_tick
+from src.dex.events import EventDecoder, object_versions
+
+CETUS = "0xcetus"
+KRIYA = "0xkriya"
+
+class MockDex:
+    def __init__(self, name="kriya", dex_type="v2"):
+        self.name = name
+        self.dex_type = dex_type
+
+class MockPool:
+    def __init__(self, address, amount0, amount1, dex=None):
+        self.address = address
+        self.token0 = "A"
+        self.token1 = "B"
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.dex = dex or MockDex()
+
+def make_transaction(pool_address, previous_version, new_version, events):
+    return {
+        "effects": {
+            "modifiedAtVersions": [{"objectId": pool_address, "sequenceNumber": str(previous_version)}],
+            "mutated": [{"reference": {"objectId": pool_address, "version": str(new_version)}}],
+        },
+        "events": events,
+    }
+
+def kriya_swap(pool_address, reserve_x, reserve_y):
+    return {
+        "type": f"{KRIYA}::spot_dex::SwapEvent<0x2::sui::SUI>",
+        "parsedJson": {"pool_id": pool_address, "amount_in": "10", "amount_out": "9",
+                       "reserve_x": str(reserve_x), "reserve_y": str(reserve_y)},
+    }
+
+def make_db(fetch_pool_object=None):
+    return DB(event_decoder=EventDecoder({CETUS: "cetus", KRIYA: "kriya"}), fetch_pool_object=fetch_pool_object)
+
+def test_object_versions():
+    transaction = make_transaction("0xp", 5, 9, [])
+    assert object_versions(transaction["effects"]) == {"0xp": (5, 9)}
+
+def test_v2_swap_event_applied_without_fetch():
+    db = make_db()
+    pool = MockPool("0xp", 1000, 2000)
+    db.add_pool(pool, version=5)
+
+    asyncio.run(db.update_pool([make_transaction("0xp", 5, 9, [kriya_swap("0xp", 1010, 1991)])]))
+    assert (pool.amount0, pool.amount1) == (1010, 1991)
+    assert db.object_versions["0xp"] == 9
+    assert db.events_applied == 1 and db.objects_fetched == 0
+
+    # 重复的交易不会再次应用
+    asyncio.run(db.update_pool([make_transaction("0xp", 5, 9, [kriya_swap("0xp", 1, 1)])]))
+    assert (pool.amount0, pool.amount1) == (1010, 1991)
+
+def test_version_gap_falls_back_to_fetch():
+    fetched = MockPool("0xp", 7, 8)
+
+    async def fetch_pool_object(address):
+        return fetched, 12
+
+    db = make_db(fetch_pool_object)
+    db.add_pool(MockPool("0xp", 1000, 2000), version=5)
+    # 交易前版本为10，说明本地错过了版本5之后的交易
+    asyncio.run(db.update_pool([make_transaction("0xp", 10, 12, [kriya_swap("0xp", 1010, 1991)])]))
+    assert asyncio.run(db.get_pool("0xp")) is fetched
+    assert db.object_versions["0xp"] == 12
+    assert db.objects_fetched == 1 and db.events_applied == 0
+
+def test_clmm_swap_and_liquidity_events():
+    liquidity = 10**12
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=liquidity, fee_rate=2500)
+    state.set_tick(-1000, liquidity)
+    state.set_tick(1000, -liquidity)
+    pool = MockPool("0xc", 10**9, 10**9, dex=ClmmDex("cetus", "0xrouter", state))
+    db = make_db()
+    db.add_pool(pool, version=1)
+
+    # 新增覆盖当前价格的仓位 [-100, 100)，tick以u32补码表示
+    add_event = {
+        "type": f"{CETUS}::pool::AddLiquidityEvent",
+        "parsedJson": {"pool": "0xc", "liquidity": str(liquidity), "amount_a": "5", "amount_b": "6",
+                       "tick_lower": {"bits": (1 << 32) - 100}, "tick_upper": {"bits": 100}},
+    }
+    # 兑换后价格降到tick -500，跨越了tick -100
+    after_sqrt_price = get_sqrt_price_at_tick(-500)
+    swap_event = {
+        "type": f"{CETUS}::pool::SwapEvent",
+        "parsedJson": {"pool": "0xc", "atob": True, "amount_in": "100", "amount_out": "90",
+                       "after_sqrt_price": str(after_sqrt_price),
+                       "vault_a_amount": "123", "vault_b_amount": "456"},
+    }
+    asyncio.run(db.update_pool([make_transaction("0xc", 1, 2, [add_event, swap_event])]))
+
+    assert state.liquidity_net(-100) == liquidity
+    assert state.liquidity_net(100) == -liquidity
+    assert state.sqrt_price == after_sqrt_price
+    assert state.tick_current == -500
+    # 跨越 -100 后新增的流动性不再活跃
+    assert state.liquidity == liquidity
+    assert (pool.amount0, pool.amount1) == (123, 456)
+
+def test_unknown_events_ignored():
+    db = make_db()
+    pool = MockPool("0xp", 1000, 2000)
+    db.add_pool(pool, version=5)
+    event = {"type": "0xother::pool::SwapEvent", "parsedJson": {"pool": "0xp"}}
+    asyncio.run(db.update_pool([make_transaction("0xp", 5, 9, [event])]))
+    assert db.object_versions["0xp"] == 5
+
+def test_modified_pool_without_decoded_event_is_fetched():
+    fetched = MockPool("0xflowx", 7, 8, dex=MockDex("flowx"))
+    requested = []
+
+    async def fetch_pool_object(address):
+        requested.append(address)
+        return fetched, 6
+
+    db = make_db(fetch_pool_object)
+    db.add_pool(MockPool("0xflowx", 1000, 2000, dex=MockDex("flowx")), version=5)
+    # FlowX的兑换事件不含池子ID，只能从effects中看到池子被修改
+    event = {"type": "0xflowx::pair::Swapped", "parsedJson": {"amount_x_in": "1"}}
+    asyncio.run(db.update_pool([make_transaction("0xflowx", 5, 6, [event])]))
+    assert requested == ["0xflowx"]
+    assert asyncio.run(db.get_pool("0xflowx")) is fetched
+    assert db.object_versions["0xflowx"] == 6
+
+    # 已经是最新版本时不再拉取
+    asyncio.run(db.update_pool([make_transaction("0xflowx", 5, 6, [])]))
+    assert requested == ["0xflowx"]
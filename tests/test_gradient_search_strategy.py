@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from decimal import Decimal
+from src.dex.swap_math import get_path_amount_out
+from src.strategy.gradient_search_strategy import GradientSearchStrategy, SEARCH_MODE_BATCHED
+
+class MockDex:
+    def __init__(self, pool):
+        self.name = "mock_dex"
+        self.dex_type = "clmm"
+        self.pool = pool
+        self.calls = 0
+
+    def get_amount_out(self, amount_in: Decimal, token_in: str, token_out: str) -> Decimal:
+        self.calls += 1
+        pool = self.pool
+        amount_in_with_fee = amount_in * (1 - pool.fee)
+        return amount_in_with_fee * pool.amount1 / (pool.amount0 + amount_in_with_fee)
+
+class MockPool:
+    def __init__(self, address: str, token_in: str, token_out: str, reserve_in: int, reserve_out: int,
+                 fee: Decimal = Decimal("0.003"), dex_type: str = "clmm", dex_name: str = "mock_dex"):
+        self.address = address
+        self.token0 = token_in
+        self.token1 = token_out
+        self.amount0 = Decimal(reserve_in)
+        self.amount1 = Decimal(reserve_out)
+        self.token_in = token_in
+        self.token_out = token_out
+        self.fee = fee
+        self.dex = MockDex(self)
+        self.dex.dex_type = dex_type
+        self.dex.name = dex_name
+
+class MockTokenPriceProvider:
+    def get_token_price(self, token_address: str) -> float:
+        return 1.0
+
+def make_path(final_reserve: int, dex_types=("clmm", "clmm", "clmm")):
+    return [
+        MockPool("0x1", "USDC", "SUI", 10**12, 2 * 10**12, dex_type=dex_types[0]),
+        MockPool("0x2", "SUI", "CETUS", 10**12, 10**12, dex_type=dex_types[1]),
+        MockPool("0x3", "CETUS", "USDC", 2 * 10**12, final_reserve, dex_type=dex_types[2]),
+    ]
+
+def test_batched_search_finds_optimum():
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(),
+                                      search_mode=SEARCH_MODE_BATCHED)
+    paths = [make_path(1_100_000_000_000), make_path(1_050_000_000_000), make_path(10**12)]
+
+    opportunities = asyncio.run(strategy.find_arbitrage_opportunity(paths))
+
+    assert [opportunity["path"] for opportunity in opportunities] == paths[:2]
+    # x * y = k 路径的解析最优利润
+    for opportunity, expected_profit in zip(opportunities, (Decimal("488970975.68"), Decimal("101483759.91"))):
+        assert abs(opportunity["expected_profit"] - expected_profit) / expected_profit < Decimal("1e-6")
+
+def test_batched_search_uses_fixed_number_of_evaluations():
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(),
+                                      search_mode=SEARCH_MODE_BATCHED, grid_size=16, refine_iterations=24)
+    path = make_path(1_100_000_000_000)
+
+    asyncio.run(strategy.find_arbitrage_opportunity([path]))
+
+    # 网格、黄金分割各点，加上最优金额的一次整数复核
+    assert path[0].dex.calls == 16 + 2 + 24 + 1
+
+def test_batched_search_stacks_v2_paths():
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(),
+                                      search_mode=SEARCH_MODE_BATCHED)
+    three_hop = make_path(1_100_000_000_000, ("v2", "v2", "v2"))
+    # 长度不同、取整方式不同的路径堆叠在同一个矩阵中
+    two_hop = [
+        MockPool("0x4", "USDC", "SUI", 10**12, 2 * 10**12, dex_type="v2", dex_name="kriya"),
+        MockPool("0x5", "SUI", "USDC", 2 * 10**12, 1_100_000_000_000, dex_type="v2"),
+    ]
+    mixed = make_path(1_100_000_000_000, ("v2", "clmm", "v2"))
+
+    opportunities = asyncio.run(strategy.find_arbitrage_opportunity([three_hop, two_hop, mixed]))
+
+    assert [opportunity["path"] for opportunity in opportunities] == [three_hop, two_hop, mixed]
+    three_hop_result, two_hop_result, mixed_result = opportunities
+    expected_profit = Decimal("488970975.68")
+    for opportunity in (three_hop_result, mixed_result):
+        assert abs(opportunity["expected_profit"] - expected_profit) / expected_profit < Decimal("1e-6")
+    # v2池子不逐个报价，非v2池子在网格、黄金分割各点和最后一次整数复核时报价
+    assert all(pool.dex.calls == 0 for pool in three_hop + two_hop)
+    assert mixed[1].dex.calls == 16 + 2 + 24 + 1
+    # 所有路径的利润都按整数运算复核
+    for opportunity in opportunities:
+        amount = int(opportunity["input_amount"])
+        assert opportunity["expected_profit"] == get_path_amount_out(opportunity["path"], amount) - amount
+
+def test_batched_search_drops_unverified_profit():
+    # 浮点报价显示有利润，但链上整数报价没有利润的路径不报告
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(),
+                                      search_mode=SEARCH_MODE_BATCHED)
+    path = make_path(1_100_000_000_000)
+    strategy._get_path_amount_out = lambda path, amount_in: amount_in
+
+    assert asyncio.run(strategy.find_arbitrage_opportunity([path])) == []
+
+def test_batched_search_stops_between_iterations_when_cancelled():
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(),
+                                      search_mode=SEARCH_MODE_BATCHED, grid_size=16, refine_iterations=24)
+    path = make_path(1_100_000_000_000)
+    cancel = threading.Event()
+    cancel.set()
+
+    assert asyncio.run(strategy.find_arbitrage_opportunity([path], cancel)) == []
+    # 只完成了网格和黄金分割初始两点的评估
+    assert path[0].dex.calls == 16 + 2
+
+def test_gradient_search_starts_from_reserve_fraction():
+    strategy = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider(), max_iterations=5)
+    path = make_path(1_100_000_000_000, ("v2", "v2", "v2"))
+
+    assert strategy.get_initial_amount(path) == Decimal(10**10)
+    opportunities = asyncio.run(strategy.find_arbitrage_opportunity([path]))
+    assert len(opportunities) == 1 and opportunities[0]["expected_profit"] > 0
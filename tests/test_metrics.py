@@ -0,0 +1,65 @@
+import asyncio
+import random
+from src.common.metrics import LatencyHistogram, Tracer, _bucket_index, _bucket_upper
+
+def test_bucket_bounds_contain_value():
+    rng = random.Random(7)
+    for value in list(range(1, 300)) + [rng.randrange(1, 10**12) for _ in range(2000)]:
+        index = _bucket_index(value)
+        assert _bucket_upper(index - 1) < value <= _bucket_upper(index)
+        # 相对误差不超过 1/32
+        assert _bucket_upper(index) - value <= value / 32
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for value in range(1, 10001):
+        histogram.record(value * 1000)
+    assert histogram.count == 10000
+    assert histogram.min == 1000 and histogram.max == 10**7
+    assert abs(histogram.percentile(0.5) - 5 * 10**6) <= 5 * 10**6 / 32
+    assert abs(histogram.percentile(0.99) - 9.9 * 10**6) <= 9.9 * 10**6 / 32
+    assert histogram.percentile(1.0) == 10**7
+
+def test_span_and_ingress_to_submit():
+    tracer = Tracer()
+    with tracer.span("stage"):
+        pass
+    assert tracer.histograms["stage"].count == 1
+
+    tracer.mark_ingress("0xabc", timestamp_ns=0)
+    assert tracer.mark_submit("0xabc") > 0
+    assert tracer.mark_submit("0xabc") is None
+    assert tracer.histograms["ingress_to_submit"].count == 1
+
+def test_inflight_digests_bounded():
+    tracer = Tracer(max_inflight=2)
+    for digest in ("a", "b", "c"):
+        tracer.mark_ingress(digest)
+    assert tracer.mark_submit("a") is None
+    assert tracer.mark_submit("c") is not None
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("stage"):
+        pass
+    tracer.mark_ingress("a")
+    assert tracer.histograms == {}
+    assert tracer.mark_submit("a") is None
+
+def test_http_endpoint_serves_text():
+    async def scenario():
+        tracer = Tracer()
+        tracer.record("run_bot.filter", 2500)
+        server = await tracer.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response.decode()
+
+    response = asyncio.run(scenario())
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "run_bot.filter 1 2.5" in response
@@ -1,17 +1,22 @@
+import copy
+import random
 import pytest
 from decimal import Decimal
 from typing import List, Set
-from src.path.path_finder import PathFinder, PathConfig
-from src.analysis.price_impact import Pool
+from src.path.path_finder import PathFinder, PathConfig, SEARCH_MODE_NEGATIVE_CYCLE
+from src.common.model import Pool
 from src.db.db import DB
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
 
 class MockPool:
-    def __init__(self, address: str, token0: str, token1: str, amount0: Decimal, amount1: Decimal):
+    def __init__(self, address: str, token0: str, token1: str, amount0: Decimal, amount1: Decimal,
+                 fee: Decimal = Decimal("0.003")):
         self.address = address
         self.token0 = token0
         self.token1 = token1
         self.amount0 = amount0
         self.amount1 = amount1
+        self.fee = fee
         self.dex = MockDex()
 
 class MockDex:
@@ -70,8 +75,10 @@ def test_find_paths_with_affected_pools(path_finder):
     
     assert len(paths) > 0
     for path in paths:
-        # 验证每条路径都是闭环的
-        assert path[0].token0 == path[-1].token1
+        # 验证每条路径都是闭环的(路径可能是任一方向)
+        assert path[0].token_in == path[-1].token_out
+        for prev, nxt in zip(path, path[1:]):
+            assert prev.token_out == nxt.token_in
         # 验证每条路径都包含至少一个受影响的池子
         affected_addresses = {p.address for p in affected_pools}
         path_addresses = {p.address for p in path}
@@ -119,4 +126,179 @@ def test_max_path_length(path_finder):
     # 所有路径长度应该小于等于最大长度
     max_length = path_finder.config.max_path_length
     for path in paths:
-        assert len(path) <= max_length 
\ No newline at end of file
+        assert len(path) <= max_length 
+
+def test_remove_pool_updates_cycle_index(path_finder):
+    # 测试移除池子后环路索引同步更新
+    path_finder.config.custom_paths = None
+    affected_pools = [
+        MockPool("0x1", "USDC", "ETH", Decimal("1000"), Decimal("1"))
+    ]
+    assert len(path_finder.find_paths(affected_pools)) == 2  # 同一环路的两个方向
+
+    pool_id = path_finder.graph.pool_ids["0x2"]
+    path_finder.remove_pool("0x2")
+
+    assert path_finder.find_paths(affected_pools) == []
+    assert pool_id not in path_finder.cycle_index
+    assert "0x2" not in path_finder.graph.pool_ids
+
+def test_add_pool_updates_cycle_index(path_finder):
+    # 测试新增池子后只需查询索引即可找到新环路
+    path_finder.config.custom_paths = None
+    new_pool = MockPool("0x7", "ETH", "USDT", Decimal("2"), Decimal("2000"))
+    path_finder.add_pool(new_pool)
+
+    paths = path_finder.find_paths([new_pool])
+
+    assert len(paths) > 0
+    for path in paths:
+        assert "0x7" in {p.address for p in path}
+        assert len({p.address for p in path}) == len(path)
+        assert len(path) <= path_finder.config.max_path_length
+
+def test_unsynced_clmm_pool_skipped_until_resynced(path_finder):
+    # tick未同步的CLMM池子不出现在路径中，重新加载tick后恢复
+    path_finder.config.custom_paths = None
+    state = ClmmPoolState("ETH", "USDT", sqrt_price=Q64, tick_current=0, liquidity=10**12, fee_rate=2500)
+    pool = MockPool("0x2", "ETH", "USDT", Decimal("1"), Decimal("1000"))
+    pool.dex = ClmmDex("cetus", "0xcetus", state)
+    state.synced = False
+    path_finder.add_pool(pool)
+    assert path_finder.find_paths([pool]) == []
+
+    resynced = copy.copy(pool)
+    resynced.dex = ClmmDex("cetus", "0xcetus", state.copy())
+    resynced.dex.state.load_ticks([])
+    assert len(path_finder.find_paths([resynced])) == 2
+
+def test_negative_cycle_mode_finds_long_profitable_cycle():
+    # 测试负权环模式: 只有 A->B->C->D->E->A 方向的汇率乘积大于1
+    pools = [
+        MockPool("0xa", "A", "B", Decimal("1000"), Decimal("1000")),
+        MockPool("0xb", "B", "C", Decimal("1000"), Decimal("1000")),
+        MockPool("0xc", "C", "D", Decimal("1000"), Decimal("1000")),
+        MockPool("0xd", "D", "E", Decimal("1000"), Decimal("1000")),
+        MockPool("0xe", "E", "A", Decimal("1000"), Decimal("1100")),
+        MockPool("0xf", "A", "C", Decimal("1000"), Decimal("1000")),
+    ]
+    config = PathConfig(
+        max_path_length=5,
+        min_liquidity=Decimal("100"),
+        search_mode=SEARCH_MODE_NEGATIVE_CYCLE
+    )
+    path_finder = PathFinder(config, MockDB(pools))
+
+    paths = path_finder.find_paths([pools[0]])
+
+    assert len(paths) > 0
+    for path in paths:
+        assert path[0].token_in == path[-1].token_out
+        rate = Decimal("1")
+        for pool in path:
+            reserve_in, reserve_out = ((pool.amount0, pool.amount1) if pool.token_in == pool.token0
+                                       else (pool.amount1, pool.amount0))
+            rate *= (1 - pool.fee) * reserve_out / reserve_in
+        assert rate > 1
+    assert any(len(path) == 5 for path in paths)
+
+    # 从A和B两个种子代币都会找到同一个5跳环路，只应保留一份
+    path_finder.remove_pool("0xf")
+    paths = path_finder.find_paths([pools[0]])
+
+    assert len(paths) == 1
+    assert path_finder.duplicates_pruned == 1
+
+def test_find_paths_prunes_duplicate_cycles(path_finder):
+    # 测试经过多个受影响池子的环路只返回一次
+    path_finder.config.custom_paths = None
+    affected_pools = [
+        MockPool("0x1", "USDC", "ETH", Decimal("1000"), Decimal("1")),
+        MockPool("0x2", "ETH", "USDT", Decimal("1"), Decimal("1000")),
+    ]
+
+    paths = path_finder.find_paths(affected_pools)
+
+    assert len(paths) == 2  # 同一环路的两个方向
+    assert path_finder.duplicates_pruned == 2
+
+def rotate(addresses):
+    # 与池子ID无关的环路形式: 旋转到地址最小的池子开始
+    start = addresses.index(min(addresses))
+    return addresses[start:] + addresses[:start]
+
+def test_removed_pool_id_reused_and_cycles_found(path_finder):
+    # 复用的ID比环路中其余池子的ID小，增量添加时仍要找到环路
+    path_finder.config.custom_paths = None
+    old_id = path_finder.graph.pool_ids["0x1"]
+    path_finder.remove_pool("0x1")
+    new_pool = MockPool("0x9", "USDC", "ETH", Decimal("1000"), Decimal("1"))
+    path_finder.add_pool(new_pool)
+
+    assert path_finder.graph.pool_ids["0x9"] == old_id
+    paths = path_finder.find_paths([new_pool])
+    assert sorted(rotate(tuple(pool.address for pool in path)) for path in paths) == [
+        ("0x2", "0x3", "0x9"), ("0x2", "0x9", "0x3")
+    ]
+
+def cycle_set(path_finder):
+    graph = path_finder.graph
+    return {rotate(tuple(graph.pools[pool_id].address for pool_id, _ in cycle))
+            for cycles in path_finder.cycle_index.values() for cycle in cycles}
+
+def test_incremental_updates_match_full_rebuild():
+    rng = random.Random(7)
+    tokens = [f"T{i}" for i in range(8)]
+    config = PathConfig(max_path_length=3, min_liquidity=Decimal("0"))
+    live = {}
+    path_finder = PathFinder(config, MockDB([]))
+    for step in range(400):
+        if live and rng.random() < 0.45:
+            address = rng.choice(sorted(live))
+            del live[address]
+            path_finder.remove_pool(address)
+        else:
+            token0, token1 = rng.sample(tokens, 2)
+            pool = MockPool(f"0x{step}", token0, token1, Decimal("1000"), Decimal("1000"))
+            live[pool.address] = pool
+            path_finder.add_pool(pool)
+
+    rebuilt = PathFinder(config, MockDB(list(live.values())))
+    assert cycle_set(path_finder) == cycle_set(rebuilt)
+    graph = path_finder.graph
+    # 池子ID被复用，邻接数组的长度与现存的池子数量同阶
+    assert len(graph.pools) < 2 * len(live) + 16
+    assert graph.edge_count == 2 * len(live)
+    assert len(graph.neighbor_pools) <= 4 * graph.edge_count + 256
+
+def test_negative_cycle_mode_prices_clmm_by_sqrt_price():
+    # CLMM池子的金库余额比例为0.5，但价格为1.1，环路 A->B->A 的汇率乘积大于1
+    state = ClmmPoolState("B", "A", sqrt_price=int(1.1 ** 0.5 * Q64), tick_current=953, liquidity=10**12, fee_rate=0)
+    clmm = MockPool("0xclmm", "B", "A", Decimal("1000"), Decimal("500"), fee=Decimal("0"))
+    clmm.dex = ClmmDex("cetus", "0xcetus", state)
+    pools = [MockPool("0xv2", "A", "B", Decimal("1000"), Decimal("1000"), fee=Decimal("0")), clmm]
+    config = PathConfig(max_path_length=2, min_liquidity=Decimal("100"), search_mode=SEARCH_MODE_NEGATIVE_CYCLE)
+    path_finder = PathFinder(config, MockDB(pools))
+
+    paths = path_finder.find_paths([pools[0]])
+
+    assert [[pool.address for pool in path] for path in paths] == [["0xv2", "0xclmm"]]
+    assert paths[0][0].token_in == "A"
+
+def test_db_listeners_keep_graph_in_sync():
+    db = DB()
+    db.add_pools([(MockPool("0x1", "USDC", "ETH", Decimal("1000"), Decimal("1")), 1),
+                  (MockPool("0x2", "ETH", "USDT", Decimal("1"), Decimal("1000")), 1)])
+    config = PathConfig(max_path_length=3, min_liquidity=Decimal("100"))
+    path_finder = PathFinder(config, db)
+    db.add_listener(on_added=path_finder.add_pool, on_removed=path_finder.remove_pool)
+    assert cycle_set(path_finder) == set()
+
+    # 启动之后拉取到的新池子闭合了环路
+    db.put_pool_if_newer(MockPool("0x3", "USDT", "USDC", Decimal("1000"), Decimal("1000")), 1)
+    assert cycle_set(path_finder) == {rotate(("0x1", "0x2", "0x3")), rotate(("0x3", "0x2", "0x1"))}
+    assert len(path_finder.find_paths([db.db["0x3"]])) == 2
+
+    db.remove_pool("0x2")
+    assert "0x2" not in path_finder.graph.pool_ids
+    assert cycle_set(path_finder) == set()
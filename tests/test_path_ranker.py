@@ -0,0 +1,73 @@
+import math
+import pytest
+from decimal import Decimal
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+from src.path.path_ranker import PathRanker, RankConfig
+
+class MockPool:
+    def __init__(self, address: str, token_in: str, token_out: str, reserve_in: Decimal, reserve_out: Decimal,
+                 fee: Decimal = Decimal("0.003")):
+        self.address = address
+        self.token0 = token_in
+        self.token1 = token_out
+        self.amount0 = reserve_in
+        self.amount1 = reserve_out
+        self.token_in = token_in
+        self.token_out = token_out
+        self.fee = fee
+
+def make_path(rate: str):
+    # 两池子环路，第二个池子的价格决定整个环路的汇率
+    return [
+        MockPool("0x1", "USDC", "SUI", Decimal("1000"), Decimal("1000"), fee=Decimal("0")),
+        MockPool("0x2", "SUI", "USDC", Decimal("1000"), Decimal("1000") * Decimal(rate), fee=Decimal("0")),
+    ]
+
+def test_drop_paths_below_threshold():
+    ranker = PathRanker(RankConfig(min_cycle_rate=Decimal("1"), top_k=10))
+    paths = [make_path("0.98"), make_path("1.02"), make_path("0.99")]
+
+    ranked = ranker.rank_paths(paths)
+
+    assert ranked == [paths[1]]
+    assert ranker.pruned_below_threshold == 2
+
+def test_keep_top_k_sorted_by_rate():
+    ranker = PathRanker(RankConfig(min_cycle_rate=Decimal("1"), top_k=2))
+    paths = [make_path("1.01"), make_path("1.05"), make_path("1.03")]
+
+    ranked = ranker.rank_paths(paths)
+
+    assert ranked == [paths[1], paths[2]]
+    assert ranker.pruned_by_top_k == 1
+
+def test_fee_counts_against_rate():
+    ranker = PathRanker(RankConfig(min_cycle_rate=Decimal("1"), top_k=10))
+    path = make_path("1.004")
+    for pool in path:
+        pool.fee = Decimal("0.003")
+
+    assert ranker.rank_paths([path]) == []
+
+def make_clmm_path(price: float, fee_rate: int):
+    # 第二个池子是CLMM: 价格为 price USDC/SUI，但金库余额比例只有0.5
+    state = ClmmPoolState("SUI", "USDC", sqrt_price=int(math.sqrt(price) * Q64), tick_current=0,
+                          liquidity=10**12, fee_rate=fee_rate)
+    clmm = MockPool("0x2", "SUI", "USDC", Decimal("1000"), Decimal("500"), fee=Decimal("0"))
+    clmm.dex = ClmmDex("cetus", "0x", state)
+    return [MockPool("0x1", "USDC", "SUI", Decimal("1000"), Decimal("1000"), fee=Decimal("0")), clmm]
+
+def test_clmm_rate_uses_sqrt_price_not_balances():
+    ranker = PathRanker(RankConfig(min_cycle_rate=Decimal("1"), top_k=10))
+    path = make_clmm_path(1.05, fee_rate=0)
+
+    assert ranker.cycle_log_rate(path) == pytest.approx(math.log(1.05))
+    assert ranker.rank_paths([path]) == [path]
+
+def test_clmm_fee_rate_counts_against_rate():
+    # CLMM的手续费取 fee_rate(百万分之一)，不取 pool.fee
+    ranker = PathRanker(RankConfig(min_cycle_rate=Decimal("1"), top_k=10))
+    path = make_clmm_path(1.05, fee_rate=100_000)
+
+    assert ranker.cycle_log_rate(path) == pytest.approx(math.log(1.05 * 0.9))
+    assert ranker.rank_paths([path]) == []
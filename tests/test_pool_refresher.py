@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+from src.db.db import DB
+from src.db.pool_refresher import PoolRefresher
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+from src.dex.events import EventDecoder
+from src.dex.objects import ObjectParser
+
+CETUS = "0xcetus"
+KRIYA = "0xkriya"
+
+class MockDex:
+    def __init__(self):
+        self.name = "kriya"
+        self.dex_type = "v2"
+
+class MockPool:
+    def __init__(self, address, amount0=1000, amount1=2000, dex=None):
+        self.address = address
+        self.token0 = "A"
+        self.token1 = "B"
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.dex = dex or MockDex()
+
+class FakeRpc:
+    """按对象ID返回kriya池子对象，version和储备可按对象设置"""
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.objects = {}
+        self.error = None
+
+    async def call(self, method, params):
+        assert method == "sui_multiGetObjects"
+        self.calls.append(list(params[0]))
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        results = []
+        for object_id in params[0]:
+            if object_id not in self.objects:
+                results.append({"error": {"code": "notExists", "object_id": object_id}})
+                continue
+            version, reserve_x, reserve_y = self.objects[object_id]
+            results.append({"data": {
+                "objectId": object_id, "version": str(version),
+                "content": {"dataType": "moveObject", "type": f"{KRIYA}::spot_dex::Pool<A, B>",
+                            "fields": {"token_x": str(reserve_x), "token_y": str(reserve_y)}},
+            }})
+        return results
+
+def make_refresher(rpc, pool_count=0, version=5):
+    db = DB()
+    for i in range(pool_count):
+        db.add_pool(MockPool(f"0x{i}"), version=version)
+    refresher = PoolRefresher(rpc, db, ObjectParser({KRIYA: "kriya", CETUS: "cetus"}))
+    return db, refresher
+
+def test_requests_batched_up_to_limit():
+    rpc = FakeRpc()
+    rpc.objects = {f"0x{i}": (6, i, i) for i in range(60)}
+    db, refresher = make_refresher(rpc, pool_count=60)
+
+    pools = asyncio.run(refresher.refresh_many([f"0x{i}" for i in range(60)]))
+    assert [len(call) for call in rpc.calls] == [50, 10]
+    assert [pool.amount0 for pool in pools] == list(range(60))
+    assert db.object_versions["0x7"] == 6
+
+def test_duplicate_requests_share_one_fetch():
+    rpc = FakeRpc()
+    rpc.objects = {"0x0": (6, 1, 2)}
+    _, refresher = make_refresher(rpc, pool_count=1)
+
+    async def scenario():
+        return await asyncio.gather(*(refresher.fetch("0x0") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert rpc.calls == [["0x0"]]
+    assert all(result is results[0] for result in results)
+    assert refresher.coalesced == 4
+
+def test_stale_response_does_not_overwrite():
+    rpc = FakeRpc()
+    rpc.objects = {"0x0": (4, 1, 2)}
+    db, refresher = make_refresher(rpc, pool_count=1, version=5)
+
+    pool = asyncio.run(refresher.refresh("0x0"))
+    assert (pool.amount0, pool.amount1) == (1000, 2000)
+    assert db.object_versions["0x0"] == 5 and db.stale_writes == 1
+
+def test_errors_reach_every_waiter():
+    rpc = FakeRpc()
+    rpc.error = ConnectionError("down")
+    _, refresher = make_refresher(rpc, pool_count=2)
+
+    async def scenario():
+        return await asyncio.gather(refresher.fetch("0x0"), refresher.fetch("0x1"), refresher.fetch("0x0"),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(rpc.calls) == 1 and refresher.stats()["inflight"] == 0
+
+def test_missing_object():
+    rpc = FakeRpc()
+    _, refresher = make_refresher(rpc, pool_count=1)
+    assert asyncio.run(refresher.fetch("0x0")) is None
+    with pytest.raises(KeyError):
+        asyncio.run(refresher.refresh("0x0"))
+
+def test_db_version_gap_uses_refresher_for_clmm():
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=10, fee_rate=2500)
+    state.set_tick(-60, 10)
+
+    class ClmmRpc(FakeRpc):
+        async def call(self, method, params):
+            self.calls.append(list(params[0]))
+            return [{"data": {
+                "objectId": "0xc", "version": "9",
+                "content": {"type": f"{CETUS}::pool::Pool<A, B>", "fields": {
+                    "coin_a": "111", "coin_b": "222", "current_sqrt_price": str(2 * Q64),
+                    "current_tick_index": {"type": "I32", "fields": {"bits": 13863}},
+                    "liquidity": "77", "fee_rate": "500"}},
+            }}]
+
+    db = DB()
+    db.add_pool(MockPool("0xc", dex=ClmmDex("cetus", "0xrouter", state)), version=1)
+    refresher = PoolRefresher(ClmmRpc(), db, ObjectParser({CETUS: "cetus"}))
+    db.fetch_pool_object = refresher.fetch_pool_object
+
+    asyncio.run(db._refetch_pools(["0xc"]))
+    pool = asyncio.run(db.get_pool("0xc"))
+    assert (pool.amount0, pool.amount1) == (111, 222)
+    assert (pool.dex.state.sqrt_price, pool.dex.state.tick_current, pool.dex.state.liquidity) == (2 * Q64, 13863, 77)
+    # tick来自本地状态，可能已过期，标记为未同步；原状态未被修改
+    assert pool.dex.state.liquidity_net(-60) == 10 and state.liquidity == 10
+    assert not pool.dex.state.synced and state.synced
+    assert db.object_versions["0xc"] == 9
+
+def test_checkpoint_gaps_fetched_in_one_batch():
+    rpc = FakeRpc()
+    rpc.objects = {f"0x{i}": (9, 100 + i, 200 + i) for i in range(3)}
+    db, refresher = make_refresher(rpc, pool_count=3, version=5)
+    db.event_decoder = EventDecoder({KRIYA: "kriya"})
+    db.fetch_pool_object = refresher.fetch_pool_object
+
+    def swap(address, previous_version):
+        # 交易前版本为8，本地为5，中间有未见到的交易
+        return {
+            "effects": {
+                "modifiedAtVersions": [{"objectId": address, "sequenceNumber": str(previous_version)}],
+                "mutated": [{"reference": {"objectId": address, "version": str(previous_version + 1)}}],
+            },
+            "events": [{"type": f"{KRIYA}::spot_dex::SwapEvent<A, B>",
+                        "parsedJson": {"pool_id": address, "amount_in": "1", "amount_out": "1",
+                                       "reserve_x": "1", "reserve_y": "1"}}],
+        }
+
+    # 最后一笔交易紧接在拉取到的版本9之后，拉取后继续按事件应用
+    checkpoint = [swap("0x0", 8), swap("0x1", 8), swap("0x2", 8), swap("0x0", 9)]
+    asyncio.run(db.update_pool(checkpoint))
+    assert [len(call) for call in rpc.calls] == [3]
+    assert (db.db["0x1"].amount0, db.db["0x1"].amount1) == (101, 201)
+    assert (db.db["0x0"].amount0, db.db["0x0"].amount1) == (1, 1)
+    assert db.object_versions["0x0"] == 10 and db.objects_fetched == 3 and db.events_applied == 1
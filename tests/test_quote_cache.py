@@ -0,0 +1,105 @@
+import asyncio
+from decimal import Decimal
+from src.db.db import DB
+from src.dex.quote_cache import QuoteCache
+from src.dex.swap_math import get_amount_out_fee_on_input
+from src.strategy.strategies import Strategies
+from src.strategy.two_pool_arbitrage_strategy import TwoPoolArbitrageStrategy
+from src.strategy.gradient_search_strategy import GradientSearchStrategy
+
+class MockDex:
+    name = "flowx"
+    dex_type = "v2"
+
+class MockPool:
+    def __init__(self, address: str, token_in: str, token_out: str, reserve_in: int, reserve_out: int):
+        self.address = address
+        self.token0 = token_in
+        self.token1 = token_out
+        self.token_in = token_in
+        self.token_out = token_out
+        self.amount0 = reserve_in
+        self.amount1 = reserve_out
+        self.fee = Decimal("0.003")
+        self.dex = MockDex()
+
+def test_repeated_quote_hits_cache():
+    cache = QuoteCache()
+    pool = MockPool("0x1", "A", "B", 10**9, 2 * 10**9)
+    expected = get_amount_out_fee_on_input(1000, 10**9, 2 * 10**9, 30)
+
+    assert cache.get_amount_out(pool, 1000) == expected
+    assert cache.get_amount_out(pool, 1000) == expected
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.hit_rate == 0.5
+
+def test_direction_is_part_of_key():
+    cache = QuoteCache()
+    pool = MockPool("0x1", "A", "B", 10**9, 2 * 10**9)
+    forward = cache.get_amount_out(pool, 1000)
+    pool.token_in, pool.token_out = "B", "A"
+    assert cache.get_amount_out(pool, 1000) != forward
+    assert cache.hits == 0
+
+def test_db_version_bump_invalidates():
+    cache = QuoteCache()
+    db = DB(cache)
+    pool = MockPool("0x1", "A", "B", 10**9, 2 * 10**9)
+    cache.get_amount_out(pool, 1000)
+
+    pool.amount1 = 3 * 10**9
+    assert db.bump_pool_version("0x1") == 1
+    assert cache.get_amount_out(pool, 1000) == get_amount_out_fee_on_input(1000, 10**9, 3 * 10**9, 30)
+    assert cache.hits == 0
+
+def test_lru_eviction():
+    cache = QuoteCache(max_size=2)
+    pool = MockPool("0x1", "A", "B", 10**9, 2 * 10**9)
+    cache.get_amount_out(pool, 1)
+    cache.get_amount_out(pool, 2)
+    cache.get_amount_out(pool, 1)  # 1 变为最近使用
+    cache.get_amount_out(pool, 3)  # 淘汰 2
+    assert cache.evictions == 1
+
+    cache.get_amount_out(pool, 1)
+    assert cache.hits == 2
+    cache.get_amount_out(pool, 2)
+    assert cache.misses == 4
+
+def test_strategies_share_cache():
+    class MockEventBus:
+        def emit(self, event_name, *args, **kwargs):
+            pass
+
+    class MockTokenPriceProvider:
+        def get_token_price(self, token_address: str) -> float:
+            return 1.0
+
+    strategies = Strategies(MockEventBus())
+    two_pool = TwoPoolArbitrageStrategy(token_price_provider=MockTokenPriceProvider(), batch_mode=False)
+    gradient = GradientSearchStrategy(token_price_provider=MockTokenPriceProvider())
+    strategies.add_strategy(two_pool)
+    strategies.add_strategy(gradient)
+    assert two_pool.quote_cache is gradient.quote_cache is strategies.quote_cache
+
+    path = [MockPool("0x1", "A", "B", 10**9, 2 * 10**9), MockPool("0x2", "B", "A", 10**9, 10**9)]
+    amount = two_pool._calculate_optimal_amount(*path)
+    two_pool._calculate_profit(path[0], path[1], amount)
+    asyncio.run(gradient._calculate_profit(path, amount))
+    assert strategies.quote_cache.hits == 2
+
+def test_snapshot_pool_keeps_its_own_version():
+    cache = QuoteCache()
+    db = DB(cache)
+    db.add_pool(MockPool("0x1", "A", "B", 10**9, 2 * 10**9), version=1)
+    snapshot = db.snapshot()
+    old_pool = snapshot.get_pool("0x1")
+
+    new_pool = db._writable_pool("0x1")
+    new_pool.amount1 = 3 * 10**9
+    db.bump_pool_version("0x1")
+    # 快照中的旧池子算出的报价不能被新版本命中
+    cache.get_amount_out(old_pool, 1000)
+    assert cache.get_amount_out(new_pool, 1000) == get_amount_out_fee_on_input(1000, 10**9, 3 * 10**9, 30)
+    assert cache.hits == 0
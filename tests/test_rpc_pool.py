@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+import pytest
+from src.common.rpc_pool import RpcError, RpcPool
+
+class StandInNode:
+    """本地HTTP/1.1 JSON-RPC节点，支持长连接、延迟、HTTP错误和chunked响应"""
+    def __init__(self, delay=0.0, status=200, chunked=False, result="ok"):
+        self.delay = delay
+        self.status = status
+        self.chunked = chunked
+        self.result = result
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/"
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+                request = json.loads(await reader.readexactly(length))
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                if request["method"] == "fail":
+                    response = {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": "bad"}}
+                else:
+                    response = {"jsonrpc": "2.0", "id": request["id"], "result": self.result}
+                body = json.dumps(response).encode()
+                status = b"200 OK" if self.status == 200 else b"%d Error" % self.status
+                if self.chunked:
+                    writer.write(b"HTTP/1.1 " + status + b"\r\nTransfer-Encoding: chunked\r\n\r\n")
+                    for i in range(0, len(body), 7):
+                        chunk = body[i:i + 7]
+                        writer.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+def run_with_nodes(nodes, scenario, **pool_options):
+    async def main():
+        urls = [await node.start() for node in nodes]
+        pool = RpcPool(urls, **pool_options)
+        try:
+            return await scenario(pool)
+        finally:
+            await pool.close()
+            for node in nodes:
+                await node.stop()
+    return asyncio.run(main())
+
+def test_connections_are_reused():
+    node = StandInNode()
+
+    async def scenario(pool):
+        return [await pool.call("sui_getChainIdentifier") for _ in range(5)]
+
+    assert run_with_nodes([node], scenario) == ["ok"] * 5
+    assert node.requests == 5 and node.connections == 1
+
+def test_chunked_response():
+    node = StandInNode(chunked=True, result={"checkpoint": "123"})
+
+    async def scenario(pool):
+        return await pool.call("sui_getCheckpoint", ["123"])
+
+    assert run_with_nodes([node], scenario) == {"checkpoint": "123"}
+
+def test_hedged_request_wins_over_slow_node():
+    slow, fast = StandInNode(delay=0.5, result="slow"), StandInNode(result="fast")
+
+    async def scenario(pool):
+        start = time.monotonic()
+        result = await pool.call("sui_getLatestCheckpointSequenceNumber")
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0.01)
+        return result, elapsed, pool, pool.ranked_endpoints()[0] is pool.endpoints[1]
+
+    result, elapsed, pool, fast_first = run_with_nodes([slow, fast], scenario, initial_hedge_delay=0.02)
+    assert result == "fast" and elapsed < 0.3
+    assert pool.hedged == 1 and pool.hedge_wins == 1
+    # 被取消的慢节点按不低于胜者的延迟留下样本，之后优先选择快节点
+    assert fast_first
+
+def test_cancelled_hedge_loser_not_ranked_faster():
+    # 首选节点50ms返回，对冲节点200ms，对冲请求在30ms后发出并落败
+    primary, hedge = StandInNode(delay=0.05, result="primary"), StandInNode(delay=0.2, result="hedge")
+
+    async def scenario(pool):
+        results = [await pool.call("m") for _ in range(5)]
+        return results, pool.ranked_endpoints()[0] is pool.endpoints[0], pool
+
+    results, primary_first, pool = run_with_nodes([primary, hedge], scenario, initial_hedge_delay=0.03)
+    assert results == ["primary"] * 5
+    assert pool.hedged == 5 and pool.hedge_wins == 0
+    assert primary_first
+    assert pool.endpoints[1].ewma >= pool.endpoints[0].ewma
+
+def test_ewma_routes_to_faster_node():
+    slow, fast = StandInNode(delay=0.03, result="slow"), StandInNode(result="fast")
+
+    async def scenario(pool):
+        results = [await pool.call("m") for _ in range(10)]
+        return results, pool.ranked_endpoints()[0]
+
+    results, best = run_with_nodes([slow, fast], scenario, initial_hedge_delay=1.0)
+    # 第一次请求各节点都没有样本；之后按EWMA一直选择快节点
+    assert results[-5:] == ["fast"] * 5
+    assert best.ewma < 0.03
+
+def test_failing_node_is_ejected():
+    broken, healthy = StandInNode(status=503), StandInNode(result="ok")
+
+    async def scenario(pool):
+        results = [await pool.call("m") for _ in range(3)]
+        return results, pool.ranked_endpoints(), pool.stats()
+
+    results, ranked, stats = run_with_nodes([broken, healthy], scenario, max_failures=1, initial_hedge_delay=1.0)
+    assert results == ["ok"] * 3
+    assert broken.requests == 1
+    assert ranked[-1].errors == 1 and not ranked[-1].is_healthy(time.monotonic())
+    assert sum(not endpoint["healthy"] for endpoint in stats["endpoints"].values()) == 1
+
+def test_rpc_error_is_raised_without_retry():
+    first, second = StandInNode(), StandInNode()
+
+    async def scenario(pool):
+        with pytest.raises(RpcError):
+            await pool.call("fail")
+
+    run_with_nodes([first, second], scenario, initial_hedge_delay=1.0)
+    assert first.requests + second.requests == 1
+
+def test_all_nodes_failing_raises():
+    nodes = [StandInNode(status=500), StandInNode(status=502)]
+
+    async def scenario(pool):
+        with pytest.raises(RpcError):
+            await pool.call("m")
+
+    run_with_nodes(nodes, scenario, initial_hedge_delay=1.0)
+    assert [node.requests for node in nodes] == [1, 1]
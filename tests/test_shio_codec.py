@@ -0,0 +1,45 @@
+import json
+import time
+from src.monitor.shio_codec import ShioMessageDecoder, MESSAGE_AUCTION, MESSAGE_PING, MESSAGE_UNKNOWN
+
+AUCTION = {
+    "auctionStarted": {
+        "txDigest": "0xdigest",
+        "gasPrice": "750",
+        "deadlineTimestampMs": 0,
+        "sideEffects": {"mutatedObjects": [{"id": "0xpool"}]},
+    }
+}
+
+def test_decode_auction_typed():
+    decoder = ShioMessageDecoder()
+    message = decoder.decode(json.dumps(AUCTION))
+    assert message.kind == MESSAGE_AUCTION
+    auction = message.auction
+    assert auction.tx_digest == "0xdigest"
+    assert auction.gas_price == 750
+    assert auction.side_effects["mutatedObjects"][0]["id"] == "0xpool"
+
+def test_auction_deadline_in_monotonic_time():
+    decoder = ShioMessageDecoder()
+    deadline_ms = int(time.time() * 1000) + 500
+    payload = {"auctionStarted": dict(AUCTION["auctionStarted"], deadlineTimestampMs=deadline_ms)}
+    deadline = decoder.decode(json.dumps(payload).encode()).auction.deadline()
+    assert 0.3 < deadline - time.monotonic() <= 0.5
+
+def test_ping_and_unknown_messages():
+    decoder = ShioMessageDecoder()
+    assert decoder.decode('{"type": "ping"}').kind == MESSAGE_PING
+    assert decoder.decode('{"auctionEnded": {}}').kind == MESSAGE_UNKNOWN
+    assert decoder.decode("[]").kind == MESSAGE_UNKNOWN
+
+def test_invalid_messages_counted():
+    decoder = ShioMessageDecoder(loads=json.loads)
+    assert decoder.decode("{not json") is None
+    # 缺少txDigest
+    assert decoder.decode('{"auctionStarted": {"gasPrice": 1}}') is None
+    assert decoder.decode('{"type": "ping"}') is not None
+    stats = decoder.stats()
+    assert stats["decoder"] == "json"
+    assert (stats["decoded"], stats["failed"], stats["bytes"]) == (1, 2, len('{"type": "ping"}'))
+    assert stats["mean_decode_us"] > 0
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+
+pytest.importorskip("websockets")
+
+from src.monitor.shio_codec import AuctionStarted
+from src.monitor.shio_feed_monitor import ShioFeedMonitor
+from src.common.event_bus import PRIORITY_CRITICAL
+
+class MockEventBus:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event_name, *args, **kwargs):
+        self.emitted.append((event_name, args, kwargs))
+
+def make_auction(events):
+    return AuctionStarted(tx_digest="D1", gas_price=750, deadline_ms=None,
+                          side_effects={"mutatedObjects": [{"id": "0xpool"}], "events": events})
+
+def test_convert_message_uses_side_effect_events():
+    monitor = ShioFeedMonitor(MockEventBus())
+    auction = make_auction([{"eventType": "0xcetus::pool::SwapEvent", "eventData": {"amount_in": "10"}}])
+
+    transactions = monitor.convert_message(auction)
+
+    assert len(transactions) == 1
+    transaction = transactions[0]
+    assert transaction["tx_hash"] == "D1"
+    assert transaction["gas_price"] == 750
+    assert transaction["events"] == [{"type": "0xcetus::pool::SwapEvent", "parsedJson": {"amount_in": "10"}}]
+    # 未上链的交易不带effects
+    assert transaction["effects"] == {}
+
+def test_auction_without_events_not_emitted():
+    event_bus = MockEventBus()
+    monitor = ShioFeedMonitor(event_bus)
+
+    asyncio.run(monitor.monitor_transactions(make_auction([])))
+    assert event_bus.emitted == []
+
+    asyncio.run(monitor.monitor_transactions(make_auction([{"eventType": "0xcetus::pool::SwapEvent"}])))
+    (event_name, args, kwargs), = event_bus.emitted
+    assert event_name == "receive_transactions"
+    assert args[0][0]["tx_hash"] == "D1"
+    assert kwargs["priority"] == PRIORITY_CRITICAL
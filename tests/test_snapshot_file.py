@@ -0,0 +1,89 @@
+import asyncio
+from decimal import Decimal
+import pytest
+from src.db.db import DB
+from src.db.snapshot_file import SnapshotFileWriter, load_snapshot_file, write_snapshot_file
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+
+class MockDex:
+    def __init__(self, name="kriya"):
+        self.name = name
+        self.router = "0xrouter"
+        self.dex_type = "v2"
+
+class MockPool:
+    def __init__(self, address, token0, token1, amount0, amount1, dex=None, fee=Decimal("0.003")):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.fee = fee
+        self.dex = dex or MockDex()
+
+def make_pools():
+    state = ClmmPoolState("A", "C", sqrt_price=Q64 * 3, tick_current=-7, liquidity=(1 << 100) + 5, fee_rate=2500)
+    state.set_tick(-120, (1 << 90) + 1)
+    state.set_tick(60, -(1 << 90) - 1)
+    return [
+        MockPool("0x1", "A", "B", 2**64 - 1, 12345),
+        MockPool("0x2", "B", "C", 10, 20, fee=Decimal("0.0025")),
+        MockPool("0x3", "A", "C", 1, 2, dex=ClmmDex("cetus", "0xcetus", state)),
+    ]
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "pools.bin")
+    pools = make_pools()
+    write_snapshot_file(path, pools, {"0x1": 5, "0x2": 6, "0x3": 7}, checkpoint=1234)
+
+    loaded = load_snapshot_file(path)
+    assert loaded.checkpoint == 1234
+    restored = {pool.address: (pool, version) for pool, version in loaded.pools}
+    assert [version for _, version in loaded.pools] == [5, 6, 7]
+
+    pool, _ = restored["0x1"]
+    assert (pool.token0, pool.token1, pool.amount0, pool.amount1) == ("A", "B", 2**64 - 1, 12345)
+    assert (pool.dex.name, pool.dex.dex_type, pool.fee) == ("kriya", "v2", Decimal("0.003"))
+    assert restored["0x2"][0].fee == Decimal("0.0025")
+
+    original = pools[2].dex.state
+    state = restored["0x3"][0].dex.state
+    assert (state.coin_a, state.coin_b, state.sqrt_price, state.tick_current, state.liquidity, state.fee_rate) == \
+        (original.coin_a, original.coin_b, original.sqrt_price, original.tick_current, original.liquidity, original.fee_rate)
+    assert list(state.tick_indexes) == [-120, 60]
+    assert state.liquidity_nets == [(1 << 90) + 1, -(1 << 90) - 1]
+    assert restored["0x3"][0].dex.dex_type == "clmm"
+    assert state.synced
+
+def test_unsynced_state_round_trip(tmp_path):
+    path = str(tmp_path / "pools.bin")
+    pools = make_pools()
+    pools[2].dex.state.synced = False
+    write_snapshot_file(path, pools, {}, checkpoint=None)
+    restored = {pool.address: pool for pool, _ in load_snapshot_file(path).pools}
+    assert not restored["0x3"].dex.state.synced
+
+def test_corrupted_file_rejected(tmp_path):
+    path = tmp_path / "pools.bin"
+    write_snapshot_file(str(path), make_pools(), {}, checkpoint=None)
+    assert load_snapshot_file(str(path)).checkpoint is None
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        load_snapshot_file(str(path))
+
+def test_writer_and_warm_start(tmp_path):
+    path = str(tmp_path / "pools.bin")
+    db = DB()
+    db.add_pools([(pool, 3) for pool in make_pools()])
+    writer = SnapshotFileWriter(db, path, checkpoint_source=lambda: 99)
+    asyncio.run(writer.write_now())
+
+    warm = DB()
+    loaded = load_snapshot_file(path)
+    warm.add_pools(loaded.pools)
+    assert loaded.checkpoint == 99
+    assert sorted(pool.address for pool in warm.get_pools_by_pair("C", "A")) == ["0x3"]
+    assert sorted(pool.address for pool in asyncio.run(warm.get_pool_by_token_address("A"))) == ["0x1", "0x3"]
+    assert warm.object_versions == {"0x1": 3, "0x2": 3, "0x3": 3}
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from src.strategy.strategies import Strategies, Strategy
+
+class MockEventBus:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event_name, *args, **kwargs):
+        self.emitted.append((event_name, args[0], time.monotonic()))
+
+class SleepStrategy(Strategy):
+    """异步等待delay秒后返回name作为机会"""
+    def __init__(self, name: str, delay: float):
+        self.name = name
+        self.delay = delay
+        self.cancelled = False
+
+    async def find_arbitrage_opportunity(self, path_list, cancel=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return [self.name]
+
+class ThreadStrategy(Strategy):
+    cpu_bound = True
+
+    def __init__(self):
+        self.thread = None
+
+    async def find_arbitrage_opportunity(self, path_list, cancel=None):
+        self.thread = threading.current_thread()
+        time.sleep(0.05)
+        return ["thread"]
+
+class FailingStrategy(Strategy):
+    async def find_arbitrage_opportunity(self, path_list, cancel=None):
+        raise ValueError("boom")
+
+def test_opportunities_stream_in_completion_order():
+    event_bus = MockEventBus()
+    strategies = Strategies(event_bus)
+    strategies.add_strategy(SleepStrategy("slow", 0.2))
+    strategies.add_strategy(SleepStrategy("fast", 0.01))
+
+    start = time.monotonic()
+    found = asyncio.run(strategies.find_arbitrage_opportunities([]))
+    assert found == ["fast", "slow"]
+    assert [opportunity for _, opportunity, _ in event_bus.emitted] == ["fast", "slow"]
+    # 快策略的机会不等慢策略完成就已发送
+    assert event_bus.emitted[0][2] - start < 0.1
+
+def test_deadline_cancels_slow_strategy():
+    event_bus = MockEventBus()
+    strategies = Strategies(event_bus, deadline=0.1)
+    slow = SleepStrategy("slow", 5)
+    strategies.add_strategy(slow)
+    strategies.add_strategy(SleepStrategy("fast", 0.01))
+
+    start = time.monotonic()
+    found = asyncio.run(strategies.find_arbitrage_opportunities([]))
+    assert time.monotonic() - start < 1
+    assert found == ["fast"]
+    assert slow.cancelled
+    assert strategies.timed_out == 1
+
+def test_cpu_bound_strategy_runs_in_thread_pool():
+    strategies = Strategies(MockEventBus())
+    strategy = ThreadStrategy()
+    strategies.add_strategy(strategy)
+    strategies.add_strategy(FailingStrategy())
+
+    found = asyncio.run(strategies.find_arbitrage_opportunities([]))
+    assert found == ["thread"]
+    assert strategy.thread is not threading.main_thread()
+
+class CancellableThreadStrategy(Strategy):
+    """线程中的搜索循环，每次迭代之间检查cancel"""
+    cpu_bound = True
+
+    def __init__(self):
+        self.iterations = 0
+        self.stopped = threading.Event()
+
+    async def find_arbitrage_opportunity(self, path_list, cancel=None):
+        for _ in range(500):
+            if self._cancelled(cancel):
+                break
+            self.iterations += 1
+            time.sleep(0.01)
+        self.stopped.set()
+        return ["late"]
+
+def test_deadline_abandons_thread_strategy_and_signals_it_to_stop():
+    event_bus = MockEventBus()
+    strategies = Strategies(event_bus, deadline=0.05)
+    strategy = CancellableThreadStrategy()
+    strategies.add_strategy(strategy)
+    strategies.add_strategy(SleepStrategy("fast", 0.01))
+
+    found = asyncio.run(strategies.find_arbitrage_opportunities([]))
+    assert found == ["fast"]
+    assert strategies.timed_out == 1
+    # 线程中的计算无法取消，单独记为放弃，并在下一次迭代时停止
+    assert strategies.abandoned == 1
+    assert strategy.stopped.wait(1)
+    assert strategy.iterations < 50
+    for _ in range(100):
+        if strategies.abandoned_running == 0:
+            break
+        time.sleep(0.01)
+    assert strategies.abandoned_running == 0
+
+def test_deadline_cancels_async_strategy_without_abandoning():
+    strategies = Strategies(MockEventBus(), deadline=0.05)
+    strategies.add_strategy(SleepStrategy("slow", 5))
+    asyncio.run(strategies.find_arbitrage_opportunities([]))
+    assert strategies.timed_out == 1
+    assert strategies.abandoned == 0
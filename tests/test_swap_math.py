@@ -0,0 +1,68 @@
+import pytest
+from decimal import Decimal
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+from src.dex.swap_math import (
+    MAX_U64, get_amount_out, get_amount_out_fee_deducted, get_amount_out_fee_on_input, get_path_amount_out
+)
+
+class MockDex:
+    def __init__(self, name: str = "flowx", dex_type: str = "v2"):
+        self.name = name
+        self.dex_type = dex_type
+
+class MockPool:
+    def __init__(self, token_in, token_out, reserve_in, reserve_out, dex=None, fee=Decimal("0.003")):
+        self.token0 = token_in
+        self.token1 = token_out
+        self.token_in = token_in
+        self.token_out = token_out
+        self.amount0 = reserve_in
+        self.amount1 = reserve_out
+        self.fee = fee
+        self.dex = dex or MockDex()
+
+def test_fee_on_input_floors():
+    # 997 * 1000 * 10**6 / (10**6 * 1000 + 997 * 1000) = 996006.98... 向下取整
+    assert get_amount_out_fee_on_input(1000, 10**6, 10**9, 30) == 996006
+
+def test_fee_deducted_rounding_differs():
+    # 手续费 7 * 30 / 10000 向下取整为0，整笔输入参与兑换
+    assert get_amount_out_fee_deducted(7, 10**6, 10**9, 30) == 6999
+    assert get_amount_out_fee_on_input(7, 10**6, 10**9, 30) == 6978
+
+def test_amount_in_overflow():
+    with pytest.raises(OverflowError):
+        get_amount_out_fee_on_input(MAX_U64 + 1, 10**6, 10**9, 30)
+
+def test_get_amount_out_dispatch_and_direction():
+    forward = MockPool("A", "B", 10**6, 10**9, dex=MockDex("kriya"))
+    assert get_amount_out(forward, 7) == 6999
+
+    # 反向时使用 amount1 作为输入储备
+    backward = MockPool("A", "B", 10**6, 10**9)
+    backward.token_in, backward.token_out = "B", "A"
+    assert get_amount_out(backward, 10**6) == get_amount_out_fee_on_input(10**6, 10**9, 10**6, 30)
+
+def test_get_amount_out_clmm_uses_local_state():
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=10**12, fee_rate=2500)
+    pool = MockPool("A", "B", 0, 0, dex=ClmmDex("cetus", "0xrouter", state))
+    assert get_amount_out(pool, 10**6) == state.swap(10**6, a2b=True).amount_out
+
+def test_unsynced_clmm_pool_not_quoted():
+    state = ClmmPoolState("A", "B", sqrt_price=Q64, tick_current=0, liquidity=10**12, fee_rate=2500)
+    pool = MockPool("A", "B", 0, 0, dex=ClmmDex("cetus", "0xrouter", state))
+    state.synced = False
+    assert get_amount_out(pool, 10**6) == 0
+    state.load_ticks([(-60, 10**12), (60, -10**12), (120, 0)])
+    assert state.synced and list(state.tick_indexes) == [-60, 60]
+    assert get_amount_out(pool, 10**6) == state.swap(10**6, a2b=True).amount_out
+
+def test_path_amount_out_accepts_decimal_reserves():
+    path = [
+        MockPool("A", "B", Decimal(10**6), Decimal(10**9)),
+        MockPool("B", "A", 10**9, 10**6),
+    ]
+    expected = get_amount_out_fee_on_input(
+        get_amount_out_fee_on_input(1000, 10**6, 10**9, 30), 10**9, 10**6, 30
+    )
+    assert get_path_amount_out(path, 1000) == expected
@@ -0,0 +1,125 @@
+import random
+import pytest
+from src.db.db import DB
+from src.dex.clmm import ClmmDex, ClmmPoolState, Q64
+from src.token_price.token_price import TokenPriceProvider, spot_rate
+
+USDC = "0xusdc::usdc::USDC"
+SUI = "0x2::sui::SUI"
+CETUS = "0xcetus::cetus::CETUS"
+
+class MockDex:
+    def __init__(self):
+        self.name = "kriya"
+        self.dex_type = "v2"
+
+class MockPool:
+    def __init__(self, address, token0, token1, amount0, amount1, dex=None):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.dex = dex or MockDex()
+
+def make_provider(pools, version=1):
+    db = DB()
+    for pool in pools:
+        db.add_pool(pool, version=version)
+    provider = TokenPriceProvider(db, anchors={USDC: 6})
+    provider.update_from_snapshot(db.snapshot())
+    return db, provider
+
+def test_prices_follow_most_liquid_pool():
+    # SUI为9位小数: 深池子中1 SUI = 2 USDC，浅池子中1 SUI = 3 USDC
+    deep = MockPool("0xdeep", SUI, USDC, 1_000_000 * 10**9, 2_000_000 * 10**6)
+    shallow = MockPool("0xshallow", SUI, USDC, 10 * 10**9, 30 * 10**6)
+    _, provider = make_provider([deep, shallow])
+
+    assert provider.get_token_price(USDC) == pytest.approx(1e-6)
+    assert provider.get_token_price(SUI) * 10**9 == pytest.approx(2.0)
+    assert provider.parents[provider.token_index[SUI]] == "0xdeep"
+    assert provider.get_token_price("0xunknown::x::X") == 0.0
+
+def test_clmm_price_propagates_through_hops():
+    sui_usdc = MockPool("0xsui_usdc", SUI, USDC, 1_000 * 10**9, 2_000 * 10**6)
+    # coin_b/coin_a = 0.25: 1个CETUS原始单位换0.25个SUI原始单位
+    state = ClmmPoolState(CETUS, SUI, sqrt_price=Q64 // 2, tick_current=-13863, liquidity=10**12, fee_rate=2500)
+    cetus_sui = MockPool("0xcetus_sui", CETUS, SUI, 4_000 * 10**9, 1_000 * 10**9, ClmmDex("cetus", "0x", state))
+    _, provider = make_provider([sui_usdc, cetus_sui])
+
+    assert spot_rate(cetus_sui, CETUS) == pytest.approx(0.25)
+    assert provider.get_token_price(CETUS) * 10**9 == pytest.approx(0.5)
+
+def test_incremental_update_touches_only_downstream_tokens():
+    pools = [MockPool("0xsui_usdc", SUI, USDC, 1_000 * 10**9, 2_000 * 10**6),
+             MockPool("0xcetus_sui", CETUS, SUI, 4_000 * 10**9, 1_000 * 10**9),
+             MockPool("0xother_usdc", "0xother::o::O", USDC, 500, 500 * 10**6)]
+    db, provider = make_provider(pools)
+
+    assert provider.update_from_snapshot(db.snapshot()) == 0
+    db.db["0xsui_usdc"].amount1 = 4_000 * 10**6
+    db.bump_pool_version("0xsui_usdc")
+    assert provider.update_from_snapshot(db.snapshot()) == 2  # SUI和CETUS
+    assert provider.get_token_price(SUI) * 10**9 == pytest.approx(4.0)
+    assert provider.get_token_price(CETUS) * 10**9 == pytest.approx(1.0)
+    assert provider.stats()["full_rebuilds"] == 1
+
+def test_removed_pool_falls_back_to_next_path():
+    deep = MockPool("0xdeep", SUI, USDC, 1_000 * 10**9, 2_000 * 10**6)
+    shallow = MockPool("0xshallow", SUI, USDC, 10 * 10**9, 30 * 10**6)
+    db, provider = make_provider([deep, shallow])
+    db.remove_pool("0xdeep")
+    provider.update_from_snapshot(db.snapshot())
+    assert provider.get_token_price(SUI) * 10**9 == pytest.approx(3.0)
+    db.remove_pool("0xshallow")
+    provider.update_from_snapshot(db.snapshot())
+    assert provider.get_token_price(SUI) == 0.0
+
+def test_incremental_matches_full_rebuild():
+    rng = random.Random(7)
+    tokens = [USDC] + [f"0x{i}::t::T" for i in range(12)]
+    pools = []
+    for i in range(30):
+        token0, token1 = rng.sample(tokens, 2)
+        pools.append(MockPool(f"0xp{i}", token0, token1, rng.randint(10**6, 10**12), rng.randint(10**6, 10**12)))
+    db, provider = make_provider(pools)
+
+    for _ in range(50):
+        address = f"0xp{rng.randrange(30)}"
+        if address in db.db and rng.random() < 0.1:
+            db.remove_pool(address)
+        elif address in db.db:
+            pool = db.db[address]
+            pool.amount0 = rng.randint(10**6, 10**12)
+            db.bump_pool_version(address)
+        else:
+            token0, token1 = rng.sample(tokens, 2)
+            db.add_pool(MockPool(address, token0, token1, rng.randint(10**6, 10**12), rng.randint(10**6, 10**12)), 1)
+        snapshot = db.snapshot()
+        provider.update_from_snapshot(snapshot)
+
+        expected = TokenPriceProvider(anchors={USDC: 6})
+        expected.rebuild(snapshot)
+        for token in tokens:
+            assert provider.get_token_price(token) == pytest.approx(expected.get_token_price(token))
+
+def test_readers_see_only_complete_updates():
+    pools = [MockPool("0xsui_usdc", SUI, USDC, 1_000 * 10**9, 2_000 * 10**6),
+             MockPool("0xcetus_sui", CETUS, SUI, 4_000 * 10**9, 1_000 * 10**9)]
+    db, provider = make_provider(pools)
+    old_prices = (provider.get_token_price(SUI), provider.get_token_price(CETUS))
+
+    # 重算过程中(子树已重置为0)读取到的仍是上一次发布的价格
+    seen = []
+    relax = provider._relax
+    def observing_relax(*args):
+        seen.append((provider.get_token_price(SUI), provider.get_token_price(CETUS)))
+        return relax(*args)
+    provider._relax = observing_relax
+
+    db._writable_pool("0xsui_usdc").amount1 = 4_000 * 10**6
+    db.bump_pool_version("0xsui_usdc")
+    provider.update_from_snapshot(db.snapshot())
+    assert seen and all(prices == old_prices for prices in seen)
+    assert provider.get_token_price(SUI) * 10**9 == pytest.approx(4.0)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from src.strategy.two_pool_arbitrage_strategy import TwoPoolArbitrageStrategy
+
+class MockDex:
+    def __init__(self, pool):
+        self.name = "mock_dex"
+        self.dex_type = "v2"
+        self.pool = pool
+
+    def get_amount_out(self, amount_in: Decimal, token_in: str, token_out: str) -> Decimal:
+        pool = self.pool
+        reserve_in, reserve_out = (pool.amount0, pool.amount1) if token_in == pool.token0 else (pool.amount1, pool.amount0)
+        amount_in_with_fee = amount_in * (1 - pool.fee)
+        return amount_in_with_fee * reserve_out / (reserve_in + amount_in_with_fee)
+
+class MockPool:
+    def __init__(self, address: str, token_in: str, token_out: str, reserve_in: int, reserve_out: int,
+                 fee: Decimal = Decimal("0.003")):
+        self.address = address
+        self.token0 = token_in
+        self.token1 = token_out
+        self.amount0 = Decimal(reserve_in)
+        self.amount1 = Decimal(reserve_out)
+        self.token_in = token_in
+        self.token_out = token_out
+        self.fee = fee
+        self.dex = MockDex(self)
+
+class MockTokenPriceProvider:
+    def get_token_price(self, token_address: str) -> float:
+        return 2.0
+
+def make_path(price2: int):
+    # USDC -> SUI 价格为1，SUI -> USDC 价格为 price2 / 10**6
+    return [
+        MockPool("0x1", "USDC", "SUI", 10**12, 10**12),
+        MockPool("0x2", "SUI", "USDC", 10**12, price2 * 10**6),
+    ]
+
+@pytest.fixture
+def strategy():
+    return TwoPoolArbitrageStrategy(token_price_provider=MockTokenPriceProvider())
+
+def test_batch_returns_all_profitable_paths(strategy):
+    paths = [make_path(1_050_000), make_path(990_000), make_path(1_020_000)]
+
+    opportunities = asyncio.run(strategy.find_arbitrage_opportunity(paths))
+
+    assert [opportunity["path"] for opportunity in opportunities] == [paths[0], paths[2]]
+    for opportunity in opportunities:
+        assert opportunity["expected_profit"] > 0
+        assert opportunity["usd_profit"] == opportunity["expected_profit"] * 2
+
+def test_batch_amount_is_optimal(strategy):
+    path = make_path(1_050_000)
+
+    opportunity = asyncio.run(strategy.find_arbitrage_opportunity([path]))[0]
+    amount = int(opportunity["input_amount"])
+
+    # 最优点附近偏移千分之一的输入不应带来更高的利润
+    best = strategy._calculate_profit(path[0], path[1], Decimal(amount))
+    for other in (amount * 999 // 1000, amount * 1001 // 1000):
+        assert strategy._calculate_profit(path[0], path[1], Decimal(other)) <= best
+
+def test_batch_matches_scalar_mode(strategy):
+    paths = [make_path(1_050_000), make_path(1_020_000)]
+    scalar = TwoPoolArbitrageStrategy(token_price_provider=MockTokenPriceProvider(), batch_mode=False)
+
+    batch_opportunities = asyncio.run(strategy.find_arbitrage_opportunity(paths))
+    scalar_opportunities = asyncio.run(scalar.find_arbitrage_opportunity(paths))
+
+    assert len(batch_opportunities) == len(scalar_opportunities) == 2
+    for batch_opportunity, scalar_opportunity in zip(batch_opportunities, scalar_opportunities):
+        relative_gap = abs(batch_opportunity["input_amount"] - scalar_opportunity["input_amount"]) / scalar_opportunity["input_amount"]
+        assert relative_gap < Decimal("1e-6")